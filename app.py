@@ -1,5 +1,29 @@
+import json
+import os
+import httpx
 import streamlit as st
-from head_agent import HeadAgent
+
+# The chat service (chat_service.py) owns the agents and conversation state
+CHAT_SERVICE_URL = os.getenv("CHAT_SERVICE_URL", "http://localhost:8000")
+CHAT_CLIENT_TIMEOUT = float(os.getenv("CHAT_CLIENT_TIMEOUT", "120"))
+
+def stream_chat(message: str, session_id: str = None):
+    """Yield the service's streamed events for one chat turn."""
+    with httpx.stream(
+        "POST",
+        f"{CHAT_SERVICE_URL}/chat/stream",
+        json={"message": message, "session_id": session_id},
+        timeout=CHAT_CLIENT_TIMEOUT
+    ) as response:
+        if response.status_code == 429:
+            yield {"type": "token", "content": "We're helping a lot of shoppers right now. Please try again in a few seconds."}
+            return
+        if response.status_code != 200:
+            yield {"type": "token", "content": "The assistant is unavailable right now. Please try again shortly."}
+            return
+        for line in response.iter_lines():
+            if line.startswith("data: "):
+                yield json.loads(line[len("data: "):])
 
 # --- Inject your luxury CSS theme ---
 st.markdown("""
@@ -430,9 +454,9 @@ h1::after {
 # --- App title ---
 st.markdown("<h1>✨ Your AI Shopping Assistant</h1>", unsafe_allow_html=True)
 
-# --- Session State for conversation persistence ---
-if "agent" not in st.session_state:
-    st.session_state.agent = HeadAgent()
+# --- Session State for conversation persistence (the agent itself lives in the service) ---
+if "session_id" not in st.session_state:
+    st.session_state.session_id = None
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
@@ -447,11 +471,25 @@ if query := st.chat_input("Ask me about products, policies, or just say hi..."):
     st.chat_message("user").markdown(query)
     st.session_state.messages.append({"role": "user", "content": query})
 
-    # Get assistant response
+    # Stream assistant response, showing routing and sub-agent progress as it happens
     with st.chat_message("assistant"):
-        with st.spinner("Thinking..."):
-            response = st.session_state.agent.process_query(query)
-            st.markdown(response)
+        status = st.status("Thinking...", expanded=False)
+
+        def response_tokens():
+            try:
+                for event in stream_chat(query, st.session_state.session_id):
+                    if event["type"] == "status":
+                        status.update(label=event["content"])
+                        status.write(event["content"])
+                    elif event["type"] == "done":
+                        st.session_state.session_id = event["session_id"]
+                    else:
+                        yield event["content"]
+            except httpx.HTTPError:
+                yield "I can't reach the assistant service right now. Please try again shortly."
+
+        response = st.write_stream(response_tokens())
+        status.update(label="Done", state="complete")
     st.session_state.messages.append({"role": "assistant", "content": response})
 
 # --- Optional status bar ---
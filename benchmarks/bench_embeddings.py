@@ -0,0 +1,89 @@
+"""
+Compare the fp32 and int8 embedding backends on the policy corpus: single-query
+latency, batch throughput, and whether int8 retrieval still agrees with fp32.
+
+Usage:
+    python benchmarks/bench_embeddings.py                  # latency, throughput and agreement
+    python benchmarks/bench_embeddings.py --k 2,5 --min-agreement 0.9
+
+Exits with status 1 when the int8 top-k agreement (store rebuilt with int8) falls below the threshold.
+"""
+import argparse
+import glob
+import os
+import statistics
+import sys
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from policy.tools.embeddings import EMBEDDING_MIN_AGREEMENT, create_embeddings, topk_agreement
+from router.embedding_router import EXAMPLES_PATH, load_examples
+
+DOCUMENTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "policy", "documents")
+
+def load_corpus():
+    """Policy paragraphs as documents, and the router's policy questions as queries."""
+    paragraphs = []
+    for path in sorted(glob.glob(os.path.join(DOCUMENTS_DIR, "*.txt"))):
+        with open(path, encoding="utf-8") as f:
+            paragraphs += [p.strip() for p in f.read().split("\n\n") if p.strip()]
+    queries = [text for text, label in load_examples(EXAMPLES_PATH) if label in ("policy", "both")]
+    return paragraphs, queries
+
+def query_latency_ms(embeddings, queries, repeats: int) -> dict:
+    """Per-query latency of `embed_query`, one text at a time as in serving."""
+    embeddings.embed_query(queries[0])  # first call pays for lazy initialization
+    timings = []
+    for _ in range(repeats):
+        for query in queries:
+            start = time.perf_counter()
+            embeddings.embed_query(query)
+            timings.append((time.perf_counter() - start) * 1000)
+    return {"median_ms": statistics.median(timings), "p95_ms": statistics.quantiles(timings, n=20)[-1]}
+
+def batch_throughput(embeddings, documents, repeats: int) -> float:
+    """Documents embedded per second by `embed_documents`, best of `repeats`."""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        embeddings.embed_documents(documents)
+        best = min(best, time.perf_counter() - start)
+    return len(documents) / best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--k", default="2,5", help="comma-separated top-k values to check")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--min-agreement", type=float, default=EMBEDDING_MIN_AGREEMENT)
+    args = parser.parse_args()
+
+    documents, queries = load_corpus()
+    print(f"{len(documents)} policy passages, {len(queries)} policy questions\n")
+
+    backends = {}
+    for name in ("fp32", "int8"):
+        start = time.perf_counter()
+        backends[name] = create_embeddings(name)
+        load_s = time.perf_counter() - start
+        latency = query_latency_ms(backends[name], queries, args.repeats)
+        throughput = batch_throughput(backends[name], documents, args.repeats)
+        print(f"{name:<5} load={load_s:6.2f}s  query median={latency['median_ms']:7.2f}ms  "
+              f"p95={latency['p95_ms']:7.2f}ms  batch={throughput:8.1f} docs/s")
+
+    failed = False
+    print()
+    for k in (int(value) for value in args.k.split(",")):
+        result = topk_agreement(backends["fp32"], backends["int8"], queries, documents, k)
+        flag = ""
+        if result["rebuilt"] < args.min_agreement:
+            failed = True
+            flag = "  BELOW THRESHOLD"
+        print(f"top-{result['k']} agreement: rebuilt={result['rebuilt']:.1%}  "
+              f"mixed (fp32 store, int8 queries)={result['mixed']:.1%}{flag}")
+
+    if failed:
+        print(f"\nint8 retrieval agrees with fp32 less than {args.min_agreement:.0%}; keep EMBEDDING_BACKEND=fp32")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
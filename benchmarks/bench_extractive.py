@@ -0,0 +1,49 @@
+"""
+Calibrate POLICY_EXTRACTIVE_THRESHOLD: for the router's policy questions, show how
+often the best policy sentence clears each threshold and what would be quoted.
+
+Needs the sentence snapshot written by policy/part1_conversion.py.
+
+Usage:
+    python benchmarks/bench_extractive.py
+    python benchmarks/bench_extractive.py --thresholds 0.6,0.7,0.8 --show 0.7
+"""
+import argparse
+import os
+import statistics
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import resources
+from policy.tools.extractive import POLICY_EXTRACTIVE_THRESHOLD, extract_answer, load_sentence_index
+from router.embedding_router import EXAMPLES_PATH, load_examples
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--thresholds", default="0.5,0.6,0.65,0.7,0.75,0.8")
+    parser.add_argument("--show", type=float, default=POLICY_EXTRACTIVE_THRESHOLD,
+                        help="print the quoted answers at this threshold")
+    args = parser.parse_args()
+
+    index = load_sentence_index()
+    if index is None:
+        raise SystemExit("No sentence snapshot; run policy/part1_conversion.py first")
+    queries = [text for text, label in load_examples(EXAMPLES_PATH) if label == "policy"]
+    embeddings = resources.get("embeddings")
+    vectors = embeddings.embed_documents(queries)
+
+    best = [index.similarity_search_with_score_by_vector(vector, k=1)[0][1] for vector in vectors]
+    print(f"{len(index)} sentences, {len(queries)} policy questions")
+    print(f"best-sentence similarity: median={statistics.median(best):.3f}  min={min(best):.3f}  max={max(best):.3f}\n")
+    for threshold in (float(value) for value in args.thresholds.split(",")):
+        hits = sum(score >= threshold for score in best)
+        print(f"threshold {threshold:.2f}: {hits / len(best):6.1%} answered without an LLM")
+
+    print(f"\nQuoted at threshold {args.show:.2f}:")
+    for query, vector in zip(queries, vectors):
+        answer = extract_answer(index, vector, threshold=args.show)
+        if answer is not None:
+            print(f"- {query}\n    {answer}")
+
+if __name__ == "__main__":
+    main()
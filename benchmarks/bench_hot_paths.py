@@ -0,0 +1,297 @@
+"""
+Offline microbenchmarks for the non-LLM hot paths, using in-memory stand-ins
+for Supabase, the embedding model and the LLMs (no network calls).
+
+Usage:
+    python benchmarks/bench_hot_paths.py                      # run and print
+    python benchmarks/bench_hot_paths.py --save               # also write the baseline file
+    python benchmarks/bench_hot_paths.py --compare            # flag regressions against the baseline
+    python benchmarks/bench_hot_paths.py --only schema_text,json_fence_parsing
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+import timeit
+import zlib
+from types import SimpleNamespace
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# Module-level clients are created at import time; give them harmless settings
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:9")
+os.environ.setdefault("SUPABASE_API", "bench.bench.bench")
+os.environ.setdefault("DB_TABLES", "products,users,transactions")
+os.environ.setdefault("NEBIUS_API_KEY", "bench")
+os.environ.setdefault("GROQ_API_KEY", "bench")
+# Timings shouldn't include writing traces
+os.environ["TRACE_EXPORT"] = "off"
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+POLICY_DOCUMENT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "policy", "documents", "company_policies_detailed.txt")
+
+PRODUCT_COLUMNS = [
+    ("product_id", "integer"), ("product_name", "text"), ("product_category", "text"),
+    ("price", "numeric"), ("stock_quantity", "integer"), ("product_ratings", "numeric"),
+    ("warranty_period", "integer"), ("sku", "text"), ("product_description", "text"),
+    ("variations", "text"), ("product_dimensions", "text"), ("updated_at", "timestamp"),
+]
+PRODUCT_ROWS = [
+    {
+        "product_id": i, "product_name": f"Product {i}", "product_category": "Electronics",
+        "price": 19.99 + i, "stock_quantity": 40 - i, "product_ratings": 4.2,
+        "warranty_period": 12, "sku": f"SKU-{i:05d}",
+        "product_description": "A dependable everyday product with a two-year track record.",
+        "variations": "Black, White", "product_dimensions": "10x5x3 cm", "updated_at": "2024-05-01T10:00:00"
+    }
+    for i in range(20)
+]
+
+class FakeQuery:
+    """Chainable stand-in for a postgrest request builder."""
+    def __init__(self, rows):
+        self.rows = rows
+
+    def _chain(self, *args, **kwargs):
+        return self
+
+    select = eq = neq = gt = lt = gte = lte = like = ilike = in_ = order = limit = _chain
+
+    def execute(self):
+        return SimpleNamespace(data=self.rows)
+
+class FakeSupabase:
+    """Answers every table query with canned rows, and `describe_table` with column metadata."""
+    def __init__(self):
+        self.columns = [{"column_name": name, "data_type": dtype} for name, dtype in PRODUCT_COLUMNS]
+        self.descriptions = [
+            {"table_name": "products", "column_name": name, "description": f"The {name.replace('_', ' ')} of the product"}
+            for name, _ in PRODUCT_COLUMNS
+        ]
+
+    def table(self, name):
+        return FakeQuery(self.descriptions if name == "column_descriptions" else PRODUCT_ROWS[:5])
+
+    def rpc(self, name, params):
+        return FakeQuery(self.columns)
+
+class FakeEmbeddings:
+    """Deterministic bag-of-words vectors with the MiniLM dimension."""
+    dimension = 384
+
+    def embed_query(self, text):
+        vector = [0.0] * self.dimension
+        for word in text.lower().split():
+            vector[zlib.crc32(word.encode()) % self.dimension] += 1.0
+        norm = sum(v * v for v in vector) ** 0.5 or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+class FakeChatModel:
+    """
+    Returns a fixed reply instantly, so only the code around the LLM call is timed.
+    Plain-string prompts (the reflection judge) get `rating` instead, if given.
+    """
+    def __init__(self, reply, rating=None):
+        self.reply = reply
+        self.rating = rating
+
+    def invoke(self, messages):
+        if self.rating is not None and isinstance(messages, str):
+            return SimpleNamespace(content=self.rating)
+        return SimpleNamespace(content=self.reply)
+
+class DisabledCache:
+    def lookup(self, vector):
+        return SimpleNamespace(answer=None, fingerprint=None)
+
+    def put(self, vector, answer, fingerprint=None):
+        pass
+
+# Each case is a setup function returning the callable to time. An ImportError
+# from setup (dependency not installed) skips the case.
+
+def case_schema_text():
+    from realtime_db_agent import part1_schema_retreival as part1
+    part1.supabase = FakeSupabase()
+    return lambda: part1.get_table_schema("products")
+
+def case_filter_builder():
+    from realtime_db_agent import part2_generating_and_executing_sql as part2
+    fake = FakeSupabase()
+    part2.get_supabase_client = lambda: fake
+    part2.products_mirror = None
+    query_params = {
+        "table_name": "products",
+        "select": "product_id,product_name,price,stock_quantity",
+        "filters": [
+            {"column": "product_category", "operator": "eq", "value": "Electronics"},
+            {"column": "price", "operator": "gte", "value": 10},
+            {"column": "price", "operator": "lte", "value": 500},
+            {"column": "stock_quantity", "operator": "gt", "value": 0},
+            {"column": "product_name", "operator": "ilike", "value": "lamp"},
+            {"column": "product_id", "operator": "in", "value": list(range(50))},
+        ],
+        "order": "products.price",
+        "order_direction": "desc",
+        "limit": 10
+    }
+    return lambda: part2.execute_supabase_query(query_params)
+
+def case_json_fence_parsing():
+    from realtime_db_agent.part2_generating_and_executing_sql import parse_json_response
+    reply = "Here is the query:\n```json\n" + json.dumps({
+        "table_name": "products",
+        "select": "*",
+        "filters": [{"column": "product_name", "operator": "ilike", "value": "desk lamp"}],
+        "order": "price",
+        "order_direction": "asc",
+        "limit": 5
+    }, indent=2) + "\n```\nLet me know if you need anything else."
+    return lambda: parse_json_response(reply)
+
+def case_conversation_memory():
+    from reflection_agent.memory import ConversationMemory
+    memory = ConversationMemory()
+    reply = "The Desk Lamp is in stock at $24.99 and ships within two business days. " * 4
+    for i in range(1000):
+        memory.add(f"Question number {i} about the desk lamp?", reply)
+
+    def turn():
+        memory.add("Is the Desk Lamp still available?", reply)
+        return memory.render()
+    return turn
+
+def case_policy_retrieval():
+    from langchain_chroma import Chroma
+    from policy.tools import policy_tool
+    from policy.tools.lexical_index import BM25Index
+    with open(POLICY_DOCUMENT, encoding="utf-8") as f:
+        paragraphs = [p.strip() for p in f.read().split("\n\n") if p.strip()]
+    embeddings = FakeEmbeddings()
+    store = Chroma(collection_name="bench_policies", embedding_function=embeddings)
+    store.add_texts(paragraphs * 10)
+    index = BM25Index.build(paragraphs * 10)
+    policy_tool.embeddings = embeddings
+    policy_tool.db = store
+    policy_tool.lexical_index = lambda: index
+    policy_tool.answer_cache = DisabledCache()
+    policy_tool.llm = FakeChatModel("You can return most items within 30 days of delivery.")
+    return lambda: policy_tool.policy_lookup("What is the return policy for electronics?")
+
+def case_bm25_search():
+    from policy.tools.lexical_index import BM25Index
+    with open(POLICY_DOCUMENT, encoding="utf-8") as f:
+        paragraphs = [p.strip() for p in f.read().split("\n\n") if p.strip()]
+    index = BM25Index.build(paragraphs * 10)
+    return lambda: index.search("Is there a restocking fee on returns after 30 days?", k=8)
+
+def case_reflection_prompt():
+    from reflection_agent import agent
+    agent.llm = FakeChatModel("We have ten lamps in stock, and all of them can be returned within 30 days.", rating="GOOD")
+    db_output = "\n".join(f"Product {i} | Electronics | ${19.99 + i:.2f} | {40 - i} in stock" for i in range(10))
+    policy_output = "Electronics can be returned within 30 days of delivery in their original packaging. " * 5
+    previous_context = "User: Do you sell desk lamps?\nAssistant: Yes, we have several.\n" * 5
+    return lambda: agent.reflection_agent(db_output, policy_output, previous_context, "Which lamps can I still return?")
+
+CASES = {
+    "schema_text": case_schema_text,
+    "filter_builder": case_filter_builder,
+    "json_fence_parsing": case_json_fence_parsing,
+    "conversation_memory": case_conversation_memory,
+    "policy_retrieval": case_policy_retrieval,
+    "bm25_search": case_bm25_search,
+    "reflection_prompt": case_reflection_prompt,
+}
+
+def measure(fn, repeats: int) -> dict:
+    """Per-call timings over `repeats` runs; `timeit` picks the loop count so each run takes ~0.2s."""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    per_call = [total / number for total in timer.repeat(repeat=repeats, number=number)]
+    return {
+        "median_us": round(statistics.median(per_call) * 1e6, 3),
+        "min_us": round(min(per_call) * 1e6, 3),
+        "loops": number,
+        "repeats": repeats
+    }
+
+def run(names, repeats: int) -> dict:
+    results = {}
+    for name in names:
+        try:
+            fn = CASES[name]()
+        except ImportError as e:
+            print(f"{name:<22} skipped ({e})")
+            continue
+        results[name] = measure(fn, repeats)
+        print(f"{name:<22} median={results[name]['median_us']:11.2f}us  min={results[name]['min_us']:11.2f}us")
+    return results
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Print each case against the baseline and return the names that got slower than `threshold` allows.
+    The fastest repeat is compared, as it is the least disturbed by other load on the machine.
+    """
+    regressions = []
+    print(f"\n{'case':<22} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, result in results.items():
+        before = baseline.get("results", {}).get(name)
+        if before is None:
+            print(f"{name:<22} {'-':>12} {result['min_us']:>10.2f}us {'new':>8}")
+            continue
+        change = result["min_us"] / before["min_us"] - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<22} {before['min_us']:>10.2f}us {result['min_us']:>10.2f}us {change:>+7.1%}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--only", help="comma-separated case names (default: all)")
+    parser.add_argument("--repeats", type=int, default=7)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save", action="store_true", help="write results to the baseline file")
+    parser.add_argument("--compare", action="store_true", help="compare against the baseline file")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="relative slowdown that counts as a regression")
+    args = parser.parse_args()
+
+    names = args.only.split(",") if args.only else list(CASES)
+    unknown = [name for name in names if name not in CASES]
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(unknown)} (choose from {', '.join(CASES)})")
+
+    # Keep query logging out of the measurements
+    logging.disable(logging.CRITICAL)
+    results = run(names, args.repeats)
+
+    regressions = []
+    if args.compare:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+
+    if args.save:
+        report = {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "results": results
+        }
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline written to {args.baseline}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Cold-start timings: importing the head agent, building the shared resources and
+answering the first question, each measured in a fresh Python process.
+
+Usage:
+    python benchmarks/bench_startup.py                          # import time only (offline)
+    python benchmarks/bench_startup.py --warmup                 # also build every shared resource
+    python benchmarks/bench_startup.py --query "Do you sell desk lamps?"   # time to first answer (needs API keys)
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Runs in the child process and prints one JSON line with its timings
+CHILD = r"""
+import json, os, sys, time
+start = time.perf_counter()
+import head_agent
+import resources
+timings = {"import_s": time.perf_counter() - start}
+if os.environ.get("BENCH_WARMUP"):
+    begin = time.perf_counter()
+    resources.warmup()
+    timings["warmup_s"] = time.perf_counter() - begin
+if os.environ.get("BENCH_QUERY"):
+    begin = time.perf_counter()
+    head_agent.HeadAgent().process_query(os.environ["BENCH_QUERY"])
+    timings["first_answer_s"] = time.perf_counter() - begin
+timings["total_s"] = time.perf_counter() - start
+timings["resources"] = resources.stats()["resources"]
+print(json.dumps(timings))
+"""
+
+def run_once(warmup: bool, query: str) -> dict:
+    env = dict(os.environ)
+    env.setdefault("DB_TABLES", "products,users,transactions")
+    # Import time shouldn't depend on reachable services
+    env.setdefault("SUPABASE_URL", "http://127.0.0.1:9")
+    env.setdefault("SUPABASE_API", "bench.bench.bench")
+    env["TRACE_EXPORT"] = "off"
+    if warmup:
+        env["BENCH_WARMUP"] = "1"
+    if query:
+        env["BENCH_QUERY"] = query
+    result = subprocess.run([sys.executable, "-c", CHILD], cwd=ROOT, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise SystemExit(f"child process failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3, help="fresh processes to start")
+    parser.add_argument("--warmup", action="store_true", help="build every shared resource after importing")
+    parser.add_argument("--query", help="question to answer once (time to first answer)")
+    args = parser.parse_args()
+
+    runs = [run_once(args.warmup, args.query) for _ in range(args.runs)]
+    for key in ("import_s", "warmup_s", "first_answer_s", "total_s"):
+        values = [run[key] for run in runs if key in run]
+        if values:
+            print(f"{key:<16} median={statistics.median(values):8.3f}s  min={min(values):8.3f}s")
+
+    built = {name: info["build_ms"] for name, info in runs[-1]["resources"].items() if info["loaded"]}
+    if built:
+        print("\nresource build times (last run):")
+        for name, build_ms in sorted(built.items(), key=lambda item: -item[1]):
+            print(f"  {name:<40} {build_ms:10.1f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Per-query latency of `execute_supabase_query`-style calls against a local
+PostgREST stand-in, comparing a fresh client per query (old behaviour) with
+the shared pooled client from `realtime_db_agent.db_client`.
+
+Usage:
+    python benchmarks/bench_supabase_client.py --queries 200 --threads 4
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from supabase import create_client
+from realtime_db_agent.db_client import create_pooled_client
+
+# Any string shaped like a JWT passes the client's key check
+FAKE_KEY = "bench.bench.bench"
+ROWS = [{"product_id": i, "product_name": f"Product {i}", "price": 10.0 + i} for i in range(5)]
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Answers every PostgREST request with a few rows, keeping connections alive."""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    handshake_delay = 0.0
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        # Charge the simulated TCP + TLS handshake once per new connection
+        with StandInHandler.lock:
+            StandInHandler.connections += 1
+        time.sleep(self.handshake_delay)
+        super().setup()
+
+    def do_GET(self):
+        # Drain any request body so the connection can be reused
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps(ROWS).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def start_server(handshake_ms: float):
+    StandInHandler.handshake_delay = handshake_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def run_query(client):
+    start = time.perf_counter()
+    client.table("products").select("*").eq("product_id", 36).execute()
+    return time.perf_counter() - start
+
+def bench(label: str, make_client, queries: int, threads: int):
+    StandInHandler.connections = 0
+
+    def one(_):
+        start = time.perf_counter()
+        run_query(make_client())
+        return time.perf_counter() - start
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        latencies = sorted(pool.map(one, range(queries)))
+    wall = time.perf_counter() - wall_start
+
+    print(
+        f"{label:<22} p50={statistics.median(latencies) * 1000:7.2f}ms "
+        f"p95={latencies[int(len(latencies) * 0.95) - 1] * 1000:7.2f}ms "
+        f"qps={queries / wall:8.1f} connections={StandInHandler.connections}"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--pool-size", type=int, default=10)
+    parser.add_argument("--handshake-ms", type=float, default=30.0,
+                        help="simulated per-connection TCP/TLS setup cost")
+    args = parser.parse_args()
+
+    server, url = start_server(args.handshake_ms)
+    try:
+        bench("client per query", lambda: create_client(url, FAKE_KEY), args.queries, args.threads)
+
+        shared = create_pooled_client(url, FAKE_KEY, pool_size=args.pool_size)
+        bench("shared pooled client", lambda: shared, args.queries, args.threads)
+    finally:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Compare the Chroma and NumPy policy stores: cold load time (fresh process: import,
+open, first query) and per-query latency of `similarity_search_by_vector`.
+
+Queries are stored chunk vectors with a little noise, so no embedding model is needed.
+The NumPy snapshot is exported from the Chroma store if it doesn't exist yet.
+
+Usage:
+    python benchmarks/bench_vector_store.py
+    python benchmarks/bench_vector_store.py --k 4 --queries 200
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from policy.tools.vector_store import CHUNKS_FILE, NUMPY_SNAPSHOT_DIRECTORY, create_policy_store, export_snapshot
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Runs in the child process; prints seconds from the first import to the first answer
+CHILD = r"""
+import sys, time
+start = time.perf_counter()
+from policy.tools.vector_store import create_policy_store
+store = create_policy_store(sys.argv[1])
+store.similarity_search_by_vector([0.1] * int(sys.argv[2]), k=2)
+print(time.perf_counter() - start)
+"""
+
+def cold_load_s(backend: str, dimension: int, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-c", CHILD, backend, str(dimension)], cwd=ROOT,
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            raise SystemExit(f"{backend} child process failed:\n{result.stderr}")
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+    return statistics.median(timings)
+
+def query_latency_us(store, vectors, k: int, repeats: int) -> dict:
+    store.similarity_search_by_vector(vectors[0], k=k)
+    timings = []
+    for _ in range(repeats):
+        for vector in vectors:
+            start = time.perf_counter()
+            store.similarity_search_by_vector(vector, k=k)
+            timings.append((time.perf_counter() - start) * 1e6)
+    return {"median_us": statistics.median(timings), "p95_us": statistics.quantiles(timings, n=20)[-1]}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--k", type=int, default=2)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--runs", type=int, default=3, help="fresh processes per cold-load measurement")
+    args = parser.parse_args()
+
+    chroma = create_policy_store("chroma")
+    data = chroma.get(include=["embeddings", "documents"])
+    stored = np.asarray(data["embeddings"], dtype=np.float32)
+    if not len(stored):
+        raise SystemExit("The Chroma store is empty; run policy/part1_conversion.py first")
+    if not os.path.exists(os.path.join(NUMPY_SNAPSHOT_DIRECTORY, CHUNKS_FILE)):
+        export_snapshot(chroma, NUMPY_SNAPSHOT_DIRECTORY)
+        print(f"Exported NumPy snapshot to {NUMPY_SNAPSHOT_DIRECTORY}")
+    numpy_store = create_policy_store("numpy")
+
+    rng = np.random.default_rng(0)
+    picks = stored[rng.integers(0, len(stored), args.queries)]
+    vectors = (picks + rng.normal(0, 0.02, picks.shape).astype(np.float32)).tolist()
+    print(f"{len(stored)} chunks, dimension {stored.shape[1]}, {args.queries} queries, k={args.k}\n")
+
+    for name, store in (("chroma", chroma), ("numpy", numpy_store)):
+        load = cold_load_s(name, stored.shape[1], args.runs)
+        latency = query_latency_us(store, vectors, args.k, args.repeats)
+        print(f"{name:<7} cold load={load * 1000:8.1f}ms  query median={latency['median_us']:8.1f}us  "
+              f"p95={latency['p95_us']:8.1f}us")
+
+    agree = np.mean([
+        {d.page_content for d in chroma.similarity_search_by_vector(v, k=args.k)}
+        == {d.page_content for d in numpy_store.similarity_search_by_vector(v, k=args.k)}
+        for v in vectors
+    ])
+    print(f"\nqueries with identical top-{args.k}: {agree:.1%}")
+
+if __name__ == "__main__":
+    main()
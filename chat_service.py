@@ -0,0 +1,274 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Optional
+import uvicorn
+import resources
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from starlette.background import BackgroundTask
+from head_agent import HeadAgent
+from llm_client import aclose_llm_clients, llm_stats
+from realtime_db_agent.db_client import aclose_async_supabase_client, close_supabase_client
+from realtime_db_agent.query_log import configure_query_log, shutdown_query_log
+
+# Load environment variables
+resources.load_settings()
+
+logger = logging.getLogger(__name__)
+
+# Service configuration
+CHAT_MAX_CONCURRENCY = int(os.getenv("CHAT_MAX_CONCURRENCY", "32"))
+CHAT_MAX_QUEUE = int(os.getenv("CHAT_MAX_QUEUE", "64"))
+CHAT_QUEUE_TIMEOUT = float(os.getenv("CHAT_QUEUE_TIMEOUT", "10"))
+CHAT_SESSION_TTL = float(os.getenv("CHAT_SESSION_TTL", "1800"))
+CHAT_MAX_SESSIONS = int(os.getenv("CHAT_MAX_SESSIONS", "10000"))
+CHAT_SHUTDOWN_GRACE = float(os.getenv("CHAT_SHUTDOWN_GRACE", "30"))
+# Build the embedding model, vector store and clients before serving instead of on first use
+CHAT_WARMUP = os.getenv("CHAT_WARMUP", "false").lower() == "true"
+
+class Session:
+    """One conversation: its HeadAgent plus a lock so its turns run one at a time."""
+
+    def __init__(self, agent):
+        self.agent = agent
+        self.lock = asyncio.Lock()
+        self.last_seen = time.monotonic()
+
+class SessionStore:
+    """
+    Server-side conversations keyed by session id.
+    Idle sessions expire after `ttl` seconds and the least recently used ones are
+    evicted beyond `max_sessions`, so memory stays bounded under churn.
+    """
+
+    def __init__(self, agent_factory=HeadAgent, ttl: float = CHAT_SESSION_TTL, max_sessions: int = CHAT_MAX_SESSIONS):
+        self.agent_factory = agent_factory
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._created = 0
+        self._evicted = 0
+
+    def _evict(self):
+        now = time.monotonic()
+        # Oldest first: stop at the first session that is neither expired nor over capacity
+        for session_id in list(self._sessions):
+            session = self._sessions[session_id]
+            if len(self._sessions) <= self.max_sessions and now - session.last_seen <= self.ttl:
+                break
+            # Never drop a session that is mid-turn
+            if session.lock.locked():
+                continue
+            del self._sessions[session_id]
+            self._evicted += 1
+
+    def get_or_create(self, session_id: Optional[str] = None):
+        """Return `(session_id, session)`, starting a new conversation for unknown or missing ids."""
+        session = self._sessions.get(session_id) if session_id else None
+        if session is None:
+            session_id = session_id or uuid.uuid4().hex
+            session = Session(self.agent_factory())
+            self._sessions[session_id] = session
+            self._created += 1
+        session.last_seen = time.monotonic()
+        self._sessions.move_to_end(session_id)
+        self._evict()
+        return session_id, session
+
+    def drop(self, session_id: str) -> bool:
+        """Forget a conversation. Returns False if the id was unknown."""
+        return self._sessions.pop(session_id, None) is not None
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def stats(self) -> dict:
+        return {"sessions": len(self._sessions), "created": self._created, "evicted": self._evicted}
+
+class AdmissionController:
+    """
+    Caps how many chat requests run at once.
+    Up to `max_queued` extra requests wait for a slot (at most `queue_timeout` seconds);
+    anything beyond that is rejected with 429 so clients back off instead of piling up.
+    Once draining starts, new requests get 503 while in-flight ones finish.
+    """
+
+    def __init__(self, max_active: int = CHAT_MAX_CONCURRENCY, max_queued: int = CHAT_MAX_QUEUE,
+                 queue_timeout: float = CHAT_QUEUE_TIMEOUT):
+        self.max_active = max_active
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self._slots = asyncio.Semaphore(max_active)
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self.active = 0
+        self.queued = 0
+        self.rejected = 0
+        self.draining = False
+
+    def _reject(self, detail: str):
+        self.rejected += 1
+        raise HTTPException(status_code=429, detail=detail, headers={"Retry-After": str(max(1, round(self.queue_timeout)))})
+
+    async def acquire(self):
+        """Wait for a request slot, or raise HTTPException (429 when overloaded, 503 when draining)."""
+        if self.draining:
+            raise HTTPException(status_code=503, detail="Service is shutting down")
+        # Count synchronously: the semaphore only updates once a waiter gets scheduled
+        if self.active + self.queued >= self.max_active + self.max_queued:
+            self._reject("Too many requests in flight, please retry shortly")
+
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._reject("Timed out waiting for a free slot, please retry shortly")
+        finally:
+            self.queued -= 1
+
+        self.active += 1
+        self._idle.clear()
+
+    def release(self):
+        self.active -= 1
+        self._slots.release()
+        if self.active == 0:
+            self._idle.set()
+
+    async def drain(self, timeout: float = CHAT_SHUTDOWN_GRACE) -> bool:
+        """Stop admitting requests and wait for in-flight ones. Returns False if some were still running."""
+        self.draining = True
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "max_active": self.max_active,
+            "max_queued": self.max_queued,
+            "draining": self.draining
+        }
+
+class ChatRequest(BaseModel):
+    message: str
+    session_id: Optional[str] = None
+
+class ChatResponse(BaseModel):
+    session_id: str
+    response: str
+
+def create_app(agent_factory=HeadAgent, max_active: int = CHAT_MAX_CONCURRENCY, max_queued: int = CHAT_MAX_QUEUE,
+               queue_timeout: float = CHAT_QUEUE_TIMEOUT, shutdown_grace: float = CHAT_SHUTDOWN_GRACE,
+               warmup: bool = CHAT_WARMUP) -> FastAPI:
+    """Build the chat service around `agent_factory` (one agent per session)."""
+    sessions = SessionStore(agent_factory)
+    admission = AdmissionController(max_active, max_queued, queue_timeout)
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # Started here so every way of serving the app (main, `uvicorn chat_service:app`) logs queries
+        configure_query_log()
+        if warmup:
+            await asyncio.to_thread(resources.warmup)
+        yield
+        # Graceful shutdown: finish in-flight turns, then close pooled connections
+        if not await admission.drain(shutdown_grace):
+            logger.warning("%d chat requests still running after %ss", admission.active, shutdown_grace)
+        await aclose_async_supabase_client()
+        close_supabase_client()
+        await aclose_llm_clients()
+        shutdown_query_log()
+
+    app = FastAPI(title="E-Commerce Chatbot", lifespan=lifespan)
+    app.state.sessions = sessions
+    app.state.admission = admission
+
+    @app.post("/chat", response_model=ChatResponse)
+    async def chat(request: ChatRequest):
+        await admission.acquire()
+        try:
+            session_id, session = sessions.get_or_create(request.session_id)
+            async with session.lock:
+                response = await session.agent.aprocess_query(request.message)
+            return ChatResponse(session_id=session_id, response=response)
+        finally:
+            admission.release()
+
+    @app.post("/chat/stream")
+    async def chat_stream(request: ChatRequest):
+        """Server-sent events: `status` and `token` events as in `process_query_stream`, then `done`."""
+        await admission.acquire()
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                admission.release()
+
+        try:
+            session_id, session = sessions.get_or_create(request.session_id)
+        except BaseException:
+            release()
+            raise
+
+        async def events():
+            try:
+                async with session.lock:
+                    async for event in session.agent.aprocess_query_stream(request.message):
+                        yield f"data: {json.dumps(event)}\n\n"
+                yield f"data: {json.dumps({'type': 'done', 'session_id': session_id})}\n\n"
+            finally:
+                release()
+
+        # The background task also frees the slot if the client disconnects before streaming starts
+        return StreamingResponse(
+            events(),
+            media_type="text/event-stream",
+            headers={"X-Session-Id": session_id, "Cache-Control": "no-cache"},
+            background=BackgroundTask(release)
+        )
+
+    @app.delete("/sessions/{session_id}")
+    async def end_session(session_id: str):
+        if not sessions.drop(session_id):
+            raise HTTPException(status_code=404, detail="Unknown session")
+        return {"session_id": session_id, "ended": True}
+
+    @app.get("/health")
+    async def health():
+        return {
+            "status": "draining" if admission.draining else "ok",
+            "admission": admission.stats(),
+            "sessions": sessions.stats(),
+            "startup": resources.stats(),
+            "llm": llm_stats()
+        }
+
+    return app
+
+app = create_app()
+
+def main():
+    # One worker process = one event loop, which the async clients require
+    uvicorn.run(
+        "chat_service:app",
+        host=os.getenv("CHAT_HOST", "0.0.0.0"),
+        port=int(os.getenv("CHAT_PORT", "8000")),
+        timeout_graceful_shutdown=int(CHAT_SHUTDOWN_GRACE)
+    )
+
+if __name__ == "__main__":
+    main()
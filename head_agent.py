@@ -1,35 +1,68 @@
+import asyncio
 import os
 import sys
-from dotenv import load_dotenv
-from openai import OpenAI
-from langchain_groq import ChatGroq
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, as_completed
 from langchain_core.messages import HumanMessage
-from policy.agent import policy_agent
-from realtime_db_agent.agent import db_agent
-from reflection_agent.agent import reflection_agent, update_conversation_context
+import resources
+from policy.agent import apolicy_agent, policy_agent
+from policy.tools.extractive import is_extractive, strip_marker
+from realtime_db_agent.agent import adb_agent, db_agent
+from realtime_db_agent.query_log import configure_query_log
+from reflection_agent.agent import areflection_agent, areflection_agent_stream, reflection_agent_stream
+from reflection_agent.memory import ConversationMemory
+from router.embedding_router import AGENT_TYPES, EmbeddingRouter
+from tracing import current_span, in_context, span, trace
 
 # Load environment variables
-load_dotenv()
+resources.load_settings()
 
-# Initialize LLMs
-client = OpenAI(
-    base_url="https://api.studio.nebius.com/v1/",
-    api_key=os.environ.get("NEBIUS_API_KEY")
-)
+# Initialize LLM (built on first use and shared with other agents using the same model)
+CLASSIFIER_MODEL = "llama-3.3-70b-versatile"
+llm = resources.chat_model(CLASSIFIER_MODEL, temperature=0.2)
 
-llm = ChatGroq(
-    api_key=os.getenv("GROQ_API_KEY"),
-    model="llama-3.3-70b-versatile",
-    temperature=0.2
-)
+# Local classifier that answers most routing decisions without an LLM call
+embeddings = resources.lazy("embeddings")
+resources.register("router", lambda: EmbeddingRouter(embeddings))
+router = resources.lazy("router")
 
-class HeadAgent:
-    def __init__(self):
-        self.conversation_context = ""
-    
-    def determine_agent(self, query: str) -> str:
-        """Determine which sub-agent(s) should handle the query."""
-        prompt = f"""
+EMPTY_QUERY_REPLY = "I'm here to help! Please ask me anything about our products or policies."
+ERROR_REPLY = "I apologize, but I'm having trouble processing your request right now. Could you please try rephrasing your question?"
+
+# Sub-agents run concurrently on a shared, bounded executor
+AGENT_MAX_WORKERS = int(os.getenv("AGENT_MAX_WORKERS", "8"))
+AGENT_TIMEOUT = float(os.getenv("AGENT_TIMEOUT", "30"))
+agent_executor = ThreadPoolExecutor(max_workers=AGENT_MAX_WORKERS, thread_name_prefix="sub-agent")
+
+# Reflection budgets (unset means unlimited)
+REFLECTION_LATENCY_BUDGET = os.getenv("REFLECTION_LATENCY_BUDGET", "false").lower() == "true"
+REFLECTION_MAX_LLM_CALLS = int(os.getenv("REFLECTION_MAX_LLM_CALLS")) if os.getenv("REFLECTION_MAX_LLM_CALLS") else None
+REFLECTION_MAX_WALL_TIME = float(os.getenv("REFLECTION_MAX_WALL_TIME")) if os.getenv("REFLECTION_MAX_WALL_TIME") else None
+
+# Event loop that serves the sync API. The async LLM and Supabase clients bind their
+# connections to the first loop that uses them, so a process should drive the async
+# pipeline from a single loop: either this one (via the sync methods) or its own.
+_pipeline_loop = None
+_pipeline_loop_lock = threading.Lock()
+
+def get_pipeline_loop() -> asyncio.AbstractEventLoop:
+    """Return the background event loop used by the sync wrappers, starting it on first use."""
+    global _pipeline_loop
+    if _pipeline_loop is None:
+        with _pipeline_loop_lock:
+            if _pipeline_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="pipeline-loop", daemon=True).start()
+                _pipeline_loop = loop
+    return _pipeline_loop
+
+def run_in_pipeline_loop(coroutine):
+    """Run a coroutine on the background pipeline loop and block until it finishes."""
+    return asyncio.run_coroutine_threadsafe(coroutine, get_pipeline_loop()).result()
+
+def classification_prompt(query: str) -> str:
+    """Prompt asking the LLM to classify which sub-agents a query needs."""
+    return f"""
         Analyze this user query and determine what type of information is needed:
         
         User Query: "{query}"
@@ -49,87 +82,366 @@ class HeadAgent:
         
         Return ONLY one word: policy, database, both, or general
         """
-        
+
+def parse_classification(content: str):
+    """Normalize the LLM's classification, or None if it isn't a known category."""
+    agent_type = content.strip().lower()
+    
+    # Validate response
+    if agent_type not in AGENT_TYPES:
+        return None
+    return agent_type
+
+class HeadAgent:
+    def __init__(self, agent_timeout: float = AGENT_TIMEOUT, latency_budget: bool = REFLECTION_LATENCY_BUDGET,
+                 max_llm_calls: int = REFLECTION_MAX_LLM_CALLS, max_wall_time: float = REFLECTION_MAX_WALL_TIME):
+        # Recent exchanges, rendered within a token budget for the reflection prompt
+        self.memory = ConversationMemory()
+        self.agent_timeout = agent_timeout
+        # Latency-budget mode replaces the LLM judge in reflection with a local scorer
+        self.latency_budget = latency_budget
+        self.max_llm_calls = max_llm_calls
+        self.max_wall_time = max_wall_time
+    
+    def determine_agent(self, query: str) -> str:
+        """Determine which sub-agent(s) should handle the query."""
+        with span("determine_agent") as stage:
+            try:
+                agent_type = router.route(query)
+                if agent_type is not None:
+                    stage.set(agent_type=agent_type, route_source="router")
+                    return agent_type
+            except Exception as e:
+                stage.event("router_error", message=str(e))
+            
+            agent_type = self.classify_with_llm(query)
+            if agent_type is None:
+                stage.set(agent_type="general", route_source="default")
+                return "general"  # Safe default
+            
+            # Keep the LLM's decision as a training example for the local router
+            router.record(query, agent_type)
+            stage.set(agent_type=agent_type, route_source="llm")
+            return agent_type
+    
+    def classify_with_llm(self, query: str):
+        """
+        Ask the LLM to classify the query (used when the local router is unsure).
+        Returns None if the LLM fails or answers with an unknown category.
+        """
+        messages = [HumanMessage(content=classification_prompt(query))]
+        try:
+            with span("llm", model=CLASSIFIER_MODEL, purpose="classify") as call:
+                response = llm.invoke(messages)
+                call.record_llm(response, messages)
+            return parse_classification(response.content)
+        except Exception:
+            return None
+    
+    async def aclassify_with_llm(self, query: str):
+        """Async version of classify_with_llm."""
+        messages = [HumanMessage(content=classification_prompt(query))]
         try:
-            response = llm.invoke([HumanMessage(content=prompt)])
-            agent_type = response.content.strip().lower()
+            with span("llm", model=CLASSIFIER_MODEL, purpose="classify") as call:
+                response = await llm.ainvoke(messages)
+                call.record_llm(response, messages)
+            return parse_classification(response.content)
+        except Exception:
+            return None
+    
+    async def adetermine_agent(self, query: str) -> str:
+        """Async version of determine_agent; the local router embeds in a worker thread."""
+        with span("determine_agent") as stage:
+            try:
+                agent_type = await asyncio.to_thread(router.route, query)
+                if agent_type is not None:
+                    stage.set(agent_type=agent_type, route_source="router")
+                    return agent_type
+            except Exception as e:
+                stage.event("router_error", message=str(e))
             
-            # Validate response
-            if agent_type not in ["policy", "database", "both", "general"]:
-                agent_type = "general"  # Safe default
-                
-            print(f"[DEBUG] Query classified as: {agent_type}")
+            agent_type = await self.aclassify_with_llm(query)
+            if agent_type is None:
+                stage.set(agent_type="general", route_source="default")
+                return "general"  # Safe default
+            
+            # Appends to the router's example file
+            await asyncio.to_thread(router.record, query, agent_type)
+            stage.set(agent_type=agent_type, route_source="llm")
             return agent_type
+    
+    def select_agents(self, agent_type: str) -> dict:
+        """Map a classification to the sub-agents that should answer it."""
+        if agent_type == "database":
+            return {"database": db_agent}
+        elif agent_type == "policy":
+            return {"policy": policy_agent}
+        elif agent_type == "both":
+            return {"database": db_agent, "policy": policy_agent}
+        
+        # For "general" queries, we don't query any specific agents
+        # The reflection agent will handle general conversation
+        return {}
+    
+    def aselect_agents(self, agent_type: str) -> dict:
+        """Async counterpart of select_agents."""
+        async_agents = {"database": adb_agent, "policy": apolicy_agent}
+        return {name: async_agents[name] for name in self.select_agents(agent_type)}
+    
+    @staticmethod
+    def _run_agent(name: str, agent, query: str):
+        with span(f"agent.{name}"):
+            return agent(query)
+    
+    @staticmethod
+    async def _arun_agent(name: str, agent, query: str):
+        with span(f"agent.{name}"):
+            return await agent(query)
+    
+    async def aiter_agent_results(self, query: str, agents: dict):
+        """
+        Run the given async sub-agents concurrently and yield `(name, output)` as each one finishes.
+        Agents share one deadline; a failing or slow agent only loses its own output.
+        """
+        tasks = {asyncio.ensure_future(self._arun_agent(name, agent, query)): name for name, agent in agents.items()}
+        deadline = asyncio.get_running_loop().time() + self.agent_timeout
+        pending = set(tasks)
+        
+        try:
+            while pending:
+                timeout = deadline - asyncio.get_running_loop().time()
+                done, pending = await asyncio.wait(pending, timeout=max(timeout, 0), return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    break
+                for task in done:
+                    name = tasks[task]
+                    try:
+                        yield name, task.result()
+                    except Exception:
+                        # The agent's own span carries the error
+                        yield name, ""
             
-        except Exception as e:
-            print(f"[DEBUG] Classification error: {e}")
-            return "general"
+            for task in pending:
+                task.cancel()
+                self._record_timeout(tasks[task])
+            # Let the cancellations land so the agents' spans close inside this trace
+            await asyncio.gather(*pending, return_exceptions=True)
+            for task in pending:
+                yield tasks[task], ""
+        finally:
+            # A consumer that stops early (e.g. a disconnected client) must not leak agent calls
+            for task in tasks:
+                task.cancel()
+    
+    async def arun_agents(self, query: str, agents: dict) -> dict:
+        """Run the given async sub-agents concurrently and collect their outputs by name."""
+        return {name: output async for name, output in self.aiter_agent_results(query, agents)}
+    
+    def iter_agent_results(self, query: str, agents: dict):
+        """
+        Run the given sub-agents concurrently and yield `(name, output)` as each one finishes.
+        Agents share one deadline; a failing or slow agent only loses its own output.
+        """
+        run_agent = in_context(self._run_agent)
+        futures = {agent_executor.submit(run_agent, name, agent, query): name for name, agent in agents.items()}
+        
+        try:
+            for future in as_completed(futures, timeout=self.agent_timeout):
+                name = futures[future]
+                try:
+                    yield name, future.result()
+                except Exception:
+                    # The agent's own span carries the error
+                    yield name, ""
+        except FutureTimeoutError:
+            for future, name in futures.items():
+                if not future.done():
+                    future.cancel()
+                    self._record_timeout(name)
+                    yield name, ""
+    
+    def _record_timeout(self, name: str):
+        stage = current_span()
+        if stage is not None:
+            stage.event("agent_timeout", agent=name, timeout_s=self.agent_timeout)
+    
+    def run_agents(self, query: str, agents: dict) -> dict:
+        """Run the given sub-agents concurrently and collect their outputs by name."""
+        return dict(self.iter_agent_results(query, agents))
     
     def get_agent_responses(self, query: str, agent_type: str):
         """Get responses from the appropriate agents based on classification."""
-        db_output = ""
-        policy_output = ""
+        agents = self.select_agents(agent_type)
+        with span("get_agent_responses", agents=list(agents)) as stage:
+            outputs = self.run_agents(query, agents) if agents else {}
+            stage.set(answered=[name for name, output in outputs.items() if output])
         
-        try:
-            if agent_type == "database":
-                print("[DEBUG] Querying Database Agent only...")
-                db_output = db_agent(query)
+        return outputs.get("database", ""), outputs.get("policy", "")
+    
+    async def aget_agent_responses(self, query: str, agent_type: str):
+        """Async version of get_agent_responses."""
+        agents = self.aselect_agents(agent_type)
+        with span("get_agent_responses", agents=list(agents)) as stage:
+            outputs = await self.arun_agents(query, agents) if agents else {}
+            stage.set(answered=[name for name, output in outputs.items() if output])
+        
+        return outputs.get("database", ""), outputs.get("policy", "")
+    
+    @staticmethod
+    def extractive_reply(db_output: str, policy_output: str):
+        """
+        The policy agent's quoted answer when it is final (extractive and nothing from the
+        database to combine it with), so reflection can be skipped; otherwise None.
+        """
+        if is_extractive(policy_output) and not db_output:
+            if current_span() is not None:
+                current_span().set(extractive=True)
+            return strip_marker(policy_output)
+        return None
+    
+    def process_query(self, query: str) -> str:
+        """Main method to process any user query (runs `aprocess_query` on the pipeline loop)."""
+        return run_in_pipeline_loop(self.aprocess_query(query))
+    
+    async def aprocess_query(self, query: str) -> str:
+        """
+        Process a user query without blocking a thread on network I/O.
+        LLM, Supabase and retrieval calls are awaited, so one event loop can serve many sessions.
+        """
+        if not query or query.strip() == "":
+            return EMPTY_QUERY_REPLY
+        
+        with trace("chat_turn", query_chars=len(query)) as request:
+            try:
+                # Step 1: Determine which agents to use
+                agent_type = await self.adetermine_agent(query)
                 
-            elif agent_type == "policy":
-                print("[DEBUG] Querying Policy Agent only...")
-                policy_output = policy_agent(query)
+                # Step 2: Get responses from appropriate agents
+                db_output, policy_output = await self.aget_agent_responses(query, agent_type)
                 
-            elif agent_type == "both":
-                print("[DEBUG] Querying both Database and Policy Agents...")
-                db_output = db_agent(query)
-                policy_output = policy_agent(query)
+                # Step 3: Use reflection agent to synthesize final response (unless the policy text already answers it)
+                final_response = self.extractive_reply(db_output, policy_output)
+                if final_response is None:
+                    final_response = await areflection_agent(
+                        db_output=db_output,
+                        policy_output=strip_marker(policy_output),
+                        previous_context=self.memory.render(),
+                        user_query=query,  # This was missing in the original!
+                        latency_budget=self.latency_budget,
+                        max_llm_calls=self.max_llm_calls,
+                        max_wall_time=self.max_wall_time,
+                        embeddings=embeddings
+                    )
                 
-            # For "general" queries, we don't query any specific agents
-            # The reflection agent will handle general conversation
-            
-        except Exception as e:
-            print(f"[DEBUG] Agent query error: {e}")
-        
-        return db_output, policy_output
+                # Step 4: Update conversation context for future interactions
+                self.memory.add(query, final_response)
+                resources.milestone("first_answer")
+                
+                return final_response
+                
+            except Exception as e:
+                request.error(e)
+                return ERROR_REPLY
     
-    def process_query(self, query: str) -> str:
-        """Main method to process any user query."""
+    def process_query_stream(self, query: str):
+        """
+        Streaming version of `process_query`.
+        Yields `{"type": "status", "content": ...}` progress events while routing and
+        sub-agents run, then `{"type": "token", "content": ...}` events for the answer.
+        """
         if not query or query.strip() == "":
-            return "I'm here to help! Please ask me anything about our products or policies."
+            yield {"type": "token", "content": EMPTY_QUERY_REPLY}
+            return
         
-        try:
-            # Step 1: Determine which agents to use
-            agent_type = self.determine_agent(query)
-            
-            # Step 2: Get responses from appropriate agents
-            db_output, policy_output = self.get_agent_responses(query, agent_type)
-            
-            print(f"[DEBUG] DB Output: {db_output[:100]}..." if db_output else "[DEBUG] No DB output")
-            print(f"[DEBUG] Policy Output: {policy_output[:100]}..." if policy_output else "[DEBUG] No Policy output")
-            
-            # Step 3: Use reflection agent to synthesize final response
-            print("[DEBUG] Generating final response with Reflection Agent...")
-            final_response = reflection_agent(
-                db_output=db_output,
-                policy_output=policy_output,
-                previous_context=self.conversation_context,
-                user_query=query  # This was missing in the original!
-            )
-            
-            # Step 4: Update conversation context for future interactions
-            self.conversation_context = update_conversation_context(
-                self.conversation_context,
-                query,
-                final_response
-            )
-            
-            return final_response
-            
-        except Exception as e:
-            print(f"[ERROR] Processing failed: {e}")
-            return "I apologize, but I'm having trouble processing your request right now. Could you please try rephrasing your question?"
+        with trace("chat_turn", query_chars=len(query), streaming=True) as request:
+            try:
+                # Step 1: Determine which agents to use
+                yield {"type": "status", "content": "Understanding your question..."}
+                agent_type = self.determine_agent(query)
+                yield {"type": "status", "content": f"Routed to: {agent_type}"}
+                
+                # Step 2: Report each sub-agent as soon as it finishes
+                outputs = {}
+                agents = self.select_agents(agent_type)
+                with span("get_agent_responses", agents=list(agents)) as stage:
+                    for name, output in self.iter_agent_results(query, agents):
+                        outputs[name] = output
+                        state = "answered" if output else "had nothing to add"
+                        yield {"type": "status", "content": f"{name.capitalize()} agent {state}"}
+                    stage.set(answered=[name for name, output in outputs.items() if output])
+                
+                # Step 3: Stream the final synthesis (or the quoted policy text, which needs none)
+                final_response = self.extractive_reply(outputs.get("database", ""), outputs.get("policy", ""))
+                if final_response is not None:
+                    yield {"type": "token", "content": final_response}
+                else:
+                    yield {"type": "status", "content": "Writing the answer..."}
+                    final_response = ""
+                    for token in reflection_agent_stream(
+                        db_output=outputs.get("database", ""),
+                        policy_output=strip_marker(outputs.get("policy", "")),
+                        previous_context=self.memory.render(),
+                        user_query=query
+                    ):
+                        final_response += token
+                        yield {"type": "token", "content": token}
+                
+                # Step 4: Record the complete answer for future interactions
+                self.memory.add(query, final_response.strip())
+                resources.milestone("first_answer")
+                
+            except Exception as e:
+                request.error(e)
+                yield {"type": "token", "content": ERROR_REPLY}
+
+    async def aprocess_query_stream(self, query: str):
+        """Async version of `process_query_stream`, yielding the same events."""
+        if not query or query.strip() == "":
+            yield {"type": "token", "content": EMPTY_QUERY_REPLY}
+            return
+        
+        with trace("chat_turn", query_chars=len(query), streaming=True) as request:
+            try:
+                yield {"type": "status", "content": "Understanding your question..."}
+                agent_type = await self.adetermine_agent(query)
+                yield {"type": "status", "content": f"Routed to: {agent_type}"}
+                
+                outputs = {}
+                agents = self.aselect_agents(agent_type)
+                with span("get_agent_responses", agents=list(agents)) as stage:
+                    async for name, output in self.aiter_agent_results(query, agents):
+                        outputs[name] = output
+                        state = "answered" if output else "had nothing to add"
+                        yield {"type": "status", "content": f"{name.capitalize()} agent {state}"}
+                    stage.set(answered=[name for name, output in outputs.items() if output])
+                
+                final_response = self.extractive_reply(outputs.get("database", ""), outputs.get("policy", ""))
+                if final_response is not None:
+                    yield {"type": "token", "content": final_response}
+                else:
+                    yield {"type": "status", "content": "Writing the answer..."}
+                    final_response = ""
+                    async for token in areflection_agent_stream(
+                        db_output=outputs.get("database", ""),
+                        policy_output=strip_marker(outputs.get("policy", "")),
+                        previous_context=self.memory.render(),
+                        user_query=query
+                    ):
+                        final_response += token
+                        yield {"type": "token", "content": token}
+                
+                self.memory.add(query, final_response.strip())
+                resources.milestone("first_answer")
+                
+            except Exception as e:
+                request.error(e)
+                yield {"type": "token", "content": ERROR_REPLY}
+
+# Startup timing: everything is imported, heavy resources are still unbuilt
+resources.milestone("imported")
 
 def main():
+    configure_query_log()
     agent = HeadAgent()
     print("🤖 Hello! I'm your AI assistant. I can help you with:")
     print("   • Product information and availability")
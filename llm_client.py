@@ -0,0 +1,493 @@
+"""
+One client for every LLM call: Groq and Nebius both speak the OpenAI chat-completions
+protocol, so a single httpx-based client gives all agents the same timeouts, retries,
+hedging and in-flight coalescing. Point the base URLs at a local OpenAI-compatible stub to test.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import weakref
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import NamedTuple
+import httpx
+import resources
+from tracing import current_span
+resources.load_settings()
+
+# Per-attempt timeout in seconds; a call makes at most LLM_MAX_RETRIES + 1 attempts
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+# Overall deadline for one call in seconds: attempts and backoff together never run past it
+LLM_CALL_BUDGET = float(os.getenv("LLM_CALL_BUDGET", "60"))
+# Exponential backoff with full jitter between attempts (Retry-After wins when the server sends it)
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+# Send a second, identical request if an attempt hasn't answered after this many seconds (unset: never)
+LLM_HEDGE_AFTER = float(os.getenv("LLM_HEDGE_AFTER")) if os.getenv("LLM_HEDGE_AFTER") else None
+# Seconds without hedging after the provider throttles us (a 429 or a Retry-After header)
+LLM_HEDGE_COOLDOWN = float(os.getenv("LLM_HEDGE_COOLDOWN", "30"))
+# Concurrent calls with the same model, temperature and messages share one upstream request
+LLM_COALESCE = os.getenv("LLM_COALESCE", "true").lower() == "true"
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "20"))
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+ROLES = {"human": "user", "ai": "assistant", "system": "system", "user": "user", "assistant": "assistant"}
+
+class LLMError(Exception):
+    """An LLM request that failed for good (non-retryable status, or retries exhausted)."""
+    def __init__(self, message: str, status: int = None):
+        super().__init__(message)
+        self.status = status
+
+class LLMTimeoutError(LLMError):
+    pass
+
+class Usage(NamedTuple):
+    prompt_tokens: int
+    completion_tokens: int
+
+class Completion(NamedTuple):
+    """A reply (or a streamed delta); `content` and `usage` match what the agents and tracing read."""
+    content: str
+    usage: Usage = None
+    model: str = None
+    attempts: int = 1
+    hedged: bool = False
+
+def to_messages(prompt) -> list:
+    """OpenAI-style message dicts from a string, dicts, or LangChain messages."""
+    if isinstance(prompt, str):
+        return [{"role": "user", "content": prompt}]
+    return [message if isinstance(message, dict) else {"role": ROLES.get(message.type, "user"), "content": message.content}
+            for message in prompt]
+
+class _Attempt(NamedTuple):
+    """Outcome of one HTTP request: a completion, or the error with whether and when to retry."""
+    completion: Completion = None
+    error: LLMError = None
+    retryable: bool = False
+    retry_after: float = None
+
+def _retry_after(response: httpx.Response):
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+def _parse_completion(data: dict, attempts: int) -> Completion:
+    usage = data.get("usage")
+    return Completion(
+        content=data["choices"][0]["message"]["content"] or "",
+        usage=Usage(usage.get("prompt_tokens"), usage.get("completion_tokens")) if usage else None,
+        model=data.get("model"),
+        attempts=attempts
+    )
+
+def _parse_stream_line(line: str):
+    """The text delta in one server-sent event line; None for keep-alives, "" at the end of the stream."""
+    if not line.startswith("data:"):
+        return None
+    data = line[len("data:"):].strip()
+    if data == "[DONE]":
+        return ""
+    choices = json.loads(data).get("choices") or [{}]
+    return choices[0].get("delta", {}).get("content") or None
+
+_clients = weakref.WeakSet()
+
+class LLMClient:
+    """
+    OpenAI-compatible chat client shared by every agent talking to one provider.
+    Sync calls use a pooled `httpx.Client`; async calls use one `httpx.AsyncClient` per event loop.
+    """
+
+    def __init__(self, base_url: str, api_key: str = None, name: str = "llm", timeout: float = LLM_TIMEOUT,
+                 max_retries: int = LLM_MAX_RETRIES, budget: float = LLM_CALL_BUDGET,
+                 backoff_base: float = LLM_BACKOFF_BASE, backoff_max: float = LLM_BACKOFF_MAX,
+                 hedge_after: float = LLM_HEDGE_AFTER, hedge_cooldown: float = LLM_HEDGE_COOLDOWN,
+                 coalesce: bool = LLM_COALESCE, pool_size: int = LLM_POOL_SIZE):
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.name = name
+        self.headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.budget = budget
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_after = hedge_after
+        self.hedge_cooldown = hedge_cooldown
+        self._hedge_paused_until = 0.0
+        self.coalesce = coalesce
+        self.limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        self.counters = {"requests": 0, "attempts": 0, "retries": 0, "timeouts": 0, "errors": 0, "out_of_budget": 0,
+                         "hedges": 0, "hedge_wins": 0, "coalesced": 0}
+        self._lock = threading.Lock()
+        self._client = None
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._inflight = {}
+        self._async_inflight = weakref.WeakKeyDictionary()
+        self._hedge_pool = None
+        _clients.add(self)
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"name": self.name, **self.counters}
+
+    def _sync_client(self) -> httpx.Client:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = httpx.Client(headers=self.headers, limits=self.limits)
+        return self._client
+
+    def _async_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = self._async_clients[loop] = httpx.AsyncClient(headers=self.headers, limits=self.limits)
+        return client
+
+    def _backoff(self, attempt: int, retry_after=None) -> float:
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _payload(self, messages, model: str, temperature: float, stream: bool = False) -> dict:
+        payload = {"model": model, "messages": to_messages(messages), "temperature": temperature}
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    @staticmethod
+    def _key(payload: dict) -> str:
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _failure(self, error: Exception, response: httpx.Response = None):
+        """The LLMError for a failed attempt and whether it is worth retrying."""
+        if isinstance(error, httpx.TimeoutException):
+            self._count("timeouts")
+            return LLMTimeoutError(f"{self.name} request timed out"), True
+        if isinstance(error, httpx.TransportError):
+            return LLMError(f"{self.name} request failed: {error}"), True
+        status = response.status_code
+        retry_after = _retry_after(response)
+        # A throttled provider would only be loaded further by duplicate requests
+        if status == 429 or retry_after is not None:
+            self._hedge_paused_until = time.monotonic() + max(retry_after or 0, self.hedge_cooldown)
+        return LLMError(f"{self.name} returned {status}: {response.text[:200]}", status), status in RETRYABLE_STATUS
+
+    def _outcome(self, response: httpx.Response, attempts: int) -> _Attempt:
+        if response.status_code < 400:
+            return _Attempt(_parse_completion(response.json(), attempts))
+        error, retryable = self._failure(None, response)
+        return _Attempt(None, error, retryable, _retry_after(response))
+
+    def _can_hedge(self) -> bool:
+        return self.hedge_after is not None and time.monotonic() >= self._hedge_paused_until
+
+    def _next_delay(self, attempt: int, outcome: _Attempt, deadline: float):
+        """Seconds to wait before retrying a failed attempt, or None to give up."""
+        if not outcome.retryable or attempt == self.max_retries:
+            return None
+        delay = self._backoff(attempt, outcome.retry_after)
+        if time.monotonic() + delay >= deadline:
+            self._count("out_of_budget")
+            return None
+        self._count("retries")
+        return delay
+
+    @staticmethod
+    def _annotate(completion: Completion, coalesced: bool = False):
+        """Note retries, hedging and coalescing on the caller's trace span."""
+        active = current_span()
+        if active is None:
+            return
+        if completion.attempts > 1:
+            active.set(attempts=completion.attempts)
+        if completion.hedged:
+            active.set(hedged=True)
+        if coalesced:
+            active.set(coalesced=True)
+
+    # Sync path
+
+    def _send(self, payload: dict, timeout: float, attempts: int) -> _Attempt:
+        """One HTTP request."""
+        self._count("attempts")
+        try:
+            response = self._sync_client().post(self.url, json=payload, timeout=timeout)
+        except httpx.HTTPError as e:
+            error, retryable = self._failure(e)
+            return _Attempt(None, error, retryable)
+        return self._outcome(response, attempts)
+
+    def _hedged_send(self, payload: dict, timeout: float, attempts: int) -> _Attempt:
+        """One attempt, duplicated if it hasn't answered after `hedge_after`; the first success wins."""
+        if not self._can_hedge():
+            return self._send(payload, timeout, attempts)
+        if self._hedge_pool is None:
+            with self._lock:
+                if self._hedge_pool is None:
+                    self._hedge_pool = ThreadPoolExecutor(max_workers=self.limits.max_connections,
+                                                          thread_name_prefix=f"{self.name}-hedge")
+        primary = self._hedge_pool.submit(self._send, payload, timeout, attempts)
+        done, _ = wait([primary], timeout=self.hedge_after)
+        if done or not self._can_hedge():
+            return primary.result()
+        self._count("hedges")
+        hedge = self._hedge_pool.submit(self._send, payload, timeout, attempts)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                outcome = future.result()
+                if outcome.completion is not None:
+                    # The slower request can't be interrupted; it finishes in the background
+                    if future is hedge:
+                        self._count("hedge_wins")
+                    return outcome._replace(completion=outcome.completion._replace(hedged=True))
+        return outcome
+
+    def _post(self, payload: dict, timeout: float) -> Completion:
+        """One logical request: up to max_retries + 1 attempts with backoff, all within the call budget."""
+        deadline = time.monotonic() + self.budget
+        for attempt in range(self.max_retries + 1):
+            outcome = self._hedged_send(payload, min(timeout, deadline - time.monotonic()), attempt + 1)
+            if outcome.completion is not None:
+                return outcome.completion
+            delay = self._next_delay(attempt, outcome, deadline)
+            if delay is None:
+                break
+            time.sleep(delay)
+        self._count("errors")
+        raise outcome.error
+
+    def complete(self, messages, model: str, temperature: float = 0.0, timeout: float = None) -> Completion:
+        """Chat completion for `messages` (a string, dicts or LangChain messages)."""
+        self._count("requests")
+        payload = self._payload(messages, model, temperature)
+        timeout = timeout or self.timeout
+        if not self.coalesce:
+            completion = self._post(payload, timeout)
+            self._annotate(completion)
+            return completion
+
+        key = self._key(payload)
+        with self._lock:
+            shared = self._inflight.get(key)
+            leader = shared is None
+            if leader:
+                shared = self._inflight[key] = Future()
+        if not leader:
+            self._count("coalesced")
+            completion = shared.result()
+            self._annotate(completion, coalesced=True)
+            return completion
+        try:
+            completion = self._post(payload, timeout)
+            shared.set_result(completion)
+        except BaseException as e:
+            shared.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+        self._annotate(completion)
+        return completion
+
+    def stream(self, messages, model: str, temperature: float = 0.0, timeout: float = None):
+        """Yield the reply as `Completion` deltas; attempts are retried only before the first token."""
+        self._count("requests")
+        payload = self._payload(messages, model, temperature, stream=True)
+        deadline = time.monotonic() + self.budget
+        for attempt in range(self.max_retries + 1):
+            self._count("attempts")
+            started = False
+            timeout_left = min(timeout or self.timeout, deadline - time.monotonic())
+            try:
+                with self._sync_client().stream("POST", self.url, json=payload, timeout=timeout_left) as response:
+                    if response.status_code < 400:
+                        for line in response.iter_lines():
+                            delta = _parse_stream_line(line)
+                            if delta == "":
+                                return
+                            if delta:
+                                started = True
+                                yield Completion(delta, model=model, attempts=attempt + 1)
+                        return
+                    response.read()
+                    outcome = self._outcome(response, attempt + 1)
+            except httpx.HTTPError as e:
+                if started:
+                    self._count("errors")
+                    raise self._failure(e)[0] from e
+                outcome = _Attempt(None, *self._failure(e))
+            delay = self._next_delay(attempt, outcome, deadline)
+            if delay is None:
+                break
+            time.sleep(delay)
+        self._count("errors")
+        raise outcome.error
+
+    # Async path
+
+    async def _asend(self, payload: dict, timeout: float, attempts: int) -> _Attempt:
+        self._count("attempts")
+        try:
+            response = await self._async_client().post(self.url, json=payload, timeout=timeout)
+        except httpx.HTTPError as e:
+            error, retryable = self._failure(e)
+            return _Attempt(None, error, retryable)
+        return self._outcome(response, attempts)
+
+    async def _ahedged_send(self, payload: dict, timeout: float, attempts: int) -> _Attempt:
+        if not self._can_hedge():
+            return await self._asend(payload, timeout, attempts)
+        primary = asyncio.ensure_future(self._asend(payload, timeout, attempts))
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+            if done or not self._can_hedge():
+                return await primary
+            self._count("hedges")
+            hedge = asyncio.ensure_future(self._asend(payload, timeout, attempts))
+            pending = tasks = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    outcome = task.result()
+                    if outcome.completion is not None:
+                        if task is hedge:
+                            self._count("hedge_wins")
+                        return outcome._replace(completion=outcome.completion._replace(hedged=True))
+            return outcome
+        finally:
+            # The losing request is cancelled, unlike on the sync path
+            for task in tasks:
+                task.cancel()
+
+    async def _apost(self, payload: dict, timeout: float) -> Completion:
+        deadline = time.monotonic() + self.budget
+        for attempt in range(self.max_retries + 1):
+            outcome = await self._ahedged_send(payload, min(timeout, deadline - time.monotonic()), attempt + 1)
+            if outcome.completion is not None:
+                return outcome.completion
+            delay = self._next_delay(attempt, outcome, deadline)
+            if delay is None:
+                break
+            await asyncio.sleep(delay)
+        self._count("errors")
+        raise outcome.error
+
+    async def acomplete(self, messages, model: str, temperature: float = 0.0, timeout: float = None) -> Completion:
+        """Async version of complete; coalescing is per event loop."""
+        self._count("requests")
+        payload = self._payload(messages, model, temperature)
+        timeout = timeout or self.timeout
+        if not self.coalesce:
+            completion = await self._apost(payload, timeout)
+            self._annotate(completion)
+            return completion
+
+        key = self._key(payload)
+        inflight = self._async_inflight.setdefault(asyncio.get_running_loop(), {})
+        shared = inflight.get(key)
+        coalesced = shared is not None
+        if coalesced:
+            self._count("coalesced")
+        else:
+            shared = inflight[key] = asyncio.ensure_future(self._apost(payload, timeout))
+            shared.add_done_callback(lambda _: inflight.pop(key, None))
+        # Shielded so one caller giving up doesn't cancel the request for the others
+        completion = await asyncio.shield(shared)
+        self._annotate(completion, coalesced)
+        return completion
+
+    async def astream(self, messages, model: str, temperature: float = 0.0, timeout: float = None):
+        """Async version of stream."""
+        self._count("requests")
+        payload = self._payload(messages, model, temperature, stream=True)
+        deadline = time.monotonic() + self.budget
+        for attempt in range(self.max_retries + 1):
+            self._count("attempts")
+            started = False
+            timeout_left = min(timeout or self.timeout, deadline - time.monotonic())
+            try:
+                async with self._async_client().stream("POST", self.url, json=payload, timeout=timeout_left) as response:
+                    if response.status_code < 400:
+                        async for line in response.aiter_lines():
+                            delta = _parse_stream_line(line)
+                            if delta == "":
+                                return
+                            if delta:
+                                started = True
+                                yield Completion(delta, model=model, attempts=attempt + 1)
+                        return
+                    await response.aread()
+                    outcome = self._outcome(response, attempt + 1)
+            except httpx.HTTPError as e:
+                if started:
+                    self._count("errors")
+                    raise self._failure(e)[0] from e
+                outcome = _Attempt(None, *self._failure(e))
+            delay = self._next_delay(attempt, outcome, deadline)
+            if delay is None:
+                break
+            await asyncio.sleep(delay)
+        self._count("errors")
+        raise outcome.error
+
+    def close(self):
+        with self._lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.close()
+
+    async def aclose(self):
+        """Close the sync pool and this event loop's async pool."""
+        self.close()
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+class ChatModel:
+    """A model and temperature bound to a client, with the `invoke`/`stream` interface the agents call."""
+
+    def __init__(self, client: LLMClient, model: str, temperature: float = 0.0, timeout: float = None):
+        self.client = client
+        self.model = model
+        self.temperature = temperature
+        self.timeout = timeout
+
+    def invoke(self, prompt) -> Completion:
+        return self.client.complete(prompt, self.model, self.temperature, self.timeout)
+
+    async def ainvoke(self, prompt) -> Completion:
+        return await self.client.acomplete(prompt, self.model, self.temperature, self.timeout)
+
+    def stream(self, prompt):
+        return self.client.stream(prompt, self.model, self.temperature, self.timeout)
+
+    def astream(self, prompt):
+        return self.client.astream(prompt, self.model, self.temperature, self.timeout)
+
+def llm_stats() -> list:
+    """Counters of every live client."""
+    return [client.stats() for client in list(_clients)]
+
+async def aclose_llm_clients():
+    """Close every client's connections; call from the event loop that used them."""
+    for client in list(_clients):
+        await client.aclose()
+
+__all__ = ["LLMClient", "ChatModel", "Completion", "Usage", "LLMError", "LLMTimeoutError", "to_messages",
+           "llm_stats", "aclose_llm_clients"]
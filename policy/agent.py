@@ -1,7 +1,7 @@
 import os
 from policy.tools.policy_tool import policy_tool
-from dotenv import load_dotenv
-load_dotenv()
+import resources
+resources.load_settings()
 
 def policy_agent(query: str) -> str:
     """Process a policy-related query and return a response."""
@@ -10,5 +10,12 @@ def policy_agent(query: str) -> str:
     except Exception as e:
         return f"Policy Agent Error: {str(e)}"
 
+async def apolicy_agent(query: str) -> str:
+    """Async version of policy_agent."""
+    try:
+        return await policy_tool.arun(query)
+    except Exception as e:
+        return f"Policy Agent Error: {str(e)}"
+
 # Export the function
-__all__ = ["policy_agent"]
\ No newline at end of file
+__all__ = ["policy_agent", "apolicy_agent"]
\ No newline at end of file
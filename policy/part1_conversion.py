@@ -1,51 +1,237 @@
+"""
+Incremental ingestion of the policy documents into the Chroma vector store.
+
+Every chunk is stored under a hash of its source file and text, and a manifest records
+what is indexed. A run only embeds new or changed chunks, deletes chunks that disappeared,
+and is a quick no-op (file stats only) when nothing changed, so it can run on every deploy.
+
+Usage:
+    python policy/part1_conversion.py          # sync the store with documents/
+    python policy/part1_conversion.py --full   # re-embed everything
+"""
+import argparse
+import hashlib
+import json
 import os
-from langchain.text_splitter import CharacterTextSplitter
-from langchain_community.document_loaders import TextLoader
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
-from dotenv import load_dotenv
-# from langchain_cohere import CohereEmbeddings
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+import resources
+from policy.tools.embeddings import EMBEDDING_BACKEND
+from policy.tools.extractive import SENTENCE_INDEX_DIRECTORY, load_sentence_index, split_sections
+from policy.tools.lexical_index import LEXICAL_INDEX_DIRECTORY, TERMS_FILE, BM25Index
+from policy.tools.vector_store import CHUNKS_FILE, NUMPY_SNAPSHOT_DIRECTORY, write_snapshot
 
-load_dotenv()
+resources.load_settings()
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
-file_path = os.path.join(current_dir, "documents", "company_policies_detailed.txt")
-persistent_directory = os.path.join(current_dir, "db", "chroma_db")
+DOCUMENTS_DIR = os.path.join(current_dir, "documents")
+persistent_directory = resources.POLICY_DB_DIRECTORY
+# Kept outside the store directory so a no-op run doesn't touch what the answer cache watches
+MANIFEST_PATH = os.path.join(current_dir, "db", "manifest.json")
+
+DOCUMENT_EXTENSIONS = (".txt", ".md")
+CHUNK_SIZE = int(os.getenv("POLICY_CHUNK_SIZE", "1000"))
+CHUNK_OVERLAP = int(os.getenv("POLICY_CHUNK_OVERLAP", "50"))
+INGEST_BATCH_SIZE = int(os.getenv("POLICY_INGEST_BATCH_SIZE", "64"))
+
+MANIFEST_VERSION = 1
+
+def index_settings() -> dict:
+    """Everything that changes the stored vectors; a mismatch forces a full rebuild."""
+    return {
+        "version": MANIFEST_VERSION,
+        "embedding_model": resources.EMBEDDING_MODEL,
+        "embedding_backend": EMBEDDING_BACKEND,
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP
+    }
+
+def list_documents(documents_dir: str = DOCUMENTS_DIR) -> dict:
+    """Document paths relative to `documents_dir`, mapped to their `(size, mtime_ns)`."""
+    documents = {}
+    for root, _, files in os.walk(documents_dir):
+        for name in files:
+            if name.endswith(DOCUMENT_EXTENSIONS):
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                documents[os.path.relpath(path, documents_dir).replace(os.sep, "/")] = (stat.st_size, stat.st_mtime_ns)
+    return dict(sorted(documents.items()))
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def chunk_id(source: str, text: str) -> str:
+    """Content address of a chunk; identical text in the same file maps to one entry."""
+    return hashlib.sha256(f"{source}\0{text}".encode("utf-8")).hexdigest()[:32]
+
+def split_document(text: str) -> list:
+    """Split a document into chunks the same way the store was originally built."""
+    from langchain.text_splitter import CharacterTextSplitter
+    return CharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP).split_text(text)
+
+def load_manifest(path: str = MANIFEST_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(manifest: dict, path: str = MANIFEST_PATH):
+    """Write the manifest atomically, so an interrupted run leaves the previous one intact."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = path + ".tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temporary, path)
+
+def plan_ingestion(manifest, documents_dir: str = DOCUMENTS_DIR, full: bool = False):
+    """
+    Compare the documents with the manifest without embedding anything.
+    Returns the new manifest, the chunks to add (`(id, source, text)`), the chunk ids to delete,
+    and whether the store must be cleared first (no usable manifest).
+    """
+    rebuild = full or manifest is None or manifest.get("settings") != index_settings()
+    previous = {} if rebuild else manifest["files"]
+    files = {}
+    to_add = []
+    to_delete = []
+
+    for source, (size, mtime_ns) in list_documents(documents_dir).items():
+        known = previous.get(source)
+        # Unchanged size and mtime: trust the manifest without reading the file
+        if known and known["size"] == size and known["mtime_ns"] == mtime_ns:
+            files[source] = known
+            continue
+
+        path = os.path.join(documents_dir, source)
+        digest = file_hash(path)
+        if known and known["sha256"] == digest:
+            files[source] = {**known, "size": size, "mtime_ns": mtime_ns}
+            continue
+
+        with open(path, encoding="utf-8") as f:
+            chunks = {chunk_id(source, text): text for text in split_document(f.read())}
+        old_ids = set(known["chunks"]) if known else set()
+        to_add += [(cid, source, text) for cid, text in chunks.items() if cid not in old_ids]
+        to_delete += [cid for cid in old_ids if cid not in chunks]
+        files[source] = {"size": size, "mtime_ns": mtime_ns, "sha256": digest, "chunks": list(chunks)}
+
+    for source, known in previous.items():
+        if source not in files:
+            to_delete += known["chunks"]
+
+    return {"settings": index_settings(), "files": files}, to_add, to_delete, rebuild
 
-if not os.path.exists(persistent_directory):
-    print("Persistent directory does not exist. Initializing vector store...")
+def open_store():
+    """The policy vector store, embedding with the configured backend."""
+    from langchain_chroma import Chroma
+    return Chroma(persist_directory=persistent_directory, embedding_function=resources.get("embeddings"))
 
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(
-            f"The file {file_path} does not exist. Please check the path."
-        )
+def export_indexes(store, snapshot_dir: str = NUMPY_SNAPSHOT_DIRECTORY, lexical_dir: str = LEXICAL_INDEX_DIRECTORY):
+    """Write the NumPy snapshot and the BM25 index from a single read of the store."""
+    data = store.get(include=["embeddings", "documents", "metadatas"])
+    write_snapshot(snapshot_dir, data["ids"], data["documents"], data["metadatas"], data["embeddings"])
+    BM25Index.build(data["documents"], [m or {} for m in data["metadatas"]], data["ids"]).save(lexical_dir)
 
-    loader = TextLoader(file_path)
-    documents = loader.load()
+def index_sentences(documents_dir: str = DOCUMENTS_DIR, directory: str = SENTENCE_INDEX_DIRECTORY,
+                    embeddings=None, reuse: bool = True) -> int:
+    """
+    Write the sentence snapshot used for extractive answers and return how many sentences were embedded.
+    Each sentence is embedded with its section heading; vectors of sentences already in the
+    previous snapshot are reused unless `reuse` is off (embedding settings changed).
+    """
+    ids, texts, metadatas, embed_texts = [], [], [], []
+    for source in list_documents(documents_dir):
+        with open(os.path.join(documents_dir, source), encoding="utf-8") as f:
+            sections = split_sections(f.read())
+        for heading, sentences in sections:
+            for sentence in sentences:
+                embed_text = f"{heading}: {sentence}" if heading else sentence
+                metadatas.append({"source": source, "section": heading, "position": len(texts)})
+                ids.append(chunk_id(source, embed_text))
+                texts.append(sentence)
+                embed_texts.append(embed_text)
+    if not ids:
+        return 0
 
-    text_splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=50) 
-    docs = text_splitter.split_documents(documents)
+    previous = load_sentence_index(directory) if reuse else None
+    known = dict(zip(previous.ids, np.array(previous.vectors))) if previous is not None else {}
+    missing = [i for i, sid in enumerate(ids) if sid not in known]
+    if missing:
+        embeddings = embeddings if embeddings is not None else resources.get("embeddings")
+        for start in range(0, len(missing), INGEST_BATCH_SIZE):
+            batch = missing[start:start + INGEST_BATCH_SIZE]
+            vectors = embeddings.embed_documents([embed_texts[i] for i in batch])
+            known.update((ids[i], np.asarray(vector, dtype=np.float32)) for i, vector in zip(batch, vectors))
+    write_snapshot(directory, ids, texts, metadatas, [known[sid] for sid in ids])
+    return len(missing)
 
-    # Display information about the split documents
-    print("\n--- Document Chunks Information ---")
-    print(f"Number of document chunks: {len(docs)}")
-    print(f"Sample chunk:\n{docs[0].page_content}\n")
+def ingest(documents_dir: str = DOCUMENTS_DIR, manifest_path: str = MANIFEST_PATH, store=None,
+           full: bool = False, batch_size: int = INGEST_BATCH_SIZE, snapshot_dir: str = NUMPY_SNAPSHOT_DIRECTORY,
+           lexical_dir: str = LEXICAL_INDEX_DIRECTORY, sentence_dir: str = SENTENCE_INDEX_DIRECTORY,
+           embeddings=None) -> dict:
+    """
+    Bring the vector store in line with `documents_dir` and return what changed.
+    The NumPy snapshot and the BM25 index are re-exported from the store whenever it changes (or one is missing),
+    and the sentence snapshot for extractive answers is rebuilt alongside.
+    """
+    manifest = load_manifest(manifest_path)
+    new_manifest, to_add, to_delete, rebuild = plan_ingestion(manifest, documents_dir, full)
+    chunks = sum(len(entry["chunks"]) for entry in new_manifest["files"].values())
+    report = {"files": len(new_manifest["files"]), "chunks": chunks, "added": len(to_add),
+              "deleted": len(to_delete), "rebuilt": rebuild}
 
-    # Create embeddings instance 
+    snapshot_missing = not (os.path.exists(os.path.join(snapshot_dir, CHUNKS_FILE))
+                            and os.path.exists(os.path.join(lexical_dir, TERMS_FILE))
+                            and os.path.exists(os.path.join(sentence_dir, CHUNKS_FILE)))
+    if not rebuild and new_manifest == manifest and not snapshot_missing:
+        return report
 
-    print("\n--- Creating embeddings instance ---")
-    # embeddings = CohereEmbeddings(model="embed-multilingual-v3.0")
+    changed = bool(to_add or to_delete or rebuild)
+    if changed or snapshot_missing:
+        store = store if store is not None else open_store()
+    if changed:
+        if rebuild:
+            # Entries from an older layout (or settings) can't be matched up, so start clean
+            existing = store.get(include=[])["ids"]
+            for start in range(0, len(existing), batch_size):
+                store.delete(ids=existing[start:start + batch_size])
+        elif to_delete:
+            store.delete(ids=to_delete)
+        # add_texts embeds each batch with embed_documents and upserts by id
+        for start in range(0, len(to_add), batch_size):
+            batch = to_add[start:start + batch_size]
+            store.add_texts(
+                texts=[text for _, _, text in batch],
+                metadatas=[{"source": source, "chunk_id": cid} for cid, source, _ in batch],
+                ids=[cid for cid, _, _ in batch]
+            )
+    if changed or snapshot_missing:
+        export_indexes(store, snapshot_dir, lexical_dir)
+        index_sentences(documents_dir, sentence_dir, embeddings, reuse=not rebuild)
 
-    embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-    print("\n--- Finished creating embeddings instance ---")
+    save_manifest(new_manifest, manifest_path)
+    return report
 
-    # Create the vector store and persist it automatically
-    print("\n--- Creating vector store ---")
-    db = Chroma.from_documents(docs, embeddings, persist_directory=persistent_directory)
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--full", action="store_true", help="clear the store and re-embed every chunk")
+    args = parser.parse_args()
 
-    # db = Chroma.from_documents(docs, embeddings, persist_directory=persistent_directory)
-    print("\n--- Finished creating vector store ---")
+    if not os.path.isdir(DOCUMENTS_DIR):
+        raise FileNotFoundError(f"The directory {DOCUMENTS_DIR} does not exist. Please check the path.")
 
+    report = ingest(full=args.full)
+    action = "Rebuilt" if report["rebuilt"] else "Updated"
+    if not (report["added"] or report["deleted"] or report["rebuilt"]):
+        action = "Up to date"
+    print(f"{action}: {report['files']} documents, {report['chunks']} chunks "
+          f"({report['added']} embedded, {report['deleted']} removed, {EMBEDDING_BACKEND} embeddings)")
 
-else:
-    print("Vector store already exists. No need to initialize.")
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,11 @@
 import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from langchain_chroma import Chroma
 from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_groq import ChatGroq
 from langchain_core.messages import HumanMessage
-from dotenv import load_dotenv
-load_dotenv()
+import resources
+resources.load_settings()
 
 # Define the persistent directory
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -37,12 +38,8 @@ for i, doc in enumerate(relevant_docs, 1):
     if doc.metadata:
         print(f"Source: {doc.metadata.get('source', 'Unknown')}\n")
 
-# Initialize the LLM
-llm = ChatGroq(
-    api_key=os.getenv("GROQ_API_KEY"),
-    model="llama-3.1-8b-instant",
-    temperature=0.1
-)
+# Initialize the LLM (through the shared Groq client)
+llm = resources.chat_model("llama-3.1-8b-instant", 0.1)
 
 # Create prompt with retrieved documents and query
 prompt = HumanMessage(content=f"""
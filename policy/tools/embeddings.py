@@ -0,0 +1,76 @@
+import os
+import numpy as np
+import resources
+resources.load_settings()
+
+# "fp32" runs the model as published; "int8" quantizes its Linear layers for faster CPU inference
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "fp32")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+# Share of fp32 top-k results the int8 backend must reproduce to be considered safe
+EMBEDDING_MIN_AGREEMENT = float(os.getenv("EMBEDDING_MIN_AGREEMENT", "0.9"))
+
+class QuantizedEmbeddings:
+    """
+    The sentence-transformers model with its Linear layers dynamically quantized to int8.
+    Weights are stored as int8 and activations are quantized on the fly, which speeds up
+    CPU inference; vectors keep the same size, so it drops in for HuggingFaceEmbeddings.
+    """
+
+    def __init__(self, model_name: str = resources.EMBEDDING_MODEL, batch_size: int = EMBEDDING_BATCH_SIZE):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        model = SentenceTransformer(model_name, device="cpu")
+        self.model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model_name = model_name
+        self.batch_size = batch_size
+
+    def embed_documents(self, texts):
+        vectors = self.model.encode(list(texts), batch_size=self.batch_size, convert_to_numpy=True, show_progress_bar=False)
+        return vectors.tolist()
+
+    def embed_query(self, text: str):
+        return self.embed_documents([text])[0]
+
+def create_embeddings(backend: str = EMBEDDING_BACKEND, model_name: str = resources.EMBEDDING_MODEL):
+    """Embedding model for the configured backend; both expose `embed_query` / `embed_documents`."""
+    if backend == "fp32":
+        from langchain_huggingface import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(model_name=model_name)
+    if backend == "int8":
+        return QuantizedEmbeddings(model_name)
+    raise ValueError(f"Unknown EMBEDDING_BACKEND: {backend}")
+
+def _top_k(query_vectors: np.ndarray, document_vectors: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k most cosine-similar documents for each query."""
+    queries = query_vectors / np.maximum(np.linalg.norm(query_vectors, axis=1, keepdims=True), 1e-12)
+    documents = document_vectors / np.maximum(np.linalg.norm(document_vectors, axis=1, keepdims=True), 1e-12)
+    return np.argsort(-(queries @ documents.T), axis=1)[:, :k]
+
+def topk_agreement(reference, candidate, queries, documents, k: int = 2) -> dict:
+    """
+    Share of the reference model's top-k documents that the candidate also returns, averaged over queries.
+
+    `rebuilt` compares against a store re-embedded with the candidate; `mixed` keeps the
+    reference's document vectors and only embeds queries with the candidate, as happens
+    when the backend changes without re-running ingestion.
+    """
+    k = min(k, len(documents))
+    reference_docs = np.asarray(reference.embed_documents(documents), dtype=np.float32)
+    candidate_docs = np.asarray(candidate.embed_documents(documents), dtype=np.float32)
+    reference_queries = np.asarray([reference.embed_query(q) for q in queries], dtype=np.float32)
+    candidate_queries = np.asarray([candidate.embed_query(q) for q in queries], dtype=np.float32)
+
+    expected = _top_k(reference_queries, reference_docs, k)
+
+    def agreement(found):
+        return float(np.mean([len(set(e) & set(f)) / k for e, f in zip(expected, found)]))
+
+    return {
+        "k": k,
+        "queries": len(queries),
+        "rebuilt": agreement(_top_k(candidate_queries, candidate_docs, k)),
+        "mixed": agreement(_top_k(candidate_queries, reference_docs, k))
+    }
+
+__all__ = ["create_embeddings", "QuantizedEmbeddings", "topk_agreement", "EMBEDDING_BACKEND", "EMBEDDING_MIN_AGREEMENT"]
@@ -0,0 +1,116 @@
+import os
+import re
+import resources
+from policy.tools.semantic_cache import SnapshotWatcher
+from policy.tools.vector_store import CHUNKS_FILE, NumpyVectorStore
+resources.load_settings()
+
+# Sentence-level snapshot written at ingestion (same format as the NumPy vector store)
+SENTENCE_INDEX_DIRECTORY = os.path.join(os.path.dirname(resources.POLICY_DB_DIRECTORY), "sentences")
+
+# Answer straight from the policy text when one passage matches strongly (off: always generate)
+POLICY_EXTRACTIVE = os.getenv("POLICY_EXTRACTIVE", "false").lower() == "true"
+# Cosine similarity the best sentence needs before it is trusted without an LLM
+POLICY_EXTRACTIVE_THRESHOLD = float(os.getenv("POLICY_EXTRACTIVE_THRESHOLD", "0.7"))
+# Other sentences from the same section within this much of the best one are quoted too
+POLICY_EXTRACTIVE_MARGIN = float(os.getenv("POLICY_EXTRACTIVE_MARGIN", "0.05"))
+POLICY_EXTRACTIVE_MAX_SENTENCES = int(os.getenv("POLICY_EXTRACTIVE_MAX_SENTENCES", "2"))
+
+# Prefix on extractive tool output, telling the head agent the answer needs no further synthesis
+EXTRACTIVE_MARKER = "[extractive] "
+
+_list_item = re.compile(r"^(\s*)(?:[-*•]|\d+\.)\s+(.*)$")
+_markdown_heading = re.compile(r"^(#+\s.*)$", re.MULTILINE)
+_sentence_break = re.compile(r"(?<=[.!?])\s+(?=[A-Z])")
+
+def _is_heading(line: str) -> bool:
+    text = line.strip().strip("#*").strip()
+    return bool(text) and len(text.split()) <= 10 and not text.endswith((".", "!", "?", ":"))
+
+def _clean_heading(line: str) -> str:
+    text = re.sub(r"^(#+|\d+\.)\s*", "", line.strip()).replace("**", "").strip()
+    return text.title() if text.isupper() else text
+
+def _sentences(lines) -> list:
+    """Sentences of one paragraph: list items stay whole, prose is split at sentence ends."""
+    units = []
+    for line in lines:
+        item = _list_item.match(line)
+        indent = len(line) - len(line.lstrip())
+        # Wrapped lines continue prose, or a list item when indented under it
+        if units and not item and (not units[-1][1] or indent > units[-1][0]):
+            units[-1][2] += " " + line.strip()
+        else:
+            units.append([indent, bool(item), (item.group(2) if item else line).strip()])
+
+    sentences = []
+    leads = []
+    for indent, is_item, text in units:
+        text = text.replace("**", "").strip()
+        # A line ending in ":" introduces what follows ("Timeframes:" before its nested items)
+        leads = [lead for lead in leads if indent > lead[0] or not lead[1]]
+        if text.endswith(":"):
+            leads.append((indent, is_item, text))
+            continue
+        prefix = " ".join(lead[2] for lead in leads)
+        for sentence in ([text] if is_item else _sentence_break.split(text)):
+            sentence = f"{prefix} {sentence}".strip()
+            if sum(any(c.isalpha() for c in word) for word in sentence.split()) >= 3:
+                sentences.append(sentence)
+    return sentences
+
+def split_sections(text: str) -> list:
+    """`(heading, sentences)` for each section of a policy document, in document order."""
+    sections = [("", [])]
+    # Markdown headings stand alone even without blank lines around them
+    text = _markdown_heading.sub(r"\n\1\n", text)
+    for paragraph in re.split(r"\n\s*\n", text):
+        lines = [line.rstrip() for line in paragraph.splitlines() if line.strip()]
+        if len(lines) == 1 and _is_heading(lines[0]):
+            sections.append((_clean_heading(lines[0]), []))
+        elif lines:
+            sections[-1][1].extend(_sentences(lines))
+    return [(heading, sentences) for heading, sentences in sections if sentences]
+
+def load_sentence_index(directory: str = SENTENCE_INDEX_DIRECTORY):
+    """The sentence snapshot written at ingestion, or None if ingestion hasn't built one yet."""
+    if not os.path.exists(os.path.join(directory, CHUNKS_FILE)):
+        return None
+    return NumpyVectorStore.load(directory)
+
+# The snapshot the agents answer from, picked up again whenever ingestion rewrites it
+sentence_index = SnapshotWatcher(SENTENCE_INDEX_DIRECTORY, load_sentence_index)
+
+def extract_answer(index, query_vector, threshold: float = POLICY_EXTRACTIVE_THRESHOLD,
+                   margin: float = POLICY_EXTRACTIVE_MARGIN, max_sentences: int = POLICY_EXTRACTIVE_MAX_SENTENCES):
+    """
+    Quote the best-matching policy sentences, or return None when the best match is below
+    `threshold` and the answer should be generated instead. Quoted sentences all come from
+    the best sentence's section and are given in document order.
+    """
+    if index is None or not len(index):
+        return None
+    results = index.similarity_search_with_score_by_vector(query_vector, k=max(8, max_sentences * 4))
+    best, best_score = results[0]
+    if best_score < threshold:
+        return None
+
+    section = (best.metadata.get("source"), best.metadata.get("section"))
+    picked = [chunk for chunk, score in results
+              if (chunk.metadata.get("source"), chunk.metadata.get("section")) == section and score >= best_score - margin]
+    picked = sorted(picked[:max_sentences], key=lambda chunk: chunk.metadata.get("position", 0))
+    text = " ".join(chunk.page_content for chunk in picked)
+    return f"From our {section[1]}: {text}" if section[1] else text
+
+def mark_extractive(answer: str) -> str:
+    return EXTRACTIVE_MARKER + answer
+
+def is_extractive(output: str) -> bool:
+    return bool(output) and output.startswith(EXTRACTIVE_MARKER)
+
+def strip_marker(output: str) -> str:
+    """Tool output without the extractive marker (unchanged if it has none)."""
+    return output[len(EXTRACTIVE_MARKER):] if is_extractive(output) else output
+
+__all__ = ["split_sections", "load_sentence_index", "sentence_index", "extract_answer", "mark_extractive", "is_extractive", "strip_marker",
+           "POLICY_EXTRACTIVE", "SENTENCE_INDEX_DIRECTORY", "EXTRACTIVE_MARKER"]
@@ -0,0 +1,144 @@
+import json
+import math
+import os
+import re
+from collections import Counter
+import numpy as np
+import resources
+from policy.tools.semantic_cache import SnapshotWatcher
+from policy.tools.vector_store import StoredChunk
+resources.load_settings()
+
+LEXICAL_INDEX_DIRECTORY = os.path.join(os.path.dirname(resources.POLICY_DB_DIRECTORY), "bm25")
+INDEX_FILE = "index.npz"
+TERMS_FILE = "terms.json"
+
+# Standard BM25 parameters: term-frequency saturation and document-length normalization
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+# Reciprocal-rank fusion constant; larger values flatten the advantage of the top ranks
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+_token_pattern = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from", "how", "i", "if",
+    "in", "is", "it", "me", "my", "of", "on", "or", "our", "that", "the", "this", "to", "was", "we",
+    "what", "when", "which", "will", "with", "you", "your"
+}
+
+def tokenize(text: str) -> list:
+    """Lowercased word and number tokens without stopwords; plural "s" is stripped so "days" matches "day"."""
+    tokens = []
+    for token in _token_pattern.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+class BM25Index:
+    """
+    Inverted index with BM25 weights computed at build time.
+    Postings are stored term by term in flat arrays, so scoring a query is one `bincount`
+    over the postings of its terms instead of a Python loop over documents.
+    """
+
+    def __init__(self, terms, offsets, doc_ids, weights, texts, metadatas=None, ids=None):
+        self.terms = {term: i for i, term in enumerate(terms)}
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.texts = list(texts)
+        self.metadatas = list(metadatas) if metadatas is not None else [{} for _ in self.texts]
+        self.ids = list(ids) if ids is not None else [str(i) for i in range(len(self.texts))]
+
+    @classmethod
+    def build(cls, texts, metadatas=None, ids=None, k1: float = BM25_K1, b: float = BM25_B) -> "BM25Index":
+        counts = [Counter(tokenize(text)) for text in texts]
+        lengths = np.array([sum(c.values()) for c in counts], dtype=np.float32)
+        average_length = float(lengths.mean()) if len(lengths) and lengths.mean() > 0 else 1.0
+
+        postings = {}
+        for doc, counter in enumerate(counts):
+            for term, tf in counter.items():
+                postings.setdefault(term, []).append((doc, tf))
+
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        doc_ids, weights = [], []
+        for i, term in enumerate(terms):
+            entries = postings[term]
+            idf = math.log(1 + (len(texts) - len(entries) + 0.5) / (len(entries) + 0.5))
+            for doc, tf in entries:
+                norm = k1 * (1 - b + b * lengths[doc] / average_length)
+                doc_ids.append(doc)
+                weights.append(idf * tf * (k1 + 1) / (tf + norm))
+            offsets[i + 1] = len(doc_ids)
+
+        return cls(terms, offsets, np.array(doc_ids, dtype=np.int32), np.array(weights, dtype=np.float32),
+                   texts, metadatas, ids)
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every document for `query` (0 where no term matches)."""
+        spans = [(self.offsets[i], self.offsets[i + 1]) for i in
+                 (self.terms.get(term) for term in set(tokenize(query))) if i is not None]
+        if not spans:
+            return np.zeros(len(self.texts), dtype=np.float32)
+        docs = np.concatenate([self.doc_ids[start:end] for start, end in spans])
+        weights = np.concatenate([self.weights[start:end] for start, end in spans])
+        return np.bincount(docs, weights=weights, minlength=len(self.texts))
+
+    def search(self, query: str, k: int = 4) -> list:
+        """Up to `k` chunks containing query terms, best first."""
+        scores = self.scores(query)
+        matched = np.flatnonzero(scores)
+        top = matched[np.argsort(-scores[matched], kind="stable")][:k]
+        return [StoredChunk(self.texts[i], self.metadatas[i]) for i in top]
+
+    def save(self, directory: str = LEXICAL_INDEX_DIRECTORY):
+        """Write the index files atomically, the term list last."""
+        os.makedirs(directory, exist_ok=True)
+        index_path = os.path.join(directory, INDEX_FILE)
+        with open(index_path + ".tmp", "wb") as f:
+            np.savez(f, offsets=self.offsets, doc_ids=self.doc_ids, weights=self.weights)
+        os.replace(index_path + ".tmp", index_path)
+
+        terms_path = os.path.join(directory, TERMS_FILE)
+        with open(terms_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"terms": list(self.terms), "texts": self.texts, "metadatas": self.metadatas, "ids": self.ids},
+                      f, ensure_ascii=False)
+        os.replace(terms_path + ".tmp", terms_path)
+
+    @classmethod
+    def load(cls, directory: str = LEXICAL_INDEX_DIRECTORY) -> "BM25Index":
+        with np.load(os.path.join(directory, INDEX_FILE)) as arrays:
+            offsets, doc_ids, weights = arrays["offsets"], arrays["doc_ids"], arrays["weights"]
+        with open(os.path.join(directory, TERMS_FILE), encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["terms"], offsets, doc_ids, weights, data["texts"], data["metadatas"], data["ids"])
+
+def load_lexical_index(directory: str = LEXICAL_INDEX_DIRECTORY):
+    """The index written at ingestion time, or None if ingestion hasn't built one yet."""
+    if not os.path.exists(os.path.join(directory, TERMS_FILE)):
+        return None
+    return BM25Index.load(directory)
+
+# The index hybrid retrieval searches, picked up again whenever ingestion rewrites it
+bm25_index = SnapshotWatcher(LEXICAL_INDEX_DIRECTORY, load_lexical_index)
+
+def reciprocal_rank_fusion(rankings, k: int, rrf_k: int = RRF_K) -> list:
+    """
+    Merge ranked result lists: each chunk scores sum(1 / (rrf_k + rank)) over the lists it
+    appears in, so chunks ranked well by both retrievers come first. Chunks are matched by text.
+    """
+    scores = {}
+    chunks = {}
+    for ranking in rankings:
+        for rank, chunk in enumerate(ranking, start=1):
+            scores[chunk.page_content] = scores.get(chunk.page_content, 0.0) + 1.0 / (rrf_k + rank)
+            chunks.setdefault(chunk.page_content, chunk)
+    best = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [chunks[text] for text in best]
+
+__all__ = ["BM25Index", "tokenize", "load_lexical_index", "bm25_index", "reciprocal_rank_fusion", "LEXICAL_INDEX_DIRECTORY", "TERMS_FILE"]
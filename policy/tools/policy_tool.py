@@ -1,51 +1,43 @@
 from langchain.tools import Tool
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_groq import ChatGroq
 from langchain_core.messages import HumanMessage
-from dotenv import load_dotenv
+import asyncio
+import logging
 import os
+import resources
+from policy.tools.extractive import POLICY_EXTRACTIVE, extract_answer, mark_extractive
+from policy.tools.lexical_index import LEXICAL_INDEX_DIRECTORY, reciprocal_rank_fusion
+from policy.tools.semantic_cache import SemanticCache
+from policy.tools.vector_store import policy_store_directory
+from tracing import span
 
-# Load environment variables
-load_dotenv()
+resources.load_settings()
 
-# Set up persistent directory (go up one level from tools/)
-current_dir = os.path.dirname(os.path.abspath(__file__))
-persistent_directory = os.path.join(current_dir, "..", "db", "chroma_db")
-persistent_directory = os.path.normpath(persistent_directory)
+logger = logging.getLogger(__name__)
 
-# Load embeddings + DB
-embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-db = Chroma(persist_directory=persistent_directory, embedding_function=embeddings)
+# Embeddings and the vector store (Chroma or NumPy, per POLICY_VECTOR_STORE) are shared and built on first use
+embeddings = resources.lazy("embeddings")
+db = resources.lazy("policy_store")
+persistent_directory = policy_store_directory()
 
-# Create retriever
-retriever = db.as_retriever(
-    search_type="similarity",
-    search_kwargs={"k": 2}
-)
+# Policy excerpts retrieved per question
+POLICY_TOP_K = int(os.getenv("POLICY_TOP_K", "2"))
+# "hybrid" fuses the vector and BM25 rankings; "vector" is cosine similarity alone
+POLICY_RETRIEVAL = os.getenv("POLICY_RETRIEVAL", "hybrid")
+# Candidates taken from each ranking before fusion narrows them to POLICY_TOP_K
+POLICY_CANDIDATES = int(os.getenv("POLICY_CANDIDATES", "8"))
+
+# Cache of generated answers, keyed by query embedding
+answer_cache = SemanticCache(persistent_directory)
 
 # Initialize LLM
-llm = ChatGroq(
-    api_key=os.getenv("GROQ_API_KEY"),
-    model="llama-3.1-8b-instant",
-    temperature=0.1
-)
+POLICY_MODEL = "llama-3.1-8b-instant"
+llm = resources.chat_model(POLICY_MODEL, temperature=0.1)
 
-# Define the tool function with LLM enhancement
-def policy_lookup(query: str) -> str:
-    """Look up policy information and generate a refined answer."""
-    # Step 1: Retrieve relevant docs
-    docs = retriever.invoke(query)
-    
-    # Step 2: If no docs found, return early
-    if not docs:
-        return "I couldn't find any relevant policy information to answer your question."
-    
-    # Step 3: Extract context from docs
-    retrieved_context = "\n\n".join([doc.page_content for doc in docs])
-    
-    # Step 4: Generate refined response with LLM
-    prompt = HumanMessage(content=f"""
+NO_POLICY_REPLY = "I couldn't find any relevant policy information to answer your question."
+
+def policy_prompt(query: str, retrieved_context: str) -> HumanMessage:
+    """Prompt asking the LLM to answer the query from the retrieved policy excerpts."""
+    return HumanMessage(content=f"""
     Based on our company policies, please answer the following customer query:
 
     Customer Question: {query}
@@ -57,18 +49,126 @@ def policy_lookup(query: str) -> str:
     using only the information in our policy documents. If the information needed is not 
     available in the provided policy excerpts, acknowledge this and suggest the next steps.
     """)
+
+_missing_index_reported = False
+
+def lexical_index():
+    """The BM25 index for hybrid retrieval, or None when disabled or not built by ingestion yet."""
+    global _missing_index_reported
+    if POLICY_RETRIEVAL != "hybrid":
+        return None
+    index = resources.get("policy_lexical_index")
+    if index is None and not _missing_index_reported:
+        _missing_index_reported = True
+        logger.warning("POLICY_RETRIEVAL=hybrid but there is no BM25 index in %s; using vector search until "
+                       "policy/part1_conversion.py builds one", LEXICAL_INDEX_DIRECTORY)
+    return index
+
+def retrieve(query: str, query_vector) -> list:
+    """
+    The POLICY_TOP_K policy chunks for a query. Exact terms ("30 days", "restocking fee") that the
+    embedding blurs are caught by BM25, and reciprocal-rank fusion merges the two rankings.
+    """
+    index = lexical_index()
+    with span("retrieval", k=POLICY_TOP_K, hybrid=index is not None) as search:
+        if index is None:
+            docs = db.similarity_search_by_vector(query_vector, k=POLICY_TOP_K)
+        else:
+            vector_docs = db.similarity_search_by_vector(query_vector, k=max(POLICY_CANDIDATES, POLICY_TOP_K))
+            docs = reciprocal_rank_fusion([vector_docs, index.search(query, k=POLICY_CANDIDATES)], k=POLICY_TOP_K)
+        search.set(documents=len(docs))
+    return docs
+
+async def aretrieve(query: str, query_vector) -> list:
+    """Async version of retrieve; BM25 scoring is a few array operations and runs inline."""
+    # Checking the index for a rebuild walks its directory
+    index = await asyncio.to_thread(lexical_index)
+    with span("retrieval", k=POLICY_TOP_K, hybrid=index is not None) as search:
+        if index is None:
+            docs = await db.asimilarity_search_by_vector(query_vector, k=POLICY_TOP_K)
+        else:
+            vector_docs = await db.asimilarity_search_by_vector(query_vector, k=max(POLICY_CANDIDATES, POLICY_TOP_K))
+            docs = reciprocal_rank_fusion([vector_docs, index.search(query, k=POLICY_CANDIDATES)], k=POLICY_TOP_K)
+        search.set(documents=len(docs))
+    return docs
+
+def extractive_answer(query_vector):
+    """Quoted policy sentences, marked as final, when one passage matches strongly; otherwise None."""
+    if not POLICY_EXTRACTIVE:
+        return None
+    with span("extractive") as extract:
+        answer = extract_answer(resources.get("policy_sentences"), query_vector)
+        extract.set(hit=answer is not None)
+    return mark_extractive(answer) if answer is not None else None
+
+# Define the tool function with LLM enhancement
+def policy_lookup(query: str) -> str:
+    """Look up policy information and generate a refined answer."""
+    # Step 1: Embed once; quote strong matches directly and serve repeated questions from the semantic cache
+    with span("embed"):
+        query_vector = embeddings.embed_query(query)
+    extracted = extractive_answer(query_vector)
+    if extracted is not None:
+        return extracted
+    cached = answer_cache.lookup(query_vector)
+    if cached.answer is not None:
+        return cached.answer
     
+    # Step 2: Retrieve relevant docs
+    docs = retrieve(query, query_vector)
+    
+    # Step 3: If no docs found, return early
+    if not docs:
+        return NO_POLICY_REPLY
+    
+    # Step 4: Extract context from docs
+    retrieved_context = "\n\n".join([doc.page_content for doc in docs])
+    
+    # Step 5: Generate refined response with LLM
+    messages = [policy_prompt(query, retrieved_context)]
     try:
-        response = llm.invoke([prompt])
+        with span("llm", model=POLICY_MODEL) as call:
+            response = llm.invoke(messages)
+            call.record_llm(response, messages)
+        answer_cache.put(query_vector, response.content, cached.fingerprint)
         return response.content
     except Exception as e:
         # Fallback to raw context if LLM fails
         return f"Based on our policies: {retrieved_context}"
 
+async def apolicy_lookup(query: str) -> str:
+    """Async version of policy_lookup; the local embedding runs in a worker thread."""
+    with span("embed"):
+        query_vector = await asyncio.to_thread(embeddings.embed_query, query)
+    # Both check their snapshot on disk for a rebuild, so they stay off the event loop too
+    extracted = await asyncio.to_thread(extractive_answer, query_vector)
+    if extracted is not None:
+        return extracted
+    cached = await asyncio.to_thread(answer_cache.lookup, query_vector)
+    if cached.answer is not None:
+        return cached.answer
+    
+    docs = await aretrieve(query, query_vector)
+    if not docs:
+        return NO_POLICY_REPLY
+    
+    retrieved_context = "\n\n".join([doc.page_content for doc in docs])
+    
+    messages = [policy_prompt(query, retrieved_context)]
+    try:
+        with span("llm", model=POLICY_MODEL) as call:
+            response = await llm.ainvoke(messages)
+            call.record_llm(response, messages)
+        await asyncio.to_thread(answer_cache.put, query_vector, response.content, cached.fingerprint)
+        return response.content
+    except Exception as e:
+        return f"Based on our policies: {retrieved_context}"
+
 # Wrap as a LangChain Tool
 policy_tool = Tool(
     name="PolicyAgentTool",
     func=policy_lookup,
+    coroutine=apolicy_lookup,
     description="Look up company policies and generate answers to customer queries."
 )
 
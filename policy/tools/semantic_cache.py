@@ -0,0 +1,179 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+import numpy as np
+import resources
+resources.load_settings()
+
+# Cache configuration
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "256"))
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+# How often (seconds) to check whether the vector store was rebuilt
+SEMANTIC_CACHE_CHECK_INTERVAL = float(os.getenv("SEMANTIC_CACHE_CHECK_INTERVAL", "5"))
+
+def corpus_fingerprint(directory: str):
+    """Return a cheap fingerprint of a vector store directory (file names, sizes, mtimes)."""
+    entries = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((os.path.relpath(path, directory), stat.st_size, stat.st_mtime_ns))
+    return tuple(sorted(entries))
+
+class SnapshotWatcher:
+    """
+    An index loaded from a directory written at ingestion, reloaded when the directory's
+    fingerprint changes (checked at most every `check_interval` seconds). `loader(directory)`
+    may return None while there is no snapshot yet; that is retried on every call, not kept.
+    """
+
+    def __init__(self, directory: str, loader, check_interval: float = SEMANTIC_CACHE_CHECK_INTERVAL):
+        self.directory = directory
+        self.loader = loader
+        self.check_interval = check_interval
+        self.loads = 0
+        self._value = None
+        self._fingerprint = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        """The current index, or None if ingestion hasn't written one."""
+        if self._value is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return self._value
+        with self._lock:
+            if self._value is not None and time.monotonic() - self._checked_at < self.check_interval:
+                return self._value
+            fingerprint = corpus_fingerprint(self.directory)
+            if self._value is None or fingerprint != self._fingerprint:
+                try:
+                    value = self.loader(self.directory)
+                except Exception:
+                    # Caught mid-rewrite: keep serving the previous index and retry on the next check
+                    if self._value is None:
+                        raise
+                else:
+                    self._value, self._fingerprint = value, fingerprint
+                    self.loads += value is not None
+            self._checked_at = time.monotonic()
+            return self._value
+
+class CacheLookup(NamedTuple):
+    """A cached answer (or None) and the vector store fingerprint it was looked up against."""
+    answer: str
+    fingerprint: tuple
+
+class SemanticCache:
+    """
+    Size-bounded LRU cache of answers keyed by query embedding.
+    A lookup hits when a stored query has cosine similarity above the threshold.
+    All entries are dropped when the vector store directory changes.
+    """
+
+    def __init__(self, corpus_dir: str, max_entries: int = SEMANTIC_CACHE_SIZE,
+                 threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                 check_interval: float = SEMANTIC_CACHE_CHECK_INTERVAL):
+        self.corpus_dir = corpus_dir
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.check_interval = check_interval
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.stale_puts = 0
+        self._vectors = None
+        self._entries = OrderedDict()  # slot -> answer, oldest first
+        self._lock = threading.Lock()
+        self._fingerprint = corpus_fingerprint(corpus_dir)
+        self._checked_at = time.monotonic()
+
+    def _check_corpus(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        fingerprint = corpus_fingerprint(self.corpus_dir)
+        if fingerprint != self._fingerprint:
+            self._fingerprint = fingerprint
+            self._entries.clear()
+            self.invalidations += 1
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def lookup(self, query_vector) -> CacheLookup:
+        """
+        The cached answer for a semantically similar query (None on a miss), with the store
+        fingerprint it was checked against; pass that to `put` with the generated answer.
+        """
+        vector = self._normalize(query_vector)
+        with self._lock:
+            self._check_corpus()
+            if self._entries:
+                slots = list(self._entries)
+                similarities = self._vectors[slots] @ vector
+                best = int(similarities.argmax())
+                if similarities[best] >= self.threshold:
+                    slot = slots[best]
+                    self._entries.move_to_end(slot)
+                    self.hits += 1
+                    return CacheLookup(self._entries[slot], self._fingerprint)
+            self.misses += 1
+            return CacheLookup(None, self._fingerprint)
+
+    def get(self, query_vector):
+        """Return the cached answer for a semantically similar query, or None."""
+        return self.lookup(query_vector).answer
+
+    def put(self, query_vector, answer: str, fingerprint: tuple = None) -> bool:
+        """
+        Store an answer, evicting the least recently used entry when full. With the `fingerprint`
+        from `lookup`, an answer generated while the vector store was rebuilt is dropped instead.
+        """
+        vector = self._normalize(query_vector)
+        with self._lock:
+            if fingerprint is not None:
+                self._check_corpus(force=True)
+                if fingerprint != self._fingerprint:
+                    self.stale_puts += 1
+                    return False
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+
+            if len(self._entries) < self.max_entries:
+                # Slots are only freed all at once, so the next free one is the count
+                slot = len(self._entries)
+            else:
+                slot, _ = self._entries.popitem(last=False)
+
+            self._vectors[slot] = vector
+            self._entries[slot] = answer
+            return True
+
+    def clear(self):
+        """Drop every cached answer."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Return hit-rate statistics."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "invalidations": self.invalidations,
+                "stale_puts": self.stale_puts
+            }
+
+__all__ = ["SemanticCache", "CacheLookup", "SnapshotWatcher", "corpus_fingerprint"]
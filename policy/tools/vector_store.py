@@ -0,0 +1,110 @@
+import json
+import os
+from typing import NamedTuple
+import numpy as np
+import resources
+resources.load_settings()
+
+# "chroma" (SQLite + HNSW) or "numpy" (brute force over a memory-mapped snapshot, for small corpora)
+POLICY_VECTOR_STORE = os.getenv("POLICY_VECTOR_STORE", "chroma")
+NUMPY_SNAPSHOT_DIRECTORY = os.path.join(os.path.dirname(resources.POLICY_DB_DIRECTORY), "numpy_store")
+
+VECTORS_FILE = "embeddings.npy"
+CHUNKS_FILE = "chunks.json"
+
+class StoredChunk(NamedTuple):
+    """A retrieved chunk; has the `page_content` / `metadata` fields of a LangChain Document."""
+    page_content: str
+    metadata: dict
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def write_snapshot(directory: str, ids, texts, metadatas, vectors):
+    """
+    Save chunks and their unit-normalized float32 vectors for `NumpyVectorStore.load`.
+    Each file is replaced atomically; the chunk list goes last and load checks the two agree.
+    """
+    os.makedirs(directory, exist_ok=True)
+    matrix = np.ascontiguousarray(_normalize(np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1)))
+
+    vectors_path = os.path.join(directory, VECTORS_FILE)
+    with open(vectors_path + ".tmp", "wb") as f:
+        np.save(f, matrix)
+    os.replace(vectors_path + ".tmp", vectors_path)
+
+    chunks_path = os.path.join(directory, CHUNKS_FILE)
+    with open(chunks_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"ids": list(ids), "texts": list(texts), "metadatas": [m or {} for m in metadatas]}, f, ensure_ascii=False)
+    os.replace(chunks_path + ".tmp", chunks_path)
+
+def export_snapshot(store, directory: str = NUMPY_SNAPSHOT_DIRECTORY):
+    """Write a snapshot of everything in a Chroma store (no re-embedding)."""
+    data = store.get(include=["embeddings", "documents", "metadatas"])
+    write_snapshot(directory, data["ids"], data["documents"], data["metadatas"], data["embeddings"])
+
+class NumpyVectorStore:
+    """
+    Brute-force cosine search over one contiguous float32 matrix.
+    For a corpus of a few hundred chunks a single matrix-vector product beats an ANN index,
+    and loading is just a memory map, without Chroma's SQLite and HNSW startup.
+    """
+
+    def __init__(self, vectors: np.ndarray, texts, metadatas=None, ids=None, embedding_function=None):
+        if len(vectors) != len(texts):
+            raise ValueError(f"Snapshot mismatch: {len(vectors)} vectors for {len(texts)} chunks")
+        self.vectors = vectors
+        self.texts = list(texts)
+        self.metadatas = list(metadatas) if metadatas is not None else [{} for _ in self.texts]
+        self.ids = list(ids) if ids is not None else [str(i) for i in range(len(self.texts))]
+        self.embedding_function = embedding_function
+
+    @classmethod
+    def load(cls, directory: str = NUMPY_SNAPSHOT_DIRECTORY, embedding_function=None) -> "NumpyVectorStore":
+        """Open a snapshot written by `write_snapshot`; vectors stay memory-mapped and read-only."""
+        vectors = np.load(os.path.join(directory, VECTORS_FILE), mmap_mode="r")
+        with open(os.path.join(directory, CHUNKS_FILE), encoding="utf-8") as f:
+            chunks = json.load(f)
+        return cls(vectors, chunks["texts"], chunks["metadatas"], chunks["ids"], embedding_function)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def similarity_search_with_score_by_vector(self, embedding, k: int = 4):
+        """`(chunk, cosine similarity)` pairs for the `k` closest chunks, best first."""
+        if not self.texts:
+            return []
+        query = _normalize(np.asarray(embedding, dtype=np.float32))
+        scores = self.vectors @ query
+        k = min(k, len(scores))
+        # Partial selection, then sort only the k winners
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(StoredChunk(self.texts[i], self.metadatas[i]), float(scores[i])) for i in top]
+
+    def similarity_search_by_vector(self, embedding, k: int = 4):
+        return [chunk for chunk, _ in self.similarity_search_with_score_by_vector(embedding, k)]
+
+    async def asimilarity_search_by_vector(self, embedding, k: int = 4):
+        # Microseconds of NumPy work: not worth a thread hop
+        return self.similarity_search_by_vector(embedding, k)
+
+    def similarity_search(self, query: str, k: int = 4):
+        return self.similarity_search_by_vector(self.embedding_function.embed_query(query), k)
+
+def create_policy_store(backend: str = POLICY_VECTOR_STORE, embedding_function=None):
+    """The policy vector store for the configured backend."""
+    if backend == "numpy":
+        return NumpyVectorStore.load(NUMPY_SNAPSHOT_DIRECTORY, embedding_function)
+    if backend == "chroma":
+        from langchain_chroma import Chroma
+        return Chroma(persist_directory=resources.POLICY_DB_DIRECTORY, embedding_function=embedding_function)
+    raise ValueError(f"Unknown POLICY_VECTOR_STORE: {backend}")
+
+def policy_store_directory(backend: str = POLICY_VECTOR_STORE) -> str:
+    """Directory holding the configured store's files (watched by the answer cache)."""
+    return NUMPY_SNAPSHOT_DIRECTORY if backend == "numpy" else resources.POLICY_DB_DIRECTORY
+
+__all__ = ["NumpyVectorStore", "StoredChunk", "create_policy_store", "policy_store_directory", "write_snapshot",
+           "export_snapshot", "POLICY_VECTOR_STORE", "NUMPY_SNAPSHOT_DIRECTORY", "CHUNKS_FILE"]
@@ -1,25 +1,22 @@
 import os
 from realtime_db_agent.tools.realtime_db_tool import db_tool
-from dotenv import load_dotenv
-load_dotenv()
+import resources
+resources.load_settings()
 
 def db_agent(query: str) -> str:
     """Process a database-related query and return a response."""
+    # The raw question drives routing and the plan cache; the prompts already carry every table schema
     try:
-        # Add enrichment context to help with any database queries
-        enriched_query = f"""
-        Query: {query}
-        
-        Context: The user is asking about information in our database, which contains:
-        - Product information (products table)
-        - User/customer details (users table)
-        - Transaction/order history (transactions table)
-        
-        Be thorough in your search across all relevant tables.
-        """
-        return db_tool.run(enriched_query)
+        return db_tool.run(query)
+    except Exception as e:
+        return f"I couldn't find the information you're looking for. Could you provide more details?"
+
+async def adb_agent(query: str) -> str:
+    """Async version of db_agent."""
+    try:
+        return await db_tool.arun(query)
     except Exception as e:
         return f"I couldn't find the information you're looking for. Could you provide more details?"
 
 # Export the function
-__all__ = ["db_agent"]
\ No newline at end of file
+__all__ = ["db_agent", "adb_agent"]
\ No newline at end of file
@@ -1,38 +1,185 @@
+import argparse
+import json
+import math
 import pandas as pd
-from supabase import create_client, Client
+from supabase import Client
+from postgrest.types import ReturnMethod
 from dotenv import load_dotenv
 import os   
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from realtime_db_agent.db_client import get_supabase_client
 load_dotenv()
 
-# Supabase credentials
-url = os.getenv("SUPABASE_URL")
-key = os.getenv("SUPABASE_API")
-
-supabase: Client = create_client(url, key)
-
-# Load CSV
-df = pd.read_csv("realtime_db_agent/dataset/products.csv")
-
-# Rename columns to match DB table
-df.rename(columns={
-    "Product ID": "product_id",
-    "Product Name": "product_name",
-    "Product Category": "product_category",
-    "Product Description": "product_description",
-    "Price": "price",
-    "Stock Quantity": "stock_quantity",
-    "Warranty Period": "warranty_period",
-    "Product Dimensions": "product_dimensions",
-    "Manufacturing Date": "manufacturing_date",
-    "Expiration Date": "expiration_date",
-    "SKU": "sku",
-    "Product Tags": "product_tags",
-    "Color/Size Variations": "color_size_variations",
-    "Product Ratings": "product_ratings"
-}, inplace=True)
-
-# Insert into Supabase
-for row in df.to_dict(orient="records"):
-    supabase.table("products").insert(row).execute()
-
-print("✅ Products inserted successfully!")
+current_dir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CHECKPOINT = os.path.join(current_dir, ".upload_checkpoint.json")
+
+# Per-table CSV location, column renames (CSV header -> DB column) and upsert key.
+# An empty column map means the CSV headers must already be the DB column names.
+TABLES = {
+    "products": {
+        "csv": os.path.join(current_dir, "products.csv"),
+        "key": "product_id",
+        "columns": {
+            "Product ID": "product_id",
+            "Product Name": "product_name",
+            "Product Category": "product_category",
+            "Product Description": "product_description",
+            "Price": "price",
+            "Stock Quantity": "stock_quantity",
+            "Warranty Period": "warranty_period",
+            "Product Dimensions": "product_dimensions",
+            "Manufacturing Date": "manufacturing_date",
+            "Expiration Date": "expiration_date",
+            "SKU": "sku",
+            "Product Tags": "product_tags",
+            "Color/Size Variations": "color_size_variations",
+            "Product Ratings": "product_ratings"
+        }
+    },
+    # Only the products export ships with the repo; pass the others with --csv
+    "users": {
+        "csv": os.path.join(current_dir, "users.csv"),
+        "key": "user_id",
+        "columns": {}
+    },
+    "transactions": {
+        "csv": os.path.join(current_dir, "transactions.csv"),
+        "key": "transaction_id",
+        "columns": {}
+    }
+}
+
+def load_checkpoint(path: str) -> dict:
+    """Read the checkpoint file (table -> progress), or an empty one."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_checkpoint(path: str, checkpoint: dict):
+    """Write the checkpoint atomically so a crash never leaves it half-written."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp_path, path)
+
+def chunk_to_rows(chunk: pd.DataFrame, columns: dict):
+    """Rename CSV columns and convert a chunk to JSON-safe records (NaN -> None)."""
+    chunk = chunk.rename(columns=columns)
+    return [
+        {k: (None if isinstance(v, float) and math.isnan(v) else v) for k, v in row.items()}
+        for row in chunk.to_dict(orient="records")
+    ]
+
+def upsert_batch(supabase: Client, table: str, key: str, rows: list, retries: int = 3):
+    """Upsert one batch, retrying with exponential backoff on failure."""
+    for attempt in range(retries + 1):
+        try:
+            supabase.table(table).upsert(rows, on_conflict=key, returning=ReturnMethod.minimal).execute()
+            return len(rows)
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(2 ** attempt)
+
+def upload_table(table: str, csv_path: str = None, batch_size: int = 500, concurrency: int = 4,
+                 checkpoint_path: str = DEFAULT_CHECKPOINT, retries: int = 3, reset: bool = False):
+    """
+    Stream a CSV into a table in multi-row upsert batches, several in flight at once.
+    Progress is checkpointed as the count of leading rows known to be stored, so an
+    interrupted load resumes there; upserts make any re-sent rows harmless.
+    """
+    config = TABLES[table]
+    csv_path = csv_path or config["csv"]
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"No CSV for {table} at {csv_path}; pass its path with --csv")
+    supabase = get_supabase_client()
+
+    checkpoint = load_checkpoint(checkpoint_path)
+    progress = checkpoint.get(table, {})
+    if reset or progress.get("csv") != os.path.abspath(csv_path):
+        progress = {"csv": os.path.abspath(csv_path), "rows_done": 0}
+    start_row = progress["rows_done"]
+    if start_row:
+        print(f"Resuming {table} from row {start_row}")
+
+    lock = threading.Lock()
+    finished = {}  # batch start row -> row count, for batches done out of order
+    state = {"watermark": start_row}
+
+    def on_done(batch_start: int, count: int):
+        with lock:
+            finished[batch_start] = count
+            # Only advance past a contiguous run of completed batches
+            while state["watermark"] in finished:
+                state["watermark"] += finished.pop(state["watermark"])
+            progress["rows_done"] = state["watermark"]
+            checkpoint[table] = progress
+            save_checkpoint(checkpoint_path, checkpoint)
+
+    reader = pd.read_csv(csv_path, chunksize=batch_size, skiprows=range(1, start_row + 1))
+    started = time.perf_counter()
+    uploaded = 0
+    batch_start = start_row
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        in_flight = {}
+        for chunk in reader:
+            rows = chunk_to_rows(chunk, config["columns"])
+            future = pool.submit(upsert_batch, supabase, table, config["key"], rows, retries)
+            in_flight[future] = batch_start
+            batch_start += len(rows)
+
+            # Bound memory to a few batches in flight
+            if len(in_flight) >= concurrency:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for done_future in done:
+                    count = done_future.result()
+                    uploaded += count
+                    on_done(in_flight.pop(done_future), count)
+
+        for done_future in list(in_flight):
+            count = done_future.result()
+            uploaded += count
+            on_done(in_flight.pop(done_future), count)
+
+    elapsed = time.perf_counter() - started
+    rate = uploaded / elapsed if elapsed else 0.0
+    print(f"✅ {table}: upserted {uploaded} rows in {elapsed:.1f}s ({rate:.0f} rows/s)")
+    return {"table": table, "rows": uploaded, "seconds": elapsed, "rows_per_second": rate}
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load CSV datasets into Supabase.")
+    parser.add_argument("tables", nargs="*", default=["products"], choices=list(TABLES),
+                        help="tables to load (default: products)")
+    parser.add_argument("--csv", help="CSV path override (only with a single table)")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=4, help="batches in flight at once")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT)
+    parser.add_argument("--reset", action="store_true", help="ignore the checkpoint and start over")
+    args = parser.parse_args()
+
+    if args.csv and len(args.tables) != 1:
+        parser.error("--csv can only be used with a single table")
+
+    for table in args.tables:
+        try:
+            upload_table(
+                table,
+                csv_path=args.csv,
+                batch_size=args.batch_size,
+                concurrency=args.concurrency,
+                checkpoint_path=args.checkpoint,
+                retries=args.retries,
+                reset=args.reset
+            )
+        except FileNotFoundError as e:
+            parser.error(str(e))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import os
+import threading
+import httpx
+import resources
+from postgrest import AsyncPostgrestClient, SyncPostgrestClient
+from postgrest.constants import DEFAULT_POSTGREST_CLIENT_TIMEOUT
+from postgrest.utils import SyncClient
+from supabase import Client
+from supabase._async.client import AsyncClient
+from supabase.lib.client_options import ClientOptions
+resources.load_settings()
+
+# Connection pool configuration
+SUPABASE_POOL_SIZE = int(os.getenv("SUPABASE_POOL_SIZE", "10"))
+SUPABASE_KEEPALIVE_EXPIRY = float(os.getenv("SUPABASE_KEEPALIVE_EXPIRY", "60"))
+
+class PooledPostgrestClient(SyncPostgrestClient):
+    """PostgREST client whose HTTP session keeps a bounded pool of live connections."""
+
+    def __init__(self, base_url: str, *, limits: httpx.Limits, **kwargs):
+        self.limits = limits
+        super().__init__(base_url, **kwargs)
+
+    def create_session(self, base_url, headers, timeout) -> SyncClient:
+        return SyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            limits=self.limits
+        )
+
+class PooledSupabaseClient(Client):
+    """
+    Supabase client that reuses keep-alive HTTP connections across queries.
+    httpx connection pools are thread-safe, so one instance can be shared by
+    every session in the process.
+    """
+
+    def __init__(self, supabase_url: str, supabase_key: str, options: ClientOptions = None,
+                 pool_size: int = SUPABASE_POOL_SIZE):
+        self.limits = httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=SUPABASE_KEEPALIVE_EXPIRY
+        )
+        super().__init__(supabase_url, supabase_key, options or ClientOptions())
+
+    def _init_postgrest_client(self, rest_url, headers, schema, timeout=DEFAULT_POSTGREST_CLIENT_TIMEOUT):
+        return PooledPostgrestClient(
+            rest_url,
+            headers=headers,
+            schema=schema,
+            timeout=timeout,
+            limits=self.limits
+        )
+
+class PooledAsyncPostgrestClient(AsyncPostgrestClient):
+    """Async PostgREST client with the same bounded keep-alive pool."""
+
+    def __init__(self, base_url: str, *, limits: httpx.Limits, **kwargs):
+        self.limits = limits
+        super().__init__(base_url, **kwargs)
+
+    def create_session(self, base_url, headers, timeout) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            limits=self.limits
+        )
+
+class PooledAsyncSupabaseClient(AsyncClient):
+    """
+    Async Supabase client for the asyncio pipeline.
+    Its connections belong to the event loop that first uses it, so create one per loop.
+    """
+
+    def __init__(self, supabase_url: str, supabase_key: str, options: ClientOptions = None,
+                 pool_size: int = SUPABASE_POOL_SIZE):
+        self.limits = httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=SUPABASE_KEEPALIVE_EXPIRY
+        )
+        super().__init__(supabase_url, supabase_key, options or ClientOptions())
+
+    def _init_postgrest_client(self, rest_url, headers, schema, timeout=DEFAULT_POSTGREST_CLIENT_TIMEOUT):
+        return PooledAsyncPostgrestClient(
+            rest_url,
+            headers=headers,
+            schema=schema,
+            timeout=timeout,
+            limits=self.limits
+        )
+
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
+def create_pooled_client(url: str, key: str, pool_size: int = SUPABASE_POOL_SIZE) -> PooledSupabaseClient:
+    """Create a new pooled Supabase client for the given project."""
+    client = PooledSupabaseClient(url, key, pool_size=pool_size)
+    # Build the PostgREST session up front so threads never race on the lazy property
+    client.postgrest
+    return client
+
+def get_supabase_client() -> PooledSupabaseClient:
+    """Return the process-wide Supabase client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = create_pooled_client(
+                    os.getenv("SUPABASE_URL"),
+                    os.getenv("SUPABASE_API")
+                )
+    return _client
+
+def get_async_supabase_client() -> PooledAsyncSupabaseClient:
+    """Return the process-wide async Supabase client, creating it on first use."""
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                _async_client = PooledAsyncSupabaseClient(
+                    os.getenv("SUPABASE_URL"),
+                    os.getenv("SUPABASE_API")
+                )
+                _async_client.postgrest
+    return _async_client
+
+def close_supabase_client():
+    """Close the shared client's connections (e.g. on shutdown)."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.postgrest.aclose()
+            _client = None
+
+async def aclose_async_supabase_client():
+    """Close the async client's connections; call from the event loop that used it."""
+    global _async_client
+    with _client_lock:
+        client, _async_client = _async_client, None
+    if client is not None:
+        await client.postgrest.aclose()
+
+__all__ = ["get_supabase_client", "get_async_supabase_client", "create_pooled_client", "close_supabase_client", "aclose_async_supabase_client", "PooledSupabaseClient"]
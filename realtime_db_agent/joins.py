@@ -0,0 +1,134 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+import resources
+from tracing import in_context
+resources.load_settings()
+
+# Join stage configuration
+JOIN_IN_CHUNK_SIZE = int(os.getenv("JOIN_IN_CHUNK_SIZE", "200"))
+JOIN_FETCH_WORKERS = int(os.getenv("JOIN_FETCH_WORKERS", "4"))
+
+join_executor = ThreadPoolExecutor(max_workers=JOIN_FETCH_WORKERS, thread_name_prefix="join-fetch")
+
+def _unique(values):
+    """Deduplicate hashable values, keeping first-seen order."""
+    return list(dict.fromkeys(v for v in values if v is not None))
+
+def chunk_queries(table: str, column: str, values, chunk_size: int = JOIN_IN_CHUNK_SIZE):
+    """Build bounded `in` queries for the deduplicated `values`."""
+    values = _unique(values)
+    return [
+        {
+            "table_name": table,
+            "select": "*",
+            "filters": [{"column": column, "operator": "in", "value": values[i:i + chunk_size]}]
+        }
+        for i in range(0, len(values), chunk_size)
+    ]
+
+def hash_join(left_records, right_rows, left_key: str, right_column: str, right_table: str):
+    """
+    Left-join `right_rows` onto `left_records` with an in-memory hash table on `right_column`.
+    Right-hand columns are prefixed with the table name so they can't clobber left columns.
+    """
+    buckets = {}
+    for row in right_rows:
+        buckets.setdefault(row.get(right_column), []).append(row)
+
+    joined = []
+    for record in left_records:
+        matches = buckets.get(record.get(left_key))
+        if not matches:
+            joined.append(record)
+            continue
+        for row in matches:
+            merged = dict(record)
+            merged.update((f"{right_table}.{k}", v) for k, v in row.items())
+            joined.append(merged)
+    return joined
+
+def deduplicate(records):
+    """Drop identical records, keeping first-seen order."""
+    seen = set()
+    unique = []
+    for record in records:
+        key = tuple(sorted((k, repr(v)) for k, v in record.items()))
+        if key not in seen:
+            seen.add(key)
+            unique.append(record)
+    return unique
+
+def _join_waves(primary_table: str, primary_rows, join_conditions):
+    """
+    Drive a join plan one wave at a time.
+    Yields the chunked `in` queries of each wave and expects their results sent back
+    in the same order; returns the joined, deduplicated records and the joined tables.
+    """
+    # Where each (table, column) lives in the joined records
+    keys = {(primary_table, column): column for row in primary_rows for column in row}
+    records = [dict(row) for row in primary_rows]
+    joined_tables = [primary_table]
+    pending = [j for j in join_conditions if j.get("table1") and j.get("table2")]
+
+    while pending:
+        wave = []
+        for join in pending:
+            if join["table1"] in joined_tables and join["table2"] not in joined_tables:
+                wave.append((join["table1"], join.get("column1"), join["table2"], join.get("column2")))
+            elif join["table2"] in joined_tables and join["table1"] not in joined_tables:
+                wave.append((join["table2"], join.get("column2"), join["table1"], join.get("column1")))
+        # Only one fetch per new table per wave
+        wave = list({right_table: (lt, lc, right_table, rc) for lt, lc, right_table, rc in wave}.values())
+        if not wave:
+            break
+
+        # Every chunk of every table in the wave is fetched at once
+        queries, owners = [], []
+        for i, (left_table, left_column, right_table, right_column) in enumerate(wave):
+            left_key = keys.get((left_table, left_column), left_column)
+            table_queries = chunk_queries(right_table, right_column, [record.get(left_key) for record in records])
+            queries.extend(table_queries)
+            owners.extend([i] * len(table_queries))
+        results = yield queries
+        fetched = [[] for _ in wave]
+        for owner, result in zip(owners, results):
+            fetched[owner].extend(result.get("data", []))
+
+        for (left_table, left_column, right_table, right_column), right_rows in zip(wave, fetched):
+            left_key = keys.get((left_table, left_column), left_column)
+            records = hash_join(records, right_rows, left_key, right_column, right_table)
+            keys.update({(right_table, column): f"{right_table}.{column}" for row in right_rows for column in row})
+            joined_tables.append(right_table)
+
+        pending = [j for j in pending if not (j["table1"] in joined_tables and j["table2"] in joined_tables)]
+
+    return deduplicate(records), joined_tables
+
+def execute_join_plan(execute_query, primary_table: str, primary_rows, join_conditions):
+    """
+    Join the planned tables onto the primary rows.
+    Conditions whose left side is already joined are fetched together in parallel
+    waves, so chains like users -> transactions -> products also work.
+    Returns the joined, deduplicated records and the tables that were joined.
+    """
+    waves = _join_waves(primary_table, primary_rows, join_conditions)
+    try:
+        queries = next(waves)
+        while True:
+            # A single map per wave, so queries never wait on each other inside the pool
+            queries = waves.send(list(join_executor.map(in_context(execute_query), queries)))
+    except StopIteration as done:
+        return done.value
+
+async def aexecute_join_plan(aexecute_query, primary_table: str, primary_rows, join_conditions):
+    """Async version of execute_join_plan; each wave's queries run concurrently on the event loop."""
+    waves = _join_waves(primary_table, primary_rows, join_conditions)
+    try:
+        queries = next(waves)
+        while True:
+            queries = waves.send(await asyncio.gather(*(aexecute_query(query) for query in queries)))
+    except StopIteration as done:
+        return done.value
+
+__all__ = ["execute_join_plan", "aexecute_join_plan", "chunk_queries", "hash_join", "deduplicate"]
@@ -1,65 +1,64 @@
-from supabase import create_client, Client
+from supabase import Client
 import os
-from dotenv import load_dotenv  
-load_dotenv()
+import threading
+import time
+import resources
+from tracing import span
+resources.load_settings()
 
-url = os.getenv("SUPABASE_URL")
-key = os.getenv("SUPABASE_API")
-supabase: Client = create_client(url, key)
+# Shared, pooled Supabase client (connects on first use)
+supabase: Client = resources.lazy("supabase")
 
 # Load table configuration from environment
 AVAILABLE_TABLES = os.getenv("DB_TABLES", "products,users,transactions").split(",")
 
-def get_table_schema(table_name: str, sample_rows: int = 5):
+# How long cached schema text stays valid (seconds, 0 disables expiry)
+SCHEMA_CACHE_TTL = float(os.getenv("SCHEMA_CACHE_TTL", "600"))
+
+def _fetch_table_info(table_name: str, sample_rows: int = 5):
     """
-    Get schema information for a specific table.
-    Returns formatted schema text with column details and example rows.
+    Fetch raw schema information for a table from Supabase.
+    Returns the columns, column descriptions and example rows.
     """
-    # Get columns
-    columns_result = supabase.rpc('describe_table', {'table_name': table_name}).execute()
-    columns = columns_result.data if hasattr(columns_result, "data") else []
+    with span("supabase.schema", table=table_name):
+        # Get columns
+        columns_result = supabase.rpc('describe_table', {'table_name': table_name}).execute()
+        columns = columns_result.data if hasattr(columns_result, "data") else []
 
-    # Get descriptions
-    desc_result = supabase.table("column_descriptions").select("*").eq("table_name", table_name).execute()
-    descriptions = {d["column_name"]: d["description"] for d in desc_result.data}
+        # Get descriptions
+        desc_result = supabase.table("column_descriptions").select("*").eq("table_name", table_name).execute()
+        descriptions = {d["column_name"]: d["description"] for d in desc_result.data}
 
-    # Build schema text
+        # Get example rows (reduced from 10 to 5 to prevent token overflow)
+        examples = supabase.table(table_name).select("*").limit(sample_rows).execute()
+        example_rows = examples.data if hasattr(examples, "data") else []
+
+    return {
+        "columns": columns,
+        "descriptions": descriptions,
+        "example_rows": example_rows
+    }
+
+def _render_table_schema(table_name: str, info: dict, sample_rows: int = 5):
+    """Build the prompt text for a table from its raw schema information."""
     schema = f"Table: {table_name}\nColumns:\n"
-    column_names = []
-    for col in columns:
+    for col in info["columns"]:
         name = col["column_name"]
         dtype = col["data_type"]
-        column_names.append(name)
-        desc = descriptions.get(name, "No description available")
+        desc = info["descriptions"].get(name, "No description available")
         schema += f"- {name} ({dtype}): {desc}\n"
 
-    # Get example rows (reduced from 10 to 5 to prevent token overflow)
-    examples = supabase.table(table_name).select("*").limit(sample_rows).execute()
-    example_rows = examples.data if hasattr(examples, "data") else []
-
     schema += "\nExample rows:\n"
-    for row in example_rows:
+    for row in info["example_rows"][:sample_rows]:
         row_repr = ", ".join(f"{k}: {v}" for k, v in row.items())
         schema += f"- {row_repr}\n"
 
     return schema
 
-def get_all_schemas(sample_rows: int = 3):
-    """
-    Get schema information for all available tables.
-    Returns combined schema text for all tables.
-    """
-    all_schemas = ""
-    for table in AVAILABLE_TABLES:
-        # Use even fewer sample rows when getting all schemas
-        schema = get_table_schema(table, sample_rows)
-        all_schemas += f"\n\n{schema}"
-    
-    return all_schemas
-
-def get_table_relationships():
+def _find_relationships(columns_by_table: dict):
     """
     Identify foreign key relationships between tables.
+    `columns_by_table` maps each table name to its list of column names.
     """
     relationships = []
     
@@ -75,18 +74,11 @@ def get_table_relationships():
         table1, col1, table2, col2 = rel
         
         # Skip if tables aren't in our available tables list
-        if table1 not in AVAILABLE_TABLES or table2 not in AVAILABLE_TABLES:
+        if table1 not in columns_by_table or table2 not in columns_by_table:
             continue
-            
-        # Get columns for both tables to verify
-        cols1 = supabase.rpc('describe_table', {'table_name': table1}).execute()
-        cols2 = supabase.rpc('describe_table', {'table_name': table2}).execute()
-        
-        col1_names = [c["column_name"] for c in cols1.data]
-        col2_names = [c["column_name"] for c in cols2.data]
         
         # Check if the columns exist
-        if col1 in col1_names and col2 in col2_names:
+        if col1 in columns_by_table[table1] and col2 in columns_by_table[table2]:
             relationships.append({
                 "from_table": table1,
                 "from_column": col1,
@@ -95,3 +87,151 @@ def get_table_relationships():
             })
     
     return relationships
+
+class SchemaRegistry:
+    """
+    Process-wide cache of table schemas, descriptions, example rows and relationships.
+    Everything is fetched from Supabase once and served from memory until the
+    TTL expires or `invalidate` is called. Hits and misses count table lookups.
+    """
+
+    def __init__(self, tables, ttl: float = SCHEMA_CACHE_TTL, sample_rows: int = 5):
+        self.tables = list(tables)
+        self.ttl = ttl
+        self.sample_rows = sample_rows
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._relationships = None
+        self._relationships_loaded_at = 0.0
+        # Bumped by `invalidate` so a fetch that started before it isn't stored
+        self._generation = 0
+        self._lock = threading.Lock()
+        # One lock per table so only one caller fetches it, without blocking other tables
+        self._fetch_locks = {}
+
+    def _is_fresh(self, loaded_at: float) -> bool:
+        return self.ttl <= 0 or (time.monotonic() - loaded_at) < self.ttl
+
+    def _cached_entry(self, table_name: str):
+        entry = self._entries.get(table_name)
+        if entry is not None and self._is_fresh(entry["loaded_at"]):
+            return entry
+        return None
+
+    def _get_entry(self, table_name: str) -> dict:
+        with self._lock:
+            entry = self._cached_entry(table_name)
+            if entry is not None:
+                self.hits += 1
+                return entry
+            self.misses += 1
+            fetch_lock = self._fetch_locks.setdefault(table_name, threading.Lock())
+
+        # The network round trips run outside the registry lock
+        with fetch_lock:
+            with self._lock:
+                entry = self._cached_entry(table_name)
+                generation = self._generation
+            if entry is not None:
+                # Fetched by another caller while this one waited
+                return entry
+
+            entry = {
+                "info": _fetch_table_info(table_name, self.sample_rows),
+                "rendered": {},
+                "loaded_at": time.monotonic()
+            }
+            with self._lock:
+                if generation == self._generation:
+                    self._entries[table_name] = entry
+            return entry
+
+    def get_table_schema(self, table_name: str, sample_rows: int = 5) -> str:
+        """Return the formatted schema text for a table, rendering it at most once."""
+        sample_rows = min(sample_rows, self.sample_rows)
+        entry = self._get_entry(table_name)
+        with self._lock:
+            rendered = entry["rendered"]
+            if sample_rows not in rendered:
+                rendered[sample_rows] = _render_table_schema(table_name, entry["info"], sample_rows)
+            return rendered[sample_rows]
+
+    def get_all_schemas(self, sample_rows: int = 5) -> str:
+        """Return the combined schema text for all registered tables."""
+        all_schemas = ""
+        for table in self.tables:
+            all_schemas += f"\n\n{self.get_table_schema(table, sample_rows)}"
+        return all_schemas
+
+    def get_relationships(self):
+        """Return the validated relationships between registered tables."""
+        with self._lock:
+            if self._relationships is not None and self._is_fresh(self._relationships_loaded_at):
+                return self._relationships
+            generation = self._generation
+
+        # Table lookups are counted (and fetched when missing) by `_get_entry`
+        columns_by_table = {
+            table: [c["column_name"] for c in self._get_entry(table)["info"]["columns"]]
+            for table in self.tables
+        }
+        relationships = _find_relationships(columns_by_table)
+        with self._lock:
+            if generation == self._generation:
+                self._relationships = relationships
+                self._relationships_loaded_at = time.monotonic()
+        return relationships
+
+    def invalidate(self, table_name: str = None):
+        """Drop cached data for one table, or for everything when no table is given."""
+        with self._lock:
+            if table_name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(table_name, None)
+            self._relationships = None
+            self._generation += 1
+
+    def refresh(self):
+        """Invalidate and eagerly re-fetch every registered table."""
+        self.invalidate()
+        self.get_all_schemas()
+        self.get_relationships()
+
+    def stats(self) -> dict:
+        """Return cache hit/miss counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "cached_tables": sorted(self._entries)
+            }
+
+# Shared registry used by the query generation pipeline
+schema_registry = SchemaRegistry(AVAILABLE_TABLES)
+
+def get_table_schema(table_name: str, sample_rows: int = 5):
+    """
+    Get schema information for a specific table.
+    Returns formatted schema text with column details and example rows.
+    Always fetches fresh data; use `schema_registry` for cached lookups.
+    """
+    info = _fetch_table_info(table_name, sample_rows)
+    return _render_table_schema(table_name, info, sample_rows)
+
+def get_all_schemas(sample_rows: int = 3):
+    """
+    Get schema information for all available tables.
+    Returns combined schema text for all tables.
+    """
+    # Use even fewer sample rows when getting all schemas
+    return schema_registry.get_all_schemas(sample_rows)
+
+def get_table_relationships():
+    """
+    Identify foreign key relationships between tables.
+    """
+    return schema_registry.get_relationships()
@@ -1,41 +1,72 @@
-from openai import OpenAI
 from langchain_core.messages import HumanMessage
-from supabase import create_client, Client
+from supabase import Client
 import os
-from dotenv import load_dotenv
-from realtime_db_agent.part1_schema_retreival import get_table_schema
+import resources
+from realtime_db_agent.db_client import get_async_supabase_client, get_supabase_client
+from realtime_db_agent.part1_schema_retreival import schema_registry
+from realtime_db_agent.products_mirror import PRODUCTS_MIRROR_SOURCE, create_products_mirror
+from realtime_db_agent.plan_cache import PlanCache
+from realtime_db_agent.joins import aexecute_join_plan, execute_join_plan
+from realtime_db_agent.result_encoder import encode_results
+from realtime_db_agent.query_log import log_encoding, log_query
+from tracing import span
+import asyncio
 import json
 import re
-import logging
+import time
 
-load_dotenv()
+resources.load_settings()
 
 # Load table configuration from environment
 AVAILABLE_TABLES = os.getenv("DB_TABLES").split(",")
 
-# Initialize Nebius client
-client = OpenAI(
-    base_url="https://api.studio.nebius.com/v1/",
-    api_key=os.environ.get("NEBIUS_API_KEY")
-)
+# Shared Nebius client, built on first use (sync and async calls, with retries and timeouts)
+NEBIUS_MODEL = "Qwen/Qwen3-Coder-30B-A3B-Instruct"
+client = resources.lazy("nebius")
 
-# Set up logging
-logging.basicConfig(
-    filename='database_queries.log',
-    level=logging.INFO,
-    format='%(asctime)s - %(message)s'
-)
+def chat_completion(messages: list, temperature: float) -> str:
+    """Run a Nebius chat completion, traced with its token usage, and return the reply text."""
+    with span("llm", model=NEBIUS_MODEL) as call:
+        response = client.complete(messages, NEBIUS_MODEL, temperature)
+        call.record_llm(response)
+    return response.content
 
-def generate_supabase_query(user_question: str) -> dict:
-    """Generate Supabase query parameters from user question using all available tables."""
-    
-    # Get schema for all tables
-    all_schemas = ""
-    for table in AVAILABLE_TABLES:
-        schema = get_table_schema(table)
-        all_schemas += f"\n\n{schema}"
-    
-    # Create the prompt
+async def achat_completion(messages: list, temperature: float) -> str:
+    """Async version of chat_completion."""
+    with span("llm", model=NEBIUS_MODEL) as call:
+        response = await client.acomplete(messages, NEBIUS_MODEL, temperature)
+        call.record_llm(response)
+    return response.content
+
+# Optional in-process mirror of the products table (PRODUCTS_MIRROR=csv|supabase), loaded by the first query
+resources.register("products_mirror", lambda: create_products_mirror(PRODUCTS_MIRROR_SOURCE, get_supabase_client()))
+products_mirror = resources.lazy("products_mirror") if PRODUCTS_MIRROR_SOURCE else None
+
+def load_plan_vocabulary() -> dict:
+    """Known product and user names, used to parameterize questions for the plan cache."""
+    supabase = get_supabase_client()
+    vocabulary = {"product": set(), "user": set()}
+    if "products" in AVAILABLE_TABLES:
+        rows = supabase.table("products").select("product_name").execute().data
+        vocabulary["product"] = {row["product_name"] for row in rows}
+    if "users" in AVAILABLE_TABLES:
+        rows = supabase.table("users").select("first_name,last_name").execute().data
+        vocabulary["user"] = {name for row in rows for name in (row["first_name"], row["last_name"])}
+    return vocabulary
+
+# Cache of generated query plans keyed by question template
+plan_cache = PlanCache(vocabulary_loader=load_plan_vocabulary)
+
+def parse_json_response(content: str):
+    """Parse a JSON object from an LLM reply, stripping any ``` code fences."""
+    if "```" in content:
+        match = re.search(r"```(?:json)?(.*?)```", content, re.DOTALL)
+        if match:
+            content = match.group(1)
+    return json.loads(content.strip())
+
+def query_generation_messages(user_question: str, all_schemas: str) -> list:
+    """Chat messages asking the LLM for Supabase query builder parameters."""
     prompt = f"""
     Given the following database schemas for all tables:
     
@@ -59,164 +90,239 @@ def generate_supabase_query(user_question: str) -> dict:
     
     Only return the JSON without any explanation.
     """
-    
-    # Call Nebius API
-    response = client.chat.completions.create(
-        model="Qwen/Qwen3-Coder-30B-A3B-Instruct",
-        messages=[
-            {"role": "system", "content": "You are a database query generator that outputs only valid JSON."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.1
-    )
-    
-    # Extract content from response
-    content = response.choices[0].message.content
-    
-    # Parse the JSON response
-    if "```" in content:
-        match = re.search(r"```(?:json)?(.*?)```", content, re.DOTALL)
-        if match:
-            content = match.group(1).strip()
-    
+    return [
+        {"role": "system", "content": "You are a database query generator that outputs only valid JSON."},
+        {"role": "user", "content": prompt}
+    ]
+
+def parse_query_params(user_question: str, content: str) -> dict:
+    """Parse the generated query parameters and remember the plan, or fall back to a full scan."""
     try:
-        query_params = json.loads(content)
+        query_params = parse_json_response(content)
+        plan_cache.put(user_question, query_params)
         return query_params
     except json.JSONDecodeError:
         # If parsing fails, return a simple default
         return {"table_name": AVAILABLE_TABLES[0], "select": "*", "filters": []}
+
+def generate_supabase_query(user_question: str) -> dict:
+    """Generate Supabase query parameters from user question using all available tables."""
+    
+    # Reuse the plan of an earlier question with the same shape, skipping the LLM
+    with span("plan_cache.get") as lookup:
+        cached_plan = plan_cache.get(user_question)
+        lookup.set(hit=cached_plan is not None)
+    if cached_plan is not None:
+        return cached_plan
+    
+    # Get schema for all tables (served from the shared registry)
+    all_schemas = schema_registry.get_all_schemas()
     
+    # Call Nebius API
+    content = chat_completion(query_generation_messages(user_question, all_schemas), temperature=0.1)
+    
+    return parse_query_params(user_question, content)
+
+async def agenerate_supabase_query(user_question: str) -> dict:
+    """Async version of generate_supabase_query."""
+    # Cache and registry may hit Supabase on a miss, so keep them off the event loop
+    with span("plan_cache.get") as lookup:
+        cached_plan = await asyncio.to_thread(plan_cache.get, user_question)
+        lookup.set(hit=cached_plan is not None)
+    if cached_plan is not None:
+        return cached_plan
+    
+    all_schemas = await asyncio.to_thread(schema_registry.get_all_schemas)
+    
+    content = await achat_completion(query_generation_messages(user_question, all_schemas), temperature=0.1)
+    
+    # Caching a new plan saves the cache file
+    return await asyncio.to_thread(parse_query_params, user_question, content)
+
+def build_supabase_query(query, query_params: dict):
+    """Apply select, filters, ordering and limit from `query_params` to a table query builder."""
+    # Add select columns
+    query = query.select(query_params.get("select", "*"))
+    
+    # Add filters
+    for filter_obj in query_params.get("filters", []):
+        column = filter_obj.get("column")
+        operator = filter_obj.get("operator")
+        value = filter_obj.get("value")
+        
+        if not all([column, operator, value is not None]):
+            continue
+            
+        # Convert value type based on column name patterns
+        if "id" in column.lower() and not isinstance(value, int):
+            try:
+                if isinstance(value, str) and value.isdigit():  # If it's all numbers, convert to int
+                    value = int(value)
+            except (AttributeError, ValueError):
+                pass  # Keep as is if conversion fails
+        
+        if operator == "eq":
+            query = query.eq(column, value)
+        elif operator == "neq":
+            query = query.neq(column, value)
+        elif operator == "gt":
+            query = query.gt(column, value)
+        elif operator == "lt":
+            query = query.lt(column, value)
+        elif operator == "gte":
+            query = query.gte(column, value)
+        elif operator == "lte":
+            query = query.lte(column, value)
+        elif operator == "like":
+            query = query.like(column, f"%{value}%")
+        elif operator == "ilike":
+            query = query.ilike(column, f"%{value}%")
+        elif operator == "in" and isinstance(value, list):
+            query = query.in_(column, value)
+    
+    # Add ordering
+    if "order" in query_params and query_params.get("order"):
+        order_col = query_params["order"]
+        # Don't include table name in order clause if it has a dot
+        if "." in order_col:
+            order_col = order_col.split(".")[-1]
+            
+        direction = query_params.get("order_direction", "asc")
+        if direction == "asc":
+            query = query.order(order_col)
+        else:
+            query = query.order(order_col, desc=True)
+    
+    # Add limit
+    limit = query_params.get("limit")
+    if limit is not None and isinstance(limit, int) and limit > 0:
+        query = query.limit(limit)
+    
+    return query
+
+def query_from_mirror(query_params: dict):
+    """Answer simple product filters from the local mirror when it is enabled, else None."""
+    if products_mirror is None:
+        return None
+    start = time.perf_counter()
+    with span("mirror.query", table=query_params.get("table_name")) as call:
+        try:
+            if PRODUCTS_MIRROR_SOURCE == "supabase":
+                products_mirror.maybe_sync(get_supabase_client())
+            mirror_result = products_mirror.try_execute(query_params)
+        except Exception as e:
+            # The mirror couldn't be loaded; Supabase answers instead and the next query retries the load
+            call.event("mirror_unavailable", message=str(e))
+            return None
+        call.set(hit=mirror_result is not None, rows=len(mirror_result["data"]) if mirror_result else 0)
+    if mirror_result is not None:
+        log_query(mirror_result["table"], query_params, mirror_result["data"],
+                  (time.perf_counter() - start) * 1000, source="mirror")
+    return mirror_result
+
+def query_error_result(table_name: str, query_params: dict, error: Exception, latency_ms: float = None) -> dict:
+    """Log a failed query and return the error in a structured format."""
+    log_query(table_name, query_params, latency_ms=latency_ms, error=error)
+    return {
+        "table": table_name, 
+        "data": [], 
+        "error": str(error),
+        "query_params": query_params
+    }
+
 def execute_supabase_query(query_params: dict):
     """Execute a query using Supabase Query Builder with logging."""
-    supabase: Client = create_client(
-        os.getenv("SUPABASE_URL"), 
-        os.getenv("SUPABASE_API")
-    )
+    # Reuse the shared client so connections stay alive between queries
+    supabase: Client = get_supabase_client()
     
     # Get table name from query params
     table_name = query_params.get("table_name", AVAILABLE_TABLES[0])
     
-    # Log the query being executed
-    logging.info(f"QUERY: Table={table_name}, Params={json.dumps(query_params)}")
+    mirror_result = query_from_mirror(query_params)
+    if mirror_result is not None:
+        return mirror_result
     
+    start = time.perf_counter()
     try:
-        # Start building the query with the proper table
-        query = supabase.table(table_name)
-        
-        # Add select columns
-        query = query.select(query_params.get("select", "*"))
+        # Build the query on the proper table
+        query = build_supabase_query(supabase.table(table_name), query_params)
         
-        # Add filters
-        for filter_obj in query_params.get("filters", []):
-            column = filter_obj.get("column")
-            operator = filter_obj.get("operator")
-            value = filter_obj.get("value")
-            
-            if not all([column, operator, value is not None]):
-                continue
-                
-            # Convert value type based on column name patterns
-            if "id" in column.lower() and not isinstance(value, int):
-                try:
-                    if isinstance(value, str) and value.isdigit():  # If it's all numbers, convert to int
-                        value = int(value)
-                except (AttributeError, ValueError):
-                    pass  # Keep as is if conversion fails
-            
-            if operator == "eq":
-                query = query.eq(column, value)
-            elif operator == "neq":
-                query = query.neq(column, value)
-            elif operator == "gt":
-                query = query.gt(column, value)
-            elif operator == "lt":
-                query = query.lt(column, value)
-            elif operator == "gte":
-                query = query.gte(column, value)
-            elif operator == "lte":
-                query = query.lte(column, value)
-            elif operator == "like":
-                query = query.like(column, f"%{value}%")
-            elif operator == "ilike":
-                query = query.ilike(column, f"%{value}%")
-            elif operator == "in" and isinstance(value, list):
-                query = query.in_(column, value)
+        # Execute the query
+        with span("supabase.query", table=table_name) as call:
+            result = query.execute()
+            call.set(rows=len(result.data))
         
-        # Add ordering
-        if "order" in query_params and query_params.get("order"):
-            order_col = query_params["order"]
-            # Don't include table name in order clause if it has a dot
-            if "." in order_col:
-                order_col = order_col.split(".")[-1]
-                
-            direction = query_params.get("order_direction", "asc")
-            if direction == "asc":
-                query = query.order(order_col)
-            else:
-                query = query.order(order_col, desc=True)
+        # Log the query and a sample of its results (written in the background)
+        log_query(table_name, query_params, result.data, (time.perf_counter() - start) * 1000)
         
-        # Add limit
-        limit = query_params.get("limit")
-        if limit is not None and isinstance(limit, int) and limit > 0:
-            query = query.limit(limit)
+        return {"table": table_name, "data": result.data}
         
-        # Execute the query
-        result = query.execute()
+    except Exception as e:
+        return query_error_result(table_name, query_params, e, (time.perf_counter() - start) * 1000)
+
+async def aexecute_supabase_query(query_params: dict):
+    """Async version of execute_supabase_query, using the async Supabase client."""
+    supabase = get_async_supabase_client()
+    
+    table_name = query_params.get("table_name", AVAILABLE_TABLES[0])
+    
+    # The first mirror query reads the whole table; keep that off the event loop
+    if products_mirror is not None and not resources.is_loaded("products_mirror"):
+        mirror_result = await asyncio.to_thread(query_from_mirror, query_params)
+    else:
+        mirror_result = query_from_mirror(query_params)
+    if mirror_result is not None:
+        return mirror_result
+    
+    start = time.perf_counter()
+    try:
+        query = build_supabase_query(supabase.table(table_name), query_params)
+        with span("supabase.query", table=table_name) as call:
+            result = await query.execute()
+            call.set(rows=len(result.data))
         
-        # Log the results
-        logging.info(f"RESULT: Count={len(result.data)}, First few rows={json.dumps(result.data[:3])}")
+        log_query(table_name, query_params, result.data, (time.perf_counter() - start) * 1000)
         
         return {"table": table_name, "data": result.data}
         
     except Exception as e:
-        # Log the error
-        logging.error(f"ERROR: {str(e)}")
-        
-        # Return error info for debugging but in a structured format
-        return {
-            "table": table_name, 
-            "data": [], 
-            "error": str(e),
-            "query_params": query_params
-        }
-
-def generate_human_response(user_question: str, query_result: dict) -> str:
-    """Generate a human-friendly response based on query results."""
+        return query_error_result(table_name, query_params, e, (time.perf_counter() - start) * 1000)
+
+def human_response_messages(user_question: str, query_result: dict, query_params: dict = None) -> list:
+    """Chat messages asking the LLM to phrase query results for the user."""
     table_name = query_result.get("table", "unknown")
     results = query_result.get("data", [])
     
-    # Use Nebius client instead of llm
-    response = client.chat.completions.create(
-        model="Qwen/Qwen3-Coder-30B-A3B-Instruct",
-        messages=[
-            {"role": "system", "content": "You are a helpful assistant providing database query results."},
-            {"role": "user", "content": f"""
+    # Compact, token-budgeted table instead of indented JSON
+    encoded_results, report = encode_results(results, user_question, query_params)
+    log_encoding(table_name, report)
+    
+    return [
+        {"role": "system", "content": "You are a helpful assistant providing database query results."},
+        {"role": "user", "content": f"""
 The user asked: "{user_question}"
 
-The query was executed on the '{table_name}' table and returned these results:
-{json.dumps(results, indent=2)}
+The query was executed on the '{table_name}' table and returned these results (one row per line, columns separated by |):
+{encoded_results}
 
 Please provide a clear, concise, and helpful answer to the user's question based on these results.
 Format important values like prices, IDs, or product names to make them stand out.
 Keep your response conversational and friendly.
 """}
-        ],
-        temperature=0.2
-    )
-    
-    return response.choices[0].message.content
+    ]
 
-def handle_cross_table_query(user_question: str) -> str:
-    """Handle complex queries that might involve multiple tables."""
-    try:
-        # Get schema for all tables
-        all_schemas = ""
-        for table in AVAILABLE_TABLES:
-            schema = get_table_schema(table)
-            all_schemas += f"\n\n{schema}"
-        
-        # First, identify relevant tables and plan the query approach
-        planning_prompt = f"""
+def generate_human_response(user_question: str, query_result: dict, query_params: dict = None) -> str:
+    """Generate a human-friendly response based on query results."""
+    # Use Nebius client instead of llm
+    return chat_completion(human_response_messages(user_question, query_result, query_params), temperature=0.2)
+
+async def agenerate_human_response(user_question: str, query_result: dict, query_params: dict = None) -> str:
+    """Async version of generate_human_response."""
+    return await achat_completion(human_response_messages(user_question, query_result, query_params), temperature=0.2)
+
+def join_planning_messages(user_question: str, all_schemas: str) -> list:
+    """Chat messages asking the LLM which tables a question needs and how they link."""
+    planning_prompt = f"""
         Given these database schemas:
         
         {all_schemas}
@@ -244,35 +350,17 @@ def handle_cross_table_query(user_question: str) -> str:
         
         Only return the JSON without additional text.
         """
-        
-        # Get the query plan
-        planning_response = client.chat.completions.create(
-            model="Qwen/Qwen3-Coder-30B-A3B-Instruct",
-            messages=[
-                {"role": "system", "content": "You are a database query planner."},
-                {"role": "user", "content": planning_prompt}
-            ],
-            temperature=0.1
-        )
-        
-        # Parse the planning response
-        planning_content = planning_response.choices[0].message.content
-        if "```" in planning_content:
-            match = re.search(r"```(?:json)?(.*?)```", planning_content, re.DOTALL)
-            if match:
-                planning_content = match.group(1).strip()
-                
-        plan = json.loads(planning_content)
-        
-        # Now execute queries for each table and collect results
-        all_results = {}
-        
-        # First query the primary table
-        primary_table = plan.get("primary_table")
-        primary_query_prompt = f"""
+    return [
+        {"role": "system", "content": "You are a database query planner."},
+        {"role": "user", "content": planning_prompt}
+    ]
+
+def primary_query_messages(user_question: str, primary_table: str, table_schema: str) -> list:
+    """Chat messages asking the LLM for the query on the primary table of a join plan."""
+    primary_query_prompt = f"""
         Given this database schema:
         
-        {get_table_schema(primary_table)}
+        {table_schema}
         
         Generate a Supabase query for the table '{primary_table}' to find information relevant to: "{user_question}"
         
@@ -285,52 +373,23 @@ def handle_cross_table_query(user_question: str) -> str:
           "limit": number (optional)
         }}
         """
-        
-        primary_response = client.chat.completions.create(
-            model="Qwen/Qwen3-Coder-30B-A3B-Instruct",
-            messages=[
-                {"role": "system", "content": "You generate database queries in JSON format only."},
-                {"role": "user", "content": primary_query_prompt}
-            ],
-            temperature=0.1
-        )
-        
-        primary_query = json.loads(primary_response.choices[0].message.content.strip())
-        primary_result = execute_supabase_query(primary_query)
-        all_results[primary_table] = primary_result.get("data", [])
-        
-        # Now query each secondary table based on join conditions
-        for join in plan.get("join_conditions", []):
-            secondary_table = join.get("table2") if join.get("table1") == primary_table else join.get("table1")
-            join_column_primary = join.get("column1") if join.get("table1") == primary_table else join.get("column2")
-            join_column_secondary = join.get("column2") if join.get("table1") == primary_table else join.get("column1")
-            
-            # Get values from primary table for the join
-            join_values = [row.get(join_column_primary) for row in all_results[primary_table] if row.get(join_column_primary) is not None]
-            
-            if join_values:
-                secondary_query = {
-                    "table_name": secondary_table,
-                    "select": "*",
-                    "filters": [
-                        {
-                            "column": join_column_secondary,
-                            "operator": "in",
-                            "value": join_values
-                        }
-                    ]
-                }
-                
-                secondary_result = execute_supabase_query(secondary_query)
-                all_results[secondary_table] = secondary_result.get("data", [])
-        
-        # Generate a comprehensive response using all collected data
-        response_prompt = f"""
+    return [
+        {"role": "system", "content": "You generate database queries in JSON format only."},
+        {"role": "user", "content": primary_query_prompt}
+    ]
+
+def joined_response_messages(user_question: str, joined_records, joined_tables) -> list:
+    """Chat messages asking the LLM to answer from records joined across tables."""
+    encoded_records, report = encode_results(joined_records, user_question)
+    log_encoding(",".join(joined_tables), report)
+    
+    response_prompt = f"""
         The user asked: "{user_question}"
 
-        I have data from multiple tables:
+        These records were already joined across the {', '.join(joined_tables)} tables
+        (columns from joined tables are prefixed with the table name; one row per line, columns separated by |):
 
-        {json.dumps(all_results, indent=2)}
+        {encoded_records}
 
         IMPORTANT: ONLY use the data provided above. Do NOT invent or hallucinate any additional transactions, users, or products.
 
@@ -345,17 +404,68 @@ def handle_cross_table_query(user_question: str) -> str:
 
         Your response should be complete and not suggest further queries.
         """
+    return [
+        {"role": "system", "content": "You provide complete answers by joining information from multiple database tables."},
+        {"role": "user", "content": response_prompt}
+    ]
+
+def cross_table_error_reply(error: Exception) -> str:
+    """Reply shown when a multi-table query fails."""
+    return f"I ran into a problem with this multi-table query: {str(error)}. Could you try a simpler question?"
+
+def handle_cross_table_query(user_question: str) -> str:
+    """Handle complex queries that might involve multiple tables."""
+    try:
+        # Get schema for all tables (served from the shared registry)
+        all_schemas = schema_registry.get_all_schemas()
+        
+        # First, identify relevant tables and plan the query approach
+        planning_response = chat_completion(join_planning_messages(user_question, all_schemas), temperature=0.1)
+        plan = parse_json_response(planning_response)
+        
+        # First query the primary table
+        primary_table = plan.get("primary_table")
+        table_schema = schema_registry.get_table_schema(primary_table)
+        primary_response = chat_completion(primary_query_messages(user_question, primary_table, table_schema), temperature=0.1)
+        primary_query = parse_json_response(primary_response)
+        primary_result = execute_supabase_query(primary_query)
+        
+        # Fetch the other tables in parallel, chunked `in` queries, and hash-join them locally
+        joined_records, joined_tables = execute_join_plan(
+            execute_supabase_query,
+            primary_table,
+            primary_result.get("data", []),
+            plan.get("join_conditions", [])
+        )
+        
+        # Generate a comprehensive response using all collected data
+        return chat_completion(joined_response_messages(user_question, joined_records, joined_tables), temperature=0.2)
+            
+    except Exception as e:
+        return cross_table_error_reply(e)
+
+async def ahandle_cross_table_query(user_question: str) -> str:
+    """Async version of handle_cross_table_query."""
+    try:
+        all_schemas = await asyncio.to_thread(schema_registry.get_all_schemas)
+        
+        planning_response = await achat_completion(join_planning_messages(user_question, all_schemas), temperature=0.1)
+        plan = parse_json_response(planning_response)
+        
+        primary_table = plan.get("primary_table")
+        table_schema = await asyncio.to_thread(schema_registry.get_table_schema, primary_table)
+        primary_response = await achat_completion(primary_query_messages(user_question, primary_table, table_schema), temperature=0.1)
+        primary_query = parse_json_response(primary_response)
+        primary_result = await aexecute_supabase_query(primary_query)
         
-        final_response = client.chat.completions.create(
-            model="Qwen/Qwen3-Coder-30B-A3B-Instruct",
-            messages=[
-                {"role": "system", "content": "You provide complete answers by joining information from multiple database tables."},
-                {"role": "user", "content": response_prompt}
-            ],
-            temperature=0.2
+        joined_records, joined_tables = await aexecute_join_plan(
+            aexecute_supabase_query,
+            primary_table,
+            primary_result.get("data", []),
+            plan.get("join_conditions", [])
         )
         
-        return final_response.choices[0].message.content
+        return await achat_completion(joined_response_messages(user_question, joined_records, joined_tables), temperature=0.2)
             
     except Exception as e:
-        return f"I ran into a problem with this multi-table query: {str(e)}. Could you try a simpler question?"
\ No newline at end of file
+        return cross_table_error_reply(e)
@@ -0,0 +1,218 @@
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+import resources
+resources.load_settings()
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Plan cache configuration (empty path disables persistence)
+PLAN_CACHE_SIZE = int(os.getenv("PLAN_CACHE_SIZE", "500"))
+PLAN_CACHE_PATH = os.getenv("PLAN_CACHE_PATH", os.path.join(current_dir, "plan_cache.json"))
+
+_quoted_pattern = re.compile(r"\"([^\"]+)\"|'([^']+)'")
+_number_pattern = re.compile(r"(?<![\w.])\d+(?:\.\d+)?(?![\w.])")
+
+def _case_style(original: str, value: str) -> str:
+    """Describe how the plan cased a parameter so new values can be cased the same way."""
+    if value == original:
+        return "same"
+    for style in ("lower", "upper", "title"):
+        if getattr(original, style)() == value:
+            return style
+    return None
+
+def _apply_case(value: str, style: str) -> str:
+    return value if style == "same" else getattr(value, style)()
+
+class PlanCache:
+    """
+    Cache of JSON query plans keyed by a parameterized question template.
+    Numbers, quoted strings and known product/user names are pulled out of the
+    question; questions with the same template reuse the plan with new values.
+    """
+
+    def __init__(self, max_entries: int = PLAN_CACHE_SIZE, path: str = PLAN_CACHE_PATH, vocabulary_loader=None):
+        self.max_entries = max_entries
+        self.path = path
+        self.vocabulary_loader = vocabulary_loader
+        self.hits = 0
+        self.misses = 0
+        self._plans = OrderedDict()
+        self._vocabulary_pattern = None
+        self._vocabulary_kinds = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    # ----- templates -----
+
+    def set_vocabulary(self, vocabulary: dict):
+        """Register known entity names, e.g. `{"product": [...], "user": [...]}`."""
+        kinds = {}
+        for kind, names in vocabulary.items():
+            for name in names:
+                if isinstance(name, str) and len(name.strip()) > 1:
+                    kinds.setdefault(name.strip().lower(), kind)
+        # Longest names first so "smart watch" wins over "watch"
+        names = sorted(kinds, key=len, reverse=True)
+        pattern = re.compile(r"\b(" + "|".join(map(re.escape, names)) + r")\b", re.IGNORECASE) if names else None
+        with self._lock:
+            self._vocabulary_kinds = kinds
+            self._vocabulary_pattern = pattern
+
+    def _ensure_vocabulary(self):
+        if self._vocabulary_pattern is None and self.vocabulary_loader is not None:
+            loader, self.vocabulary_loader = self.vocabulary_loader, None
+            try:
+                self.set_vocabulary(loader())
+            except Exception:
+                pass  # Numbers and quoted strings still work without names
+
+    def templatize(self, question: str):
+        """Split a question into a template string and its ordered parameters."""
+        self._ensure_vocabulary()
+        params = []
+
+        def replace(kind, value):
+            params.append({"kind": kind, "value": value})
+            return f"{{{kind}{len(params) - 1}}}"
+
+        template = _quoted_pattern.sub(lambda m: replace("text", m.group(1) or m.group(2)), question)
+        if self._vocabulary_pattern is not None:
+            template = self._vocabulary_pattern.sub(
+                lambda m: replace(self._vocabulary_kinds[m.group(1).lower()], m.group(1)), template
+            )
+        template = _number_pattern.sub(lambda m: replace("number", m.group(0)), template)
+
+        # Placeholders carry their position; normalize only the remaining words
+        template = re.sub(r"\s+", " ", template.strip().lower().rstrip("?.! "))
+        return template, params
+
+    # ----- plan parameterization -----
+
+    @staticmethod
+    def _match(value, params):
+        """Return `(index, binding)` for the single parameter a plan value came from."""
+        matches = []
+        for i, param in enumerate(params):
+            raw = param["value"]
+            if param["kind"] == "number":
+                if isinstance(value, (int, float)) and not isinstance(value, bool) and float(raw) == value:
+                    matches.append((i, {"type": "int" if isinstance(value, int) else "float"}))
+                elif isinstance(value, str) and value == raw:
+                    matches.append((i, {"type": "str"}))
+            elif isinstance(value, str):
+                style = _case_style(raw, value)
+                if style is not None:
+                    matches.append((i, {"type": "str", "case": style}))
+        return matches
+
+    def _parameterize(self, node, params, used):
+        if isinstance(node, dict):
+            return {k: self._parameterize(v, params, used) for k, v in node.items()}
+        if isinstance(node, list):
+            return [self._parameterize(v, params, used) for v in node]
+        if node is None or isinstance(node, bool):
+            return node
+        matches = self._match(node, params)
+        if len(matches) > 1:
+            raise ValueError("ambiguous parameter")
+        if not matches:
+            return node
+        index, binding = matches[0]
+        used.append(index)
+        return {"$param": index, **binding}
+
+    def _fill(self, node, params):
+        if isinstance(node, dict):
+            if "$param" in node:
+                raw = params[node["$param"]]["value"]
+                if node["type"] == "int":
+                    return int(float(raw))
+                if node["type"] == "float":
+                    return float(raw)
+                return _apply_case(raw, node.get("case", "same"))
+            return {k: self._fill(v, params) for k, v in node.items()}
+        if isinstance(node, list):
+            return [self._fill(v, params) for v in node]
+        return node
+
+    # ----- cache operations -----
+
+    def get(self, question: str):
+        """Return a filled plan for the question, or None on a miss."""
+        template, params = self.templatize(question)
+        with self._lock:
+            entry = self._plans.get(template)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._plans.move_to_end(template)
+            self.hits += 1
+        return self._fill(entry, params)
+
+    def put(self, question: str, plan: dict) -> bool:
+        """
+        Cache an LLM-generated plan under the question's template.
+        Only plans that use every extracted parameter exactly once are cached,
+        otherwise a different value could need a different plan.
+        """
+        template, params = self.templatize(question)
+        used = []
+        try:
+            parameterized = self._parameterize(plan, params, used)
+        except ValueError:
+            return False
+        if sorted(used) != list(range(len(params))):
+            return False
+
+        with self._lock:
+            self._plans[template] = parameterized
+            self._plans.move_to_end(template)
+            while len(self._plans) > self.max_entries:
+                self._plans.popitem(last=False)
+        self.save()
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+        self.save()
+
+    def load(self):
+        """Restore cached plans from disk."""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                plans = json.load(f)
+        except (OSError, ValueError):
+            return
+        with self._lock:
+            self._plans = OrderedDict(list(plans.items())[-self.max_entries:])
+
+    def save(self):
+        """Persist cached plans so they survive restarts."""
+        if not self.path:
+            return
+        with self._lock:
+            plans = dict(self._plans)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(plans, f)
+        os.replace(tmp_path, self.path)
+
+    def stats(self) -> dict:
+        """Return hit/miss counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._plans)
+            }
+
+__all__ = ["PlanCache"]
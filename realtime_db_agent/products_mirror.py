@@ -0,0 +1,346 @@
+import os
+import re
+import threading
+import time
+import numpy as np
+import pandas as pd
+import resources
+resources.load_settings()
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+PRODUCTS_CSV = os.path.join(current_dir, "dataset", "products.csv")
+
+# Mirror configuration: source is "csv", "supabase" or empty to disable
+PRODUCTS_MIRROR_SOURCE = os.getenv("PRODUCTS_MIRROR", "")
+# Column bumped on every write, for incremental syncs. The seeded products table has no such
+# column: add one (e.g. `updated_at timestamptz default now()` plus an update trigger), otherwise
+# every sync re-reads the whole table.
+PRODUCTS_MIRROR_WATERMARK = os.getenv("PRODUCTS_MIRROR_WATERMARK", "updated_at")
+PRODUCTS_MIRROR_SYNC_INTERVAL = float(os.getenv("PRODUCTS_MIRROR_SYNC_INTERVAL", "60"))
+# PostgREST caps responses at 1000 rows by default, mirror that so answers match
+PRODUCTS_MIRROR_MAX_ROWS = int(os.getenv("PRODUCTS_MIRROR_MAX_ROWS", "1000"))
+
+# Columns with hash (value -> row ids) and sorted (range) indexes
+HASH_COLUMNS = ["product_id", "product_name", "product_category", "sku"]
+SORTED_COLUMNS = ["price", "stock_quantity", "product_ratings", "warranty_period"]
+
+RANGE_OPERATORS = {"gt", "gte", "lt", "lte"}
+SUPPORTED_OPERATORS = RANGE_OPERATORS | {"eq", "neq", "in", "like", "ilike"}
+
+_empty = np.empty(0, dtype=np.int64)
+
+def _union(row_lists):
+    """Merge sorted row-id arrays from an index into one sorted, unique array."""
+    if not row_lists:
+        return _empty
+    if len(row_lists) == 1:
+        return row_lists[0]
+    return np.unique(np.concatenate(row_lists))
+
+def _to_python(value):
+    """Turn NaN/NA cells into None so rows serialize like Supabase JSON."""
+    return None if value is None or value is pd.NA or (isinstance(value, float) and value != value) else value
+
+def _fetch_all(query_builder_factory, page_size: int = 1000):
+    """Page through a PostgREST query with `.range()` until it runs dry."""
+    rows = []
+    start = 0
+    while True:
+        page = query_builder_factory().range(start, start + page_size - 1).execute().data
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        start += page_size
+
+class ProductsMirror:
+    """
+    Read-through, in-process columnar copy of the products table.
+    Simple filter specs produced by `generate_supabase_query` are answered from
+    NumPy arrays with hash and sorted indexes; anything else falls through.
+    """
+
+    def __init__(self, max_rows: int = PRODUCTS_MIRROR_MAX_ROWS, watermark_column: str = PRODUCTS_MIRROR_WATERMARK):
+        self.max_rows = max_rows
+        self.watermark_column = watermark_column
+        self.watermark = None
+        self.hits = 0
+        self.fallthroughs = 0
+        self._frame = None
+        self._columns = {}
+        self._hash_indexes = {}
+        self._sorted_indexes = {}
+        self._size = 0
+        self._synced_at = 0.0
+        self._syncing = False
+        self._lock = threading.Lock()
+
+    # ----- loading -----
+
+    def load_frame(self, frame: pd.DataFrame):
+        """Replace the mirror contents with a DataFrame and rebuild the indexes."""
+        frame = frame.drop_duplicates(subset="product_id", keep="last").reset_index(drop=True)
+        columns = {name: frame[name].to_numpy() for name in frame.columns}
+
+        hash_indexes = {
+            name: {key: np.asarray(rows, dtype=np.int64) for key, rows in frame.groupby(name, sort=False).indices.items()}
+            for name in HASH_COLUMNS if name in frame.columns
+        }
+        sorted_indexes = {}
+        for name in SORTED_COLUMNS:
+            if name in frame.columns and np.issubdtype(frame[name].dtype, np.number):
+                values = frame[name].to_numpy(dtype=np.float64)
+                order = np.argsort(values, kind="stable")
+                sorted_indexes[name] = (values[order], order)
+
+        watermark = None
+        if self.watermark_column in frame.columns and len(frame):
+            watermark = frame[self.watermark_column].max()
+
+        with self._lock:
+            self._frame = frame
+            self._columns = columns
+            self._hash_indexes = hash_indexes
+            self._sorted_indexes = sorted_indexes
+            self._size = len(frame)
+            self.watermark = watermark
+            self._synced_at = time.monotonic()
+
+    def load_csv(self, path: str = PRODUCTS_CSV):
+        """Load the mirror from the dataset CSV used to seed Supabase."""
+        from realtime_db_agent.dataset.upload_dataset import TABLES
+        self.load_frame(pd.read_csv(path).rename(columns=TABLES["products"]["columns"]))
+
+    def load_supabase(self, supabase):
+        """Load a full snapshot of the products table from Supabase."""
+        rows = _fetch_all(lambda: supabase.table("products").select("*").order("product_id"))
+        self.load_frame(pd.DataFrame(rows))
+
+    def sync(self, supabase):
+        """
+        Pull rows changed since the watermark and merge them into the mirror. Without the
+        watermark column in the table (see PRODUCTS_MIRROR_WATERMARK) this is a full reload.
+        """
+        if self._frame is None or self.watermark is None:
+            return self.load_supabase(supabase)
+
+        rows = _fetch_all(
+            lambda: supabase.table("products").select("*")
+            .gt(self.watermark_column, self.watermark).order(self.watermark_column)
+        )
+        if rows:
+            self.load_frame(pd.concat([self._frame, pd.DataFrame(rows)], ignore_index=True))
+        else:
+            self._synced_at = time.monotonic()
+        return len(rows)
+
+    def maybe_sync(self, supabase, interval: float = PRODUCTS_MIRROR_SYNC_INTERVAL):
+        """Start a background sync when the last one is older than `interval` seconds."""
+        with self._lock:
+            if self._syncing or time.monotonic() - self._synced_at < interval:
+                return
+            self._syncing = True
+
+        def run():
+            try:
+                self.sync(supabase)
+            except Exception:
+                pass  # Keep serving the current snapshot
+            finally:
+                self._syncing = False
+
+        threading.Thread(target=run, daemon=True).start()
+
+    # ----- querying -----
+
+    @staticmethod
+    def _coerce(column: np.ndarray, value):
+        """Match the filter value's type to the column, as PostgREST would."""
+        if np.issubdtype(column.dtype, np.number):
+            if isinstance(value, str):
+                return float(value)  # Raises for non-numeric strings -> fall through
+            return value
+        return value if isinstance(value, str) else str(value)
+
+    def _filter_rows(self, column_name: str, operator: str, value, candidates):
+        """Return the row ids matching one filter, restricted to `candidates` when given."""
+        column = self._columns[column_name]
+
+        if operator == "in":
+            values = [self._coerce(column, v) for v in value]
+        elif operator in ("like", "ilike"):
+            # execute_supabase_query wraps the value in %...%; keep SQL wildcard semantics
+            pattern = re.compile(
+                re.escape(str(value)).replace("%", ".*").replace("_", "."),
+                0 if operator == "like" else re.IGNORECASE
+            )
+        else:
+            value = self._coerce(column, value)
+
+        # Hash index: exact matches
+        index = self._hash_indexes.get(column_name)
+        if index is not None and operator in ("eq", "in"):
+            keys = [value] if operator == "eq" else values
+            hits = [index.get(key, _empty) for key in keys]
+            rows = _union(hits)
+            return rows if candidates is None else np.intersect1d(candidates, rows, assume_unique=True)
+
+        # Pattern match against the distinct keys of a hash index instead of every row
+        if index is not None and operator in ("like", "ilike") and (candidates is None or len(candidates) > len(index)):
+            hits = [rows for key, rows in index.items() if isinstance(key, str) and pattern.search(key)]
+            rows = _union(hits)
+            return rows if candidates is None else np.intersect1d(candidates, rows, assume_unique=True)
+
+        # Sorted index: ranges and equality on numeric columns
+        sorted_index = self._sorted_indexes.get(column_name)
+        if sorted_index is not None and operator in RANGE_OPERATORS | {"eq"}:
+            sorted_values, order = sorted_index
+            lo, hi = 0, len(sorted_values)
+            if operator in ("gt", "eq"):
+                lo = np.searchsorted(sorted_values, value, side="right" if operator == "gt" else "left")
+            if operator == "gte":
+                lo = np.searchsorted(sorted_values, value, side="left")
+            if operator in ("lt", "eq"):
+                hi = np.searchsorted(sorted_values, value, side="left" if operator == "lt" else "right")
+            if operator == "lte":
+                hi = np.searchsorted(sorted_values, value, side="right")
+            rows = np.sort(order[lo:hi])
+            return rows if candidates is None else np.intersect1d(candidates, rows, assume_unique=True)
+
+        # Vectorized scan over the remaining candidates
+        rows = np.arange(self._size) if candidates is None else candidates
+        data = column[rows]
+        if operator in ("like", "ilike"):
+            mask = np.fromiter((isinstance(v, str) and pattern.search(v) is not None for v in data),
+                               dtype=bool, count=len(data))
+        elif operator == "eq":
+            mask = data == value
+        elif operator == "neq":
+            # NULL <> value is not true in SQL, so missing values never match
+            mask = (data != value) & ~pd.isna(data)
+        elif operator == "in":
+            mask = np.isin(data, values)
+        elif not np.issubdtype(column.dtype, np.number):
+            raise TypeError("range filter on a non-numeric column")
+        elif operator == "gt":
+            mask = data > value
+        elif operator == "gte":
+            mask = data >= value
+        elif operator == "lt":
+            mask = data < value
+        else:
+            mask = data <= value
+        return rows[mask]
+
+    def _filter_cost(self, filter_obj: dict) -> int:
+        """Rank filters so the most selective indexed ones run first."""
+        column, operator = filter_obj["column"], filter_obj["operator"]
+        if column in self._hash_indexes and operator in ("eq", "in"):
+            return 0
+        if column in self._sorted_indexes and operator in RANGE_OPERATORS | {"eq"}:
+            return 1
+        if column in self._hash_indexes and operator in ("like", "ilike"):
+            return 2
+        return 3
+
+    @staticmethod
+    def _order_positions(keys: np.ndarray, descending: bool) -> np.ndarray:
+        """Sort positions for ORDER BY; Postgres puts NULLs last ascending, first descending."""
+        if np.issubdtype(keys.dtype, np.number):
+            keys = keys.astype(np.float64)
+            missing = np.isnan(keys)
+            present = np.flatnonzero(~missing)
+            ranked = present[np.argsort(-keys[present] if descending else keys[present], kind="stable")]
+            nulls = np.flatnonzero(missing)
+            return np.concatenate([nulls, ranked] if descending else [ranked, nulls])
+        ranked = pd.Series(keys).sort_values(ascending=not descending, kind="stable",
+                                             na_position="first" if descending else "last")
+        return ranked.index.to_numpy()
+
+    def _can_answer(self, query_params: dict) -> bool:
+        if self._frame is None or query_params.get("table_name") != "products":
+            return False
+        select = query_params.get("select", "*") or "*"
+        if select.strip() != "*" and any(c.strip() not in self._columns for c in select.split(",")):
+            return False
+        for filter_obj in query_params.get("filters", []):
+            column = filter_obj.get("column")
+            if column is None or filter_obj.get("value") is None:
+                continue  # Skipped by execute_supabase_query as well
+            if column not in self._columns or filter_obj.get("operator") not in SUPPORTED_OPERATORS:
+                return False
+            if filter_obj.get("operator") == "in" and not isinstance(filter_obj["value"], list):
+                return False
+        order = (query_params.get("order") or "").split(".")[-1]
+        return not order or order in self._columns
+
+    def try_execute(self, query_params: dict):
+        """
+        Answer a query spec from the mirror, in the same shape as `execute_supabase_query`.
+        Returns None when the spec can't be served locally.
+        """
+        with self._lock:
+            if not self._can_answer(query_params):
+                self.fallthroughs += 1
+                return None
+
+            try:
+                candidates = None
+                # Indexed filters first so scans only touch the surviving rows
+                filters = [f for f in query_params.get("filters", [])
+                           if f.get("column") and f.get("operator") and f.get("value") is not None]
+                filters.sort(key=self._filter_cost)
+                for filter_obj in filters:
+                    candidates = self._filter_rows(filter_obj["column"], filter_obj["operator"], filter_obj["value"], candidates)
+                    if not len(candidates):
+                        break
+            except (TypeError, ValueError):
+                self.fallthroughs += 1
+                return None
+
+            rows = np.arange(self._size) if candidates is None else candidates
+
+            order = (query_params.get("order") or "").split(".")[-1]
+            if order:
+                descending = query_params.get("order_direction", "asc") != "asc"
+                rows = rows[self._order_positions(self._columns[order][rows], descending)]
+
+            limit = query_params.get("limit")
+            if not (isinstance(limit, int) and limit > 0):
+                limit = self.max_rows
+            rows = rows[:min(limit, self.max_rows)]
+
+            select = query_params.get("select", "*") or "*"
+            names = list(self._columns) if select.strip() == "*" else [c.strip() for c in select.split(",")]
+            values = [[_to_python(v) for v in self._columns[name][rows].tolist()] for name in names]
+            data = [dict(zip(names, row)) for row in zip(*values)]
+
+            self.hits += 1
+            return {"table": "products", "data": data}
+
+    def stats(self) -> dict:
+        """Return mirror size and how many queries it answered versus passed on."""
+        with self._lock:
+            total = self.hits + self.fallthroughs
+            return {
+                "rows": self._size,
+                "hits": self.hits,
+                "fallthroughs": self.fallthroughs,
+                "hit_rate": self.hits / total if total else 0.0,
+                "watermark": self.watermark,
+                "incremental_sync": self.watermark is not None
+            }
+
+def create_products_mirror(source: str = PRODUCTS_MIRROR_SOURCE, supabase=None):
+    """Build the mirror for the configured source, or return None when disabled."""
+    if not source:
+        return None
+    mirror = ProductsMirror()
+    if source == "csv":
+        mirror.load_csv()
+    elif source == "supabase":
+        mirror.load_supabase(supabase)
+    else:
+        raise ValueError(f"Unknown PRODUCTS_MIRROR source: {source}")
+    return mirror
+
+__all__ = ["ProductsMirror", "create_products_mirror"]
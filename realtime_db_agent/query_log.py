@@ -0,0 +1,145 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+import resources
+resources.load_settings()
+
+# Structured query log: one JSON object per line, written by a background thread
+QUERY_LOG_PATH = os.getenv("QUERY_LOG_PATH", "database_queries.log")
+QUERY_LOG_MAX_BYTES = int(os.getenv("QUERY_LOG_MAX_BYTES", str(5 * 1024 * 1024)))
+QUERY_LOG_BACKUPS = int(os.getenv("QUERY_LOG_BACKUPS", "3"))
+# Records waiting to be written; past this, new records are dropped rather than blocking a query
+QUERY_LOG_QUEUE_SIZE = int(os.getenv("QUERY_LOG_QUEUE_SIZE", "10000"))
+# Result rows kept per query, and caps on what any one value or record may take up
+QUERY_LOG_SAMPLE_ROWS = int(os.getenv("QUERY_LOG_SAMPLE_ROWS", "3"))
+QUERY_LOG_MAX_VALUE_CHARS = int(os.getenv("QUERY_LOG_MAX_VALUE_CHARS", "200"))
+QUERY_LOG_MAX_RECORD_CHARS = int(os.getenv("QUERY_LOG_MAX_RECORD_CHARS", "4000"))
+
+query_logger = logging.getLogger("realtime_db_agent.queries")
+query_logger.propagate = False
+# Silent until configure_query_log() is called by an entry point
+query_logger.addHandler(logging.NullHandler())
+
+def _cap(value, max_chars: int):
+    """Shorten long strings, recursing into rows and parameter dicts."""
+    if isinstance(value, str):
+        return value if len(value) <= max_chars else value[:max_chars] + "..."
+    if isinstance(value, dict):
+        return {key: _cap(item, max_chars) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_cap(item, max_chars) for item in value]
+    return value
+
+class JsonLineFormatter(logging.Formatter):
+    """Serializes the record's `fields` as one capped JSON line; runs on the listener thread."""
+
+    def __init__(self, max_value_chars: int = QUERY_LOG_MAX_VALUE_CHARS, max_record_chars: int = QUERY_LOG_MAX_RECORD_CHARS):
+        super().__init__()
+        self.max_value_chars = max_value_chars
+        self.max_record_chars = max_record_chars
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "event": record.getMessage(),
+            **_cap(getattr(record, "fields", {}), self.max_value_chars)
+        }
+        line = json.dumps(entry, default=str, ensure_ascii=False)
+        # Drop the bulky parts first: the row sample, then the query parameters
+        for key in ("sample", "params"):
+            if len(line) <= self.max_record_chars:
+                break
+            if entry.pop(key, None) is not None:
+                entry["truncated"] = True
+                line = json.dumps(entry, default=str, ensure_ascii=False)
+        return line
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Hands records to the listener without formatting them, so serialization and file I/O
+    stay off the request thread. When the queue is full the record is dropped and counted.
+    """
+
+    def __init__(self, record_queue):
+        super().__init__(record_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+_handler = None
+_listener = None
+
+def configure_query_log(path: str = QUERY_LOG_PATH, max_bytes: int = QUERY_LOG_MAX_BYTES, backups: int = QUERY_LOG_BACKUPS,
+                        queue_size: int = QUERY_LOG_QUEUE_SIZE) -> QueueListener:
+    """
+    Start writing the query log to a rotating file. Call once from an entry point;
+    calling again replaces the previous configuration.
+    """
+    global _handler, _listener
+    shutdown_query_log()
+
+    file_handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8", delay=True)
+    file_handler.setFormatter(JsonLineFormatter())
+
+    _handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    _listener = QueueListener(_handler.queue, file_handler)
+    _listener.start()
+    query_logger.addHandler(_handler)
+    query_logger.setLevel(logging.INFO)
+    return _listener
+
+def shutdown_query_log():
+    """Flush pending records and stop the writer thread."""
+    global _handler, _listener
+    if _listener is not None:
+        query_logger.removeHandler(_handler)
+        query_logger.setLevel(logging.NOTSET)
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+    _handler = _listener = None
+
+atexit.register(shutdown_query_log)
+
+def query_log_stats() -> dict:
+    return {
+        "enabled": _listener is not None,
+        "queued": _handler.queue.qsize() if _handler else 0,
+        "dropped": _handler.dropped if _handler else 0
+    }
+
+def log_query(table: str, query_params: dict, rows: list = None, latency_ms: float = None, source: str = "supabase", error: Exception = None):
+    """Record one executed query with its latency, row count and a sample of the result rows."""
+    if not query_logger.isEnabledFor(logging.INFO):
+        return
+    fields = {"table": table, "source": source, "params": query_params}
+    if latency_ms is not None:
+        fields["latency_ms"] = round(latency_ms, 2)
+    if error is not None:
+        fields["error"] = str(error)
+        query_logger.error("query", extra={"fields": fields})
+        return
+    rows = rows or []
+    fields["rows"] = len(rows)
+    # Only a shallow slice is taken here; the listener does the serializing
+    fields["sample"] = rows[:QUERY_LOG_SAMPLE_ROWS]
+    query_logger.info("query", extra={"fields": fields})
+
+def log_encoding(tables: str, report: dict):
+    """Record how a result set was encoded for the LLM prompt."""
+    if query_logger.isEnabledFor(logging.INFO):
+        query_logger.info("encoded", extra={"fields": {"table": tables, **report}})
+
+__all__ = ["configure_query_log", "shutdown_query_log", "query_log_stats", "log_query", "log_encoding", "query_logger"]
@@ -0,0 +1,159 @@
+import json
+import os
+import re
+import resources
+resources.load_settings()
+
+# Approximate prompt budget for query results
+RESULT_TOKEN_BUDGET = int(os.getenv("RESULT_TOKEN_BUDGET", "1500"))
+# Small results are shown in full; column pruning only kicks in above this
+RESULT_ALL_COLUMNS_MAX_ROWS = int(os.getenv("RESULT_ALL_COLUMNS_MAX_ROWS", "5"))
+
+# Question words that point at a column without naming it
+COLUMN_SYNONYMS = {
+    "cost": "price", "costs": "price", "expensive": "price", "cheap": "price", "cheapest": "price", "spent": "price",
+    "stock": "quantity", "available": "quantity", "inventory": "quantity", "left": "quantity",
+    "rating": "ratings", "rated": "ratings", "reviews": "ratings",
+    "bought": "purchase", "purchased": "purchase", "when": "date",
+    "mail": "email", "size": "variations", "color": "variations", "colour": "variations",
+}
+
+# Column-name parts that only repeat the table name and say nothing about the column
+GENERIC_PARTS = {"product", "user", "transaction"}
+
+_word_pattern = re.compile(r"[a-z0-9]+")
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token for English and JSON)."""
+    return len(text) // 4 + 1
+
+def _words(text: str) -> set:
+    words = set()
+    for word in _word_pattern.findall(text.lower()):
+        words.add(word)
+        words.add(word.rstrip("s"))
+        if word in COLUMN_SYNONYMS:
+            words.add(COLUMN_SYNONYMS[word])
+    return words
+
+def _is_key_column(column: str) -> bool:
+    name = column.split(".")[-1].lower()
+    return name == "id" or name.endswith("_id") or "name" in name
+
+def select_columns(rows, question: str = "", query_params: dict = None):
+    """
+    Choose the columns worth showing: identifiers and names, columns the question
+    mentions, and columns the query filtered or ordered on. Falls back to all columns.
+    """
+    columns = list(dict.fromkeys(column for row in rows for column in row))
+    # Columns that are empty everywhere carry no information
+    columns = [c for c in columns if any(row.get(c) not in (None, "") for row in rows)]
+    if len(rows) <= RESULT_ALL_COLUMNS_MAX_ROWS:
+        return columns
+
+    question_words = _words(question)
+    planned = set()
+    for filter_obj in (query_params or {}).get("filters", []):
+        planned.add(filter_obj.get("column"))
+    planned.add((query_params or {}).get("order"))
+
+    mentioned = [
+        c for c in columns
+        if c in planned or c.split(".")[-1] in planned
+        or any(len(part) > 2 and part not in GENERIC_PARTS and part in question_words
+               for part in re.split(r"[._]", c.lower()))
+    ]
+    if not mentioned:
+        return columns
+    return [c for c in columns if _is_key_column(c) or c in mentioned]
+
+def _cell(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).replace("|", "/").replace("\n", " ")
+
+def numeric_aggregates(rows, columns):
+    """count/min/max/avg for numeric columns, computed over every row (not just shown ones)."""
+    aggregates = {}
+    for column in columns:
+        if _is_key_column(column):
+            continue
+        values = [row.get(column) for row in rows]
+        numbers = [v for v in values if isinstance(v, (int, float)) and not isinstance(v, bool)]
+        if numbers and len(numbers) == sum(v is not None for v in values):
+            aggregates[column] = {
+                "count": len(numbers),
+                "min": min(numbers),
+                "max": max(numbers),
+                "avg": round(sum(numbers) / len(numbers), 2)
+            }
+    return aggregates
+
+def encode_results(rows, question: str = "", query_params: dict = None, token_budget: int = RESULT_TOKEN_BUDGET):
+    """
+    Encode result rows as a compact header-plus-rows table for an LLM prompt.
+    Unneeded columns are dropped, columns with a single shared value are stated once,
+    and rows stop at the token budget with a count of the rest plus numeric aggregates.
+    Returns `(text, report)` where the report compares against indented JSON.
+    """
+    baseline_tokens = estimate_tokens(json.dumps(rows, indent=2))
+    if not rows:
+        text = "No matching rows."
+        return text, {"rows_total": 0, "rows_shown": 0, "baseline_tokens": baseline_tokens,
+                      "encoded_tokens": estimate_tokens(text), "saved_tokens": baseline_tokens - estimate_tokens(text),
+                      "columns_dropped": []}
+
+    all_columns = list(dict.fromkeys(column for row in rows for column in row))
+    columns = select_columns(rows, question, query_params)
+    dropped = [c for c in all_columns if c not in columns]
+
+    lines = [f"Total rows: {len(rows)}"]
+
+    # Columns with the same value in every row are stated once instead of per row
+    if len(rows) > 1:
+        constant = [c for c in columns if len({repr(row.get(c)) for row in rows}) == 1]
+        if constant and len(constant) < len(columns):
+            lines.append("Same for all rows: " + ", ".join(f"{c}={_cell(rows[0].get(c))}" for c in constant))
+            columns = [c for c in columns if c not in constant]
+
+    aggregates = numeric_aggregates(rows, columns)
+    if aggregates and len(rows) > 1:
+        # The count is only worth its tokens when some rows have no value
+        lines.append("Aggregates over all rows: " + "; ".join(
+            f"{c}: min={_cell(a['min'])}, max={_cell(a['max'])}, avg={_cell(a['avg'])}"
+            + (f", count={a['count']}" if a["count"] < len(rows) else "")
+            for c, a in aggregates.items()
+        ))
+
+    lines.append(" | ".join(columns))
+    used_tokens = estimate_tokens("\n".join(lines))
+
+    shown = 0
+    for row in rows:
+        line = " | ".join(_cell(row.get(c)) for c in columns)
+        line_tokens = estimate_tokens(line)
+        # Always show at least one row so the model sees the format
+        if shown and used_tokens + line_tokens > token_budget:
+            break
+        lines.append(line)
+        used_tokens += line_tokens
+        shown += 1
+
+    if shown < len(rows):
+        lines.append(f"... {len(rows) - shown} more rows not shown (aggregates above cover all {len(rows)} rows)")
+
+    text = "\n".join(lines)
+    encoded_tokens = estimate_tokens(text)
+    report = {
+        "rows_total": len(rows),
+        "rows_shown": shown,
+        "baseline_tokens": baseline_tokens,
+        "encoded_tokens": encoded_tokens,
+        "saved_tokens": baseline_tokens - encoded_tokens,
+        "columns_dropped": dropped
+    }
+    return text, report
+
+__all__ = ["encode_results", "estimate_tokens", "select_columns", "numeric_aggregates"]
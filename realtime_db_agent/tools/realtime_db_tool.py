@@ -1,32 +1,55 @@
 # filepath: c:\Users\singh\Desktop\Chatbot-EC\realtime_db_agent\tools\realtime_db_tool.py
 from langchain.tools import Tool
-from dotenv import load_dotenv
+import resources
 import os
 from realtime_db_agent.part2_generating_and_executing_sql import (
     generate_supabase_query, 
     execute_supabase_query, 
     generate_human_response,
-    handle_cross_table_query
+    handle_cross_table_query,
+    agenerate_supabase_query,
+    aexecute_supabase_query,
+    agenerate_human_response,
+    ahandle_cross_table_query
 )
 
 # Load environment variables
-load_dotenv()
+resources.load_settings()
+
+CROSS_TABLE_KEYWORDS = [
+    "join", "related", "between", "purchase history", "transaction", "user who", 
+    "customer who", "bought", "purchased", "order"
+]
+
+def is_cross_table_question(question: str) -> bool:
+    """Whether the question likely needs data joined from several tables."""
+    return any(keyword in question.lower() for keyword in CROSS_TABLE_KEYWORDS)
 
 # Main function that combines everything
 def db_lookup(question: str) -> str:
     """Look up information in the database and provide a human-friendly response."""
     try:
         # Check for complex cross-table queries first
-        if any(keyword in question.lower() for keyword in [
-            "join", "related", "between", "purchase history", "transaction", "user who", 
-            "customer who", "bought", "purchased", "order"
-        ]):
+        if is_cross_table_question(question):
             return handle_cross_table_query(question)
             
         # For standard queries
         query_params = generate_supabase_query(question)
         result = execute_supabase_query(query_params)
-        return generate_human_response(question, result)
+        return generate_human_response(question, result, query_params)
+        
+    except Exception as e:
+        return f"I encountered an error while searching the database: {str(e)}"
+
+async def adb_lookup(question: str) -> str:
+    """Async version of db_lookup."""
+    try:
+        if is_cross_table_question(question):
+            return await ahandle_cross_table_query(question)
+            
+        query_params = await agenerate_supabase_query(question)
+        result = await aexecute_supabase_query(query_params)
+        return await agenerate_human_response(question, result, query_params)
         
     except Exception as e:
         return f"I encountered an error while searching the database: {str(e)}"
@@ -35,6 +58,7 @@ def db_lookup(question: str) -> str:
 db_tool = Tool(
     name="DatabaseLookupTool",
     func=db_lookup,
+    coroutine=adb_lookup,
     description="Look up information in the database about products, users, and transactions. Can answer questions about product details, users, pricing, and purchase history."
 )
 
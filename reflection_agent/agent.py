@@ -1,70 +1,70 @@
-from langchain_groq import ChatGroq
 from langchain.prompts import ChatPromptTemplate
-from dotenv import load_dotenv
-import os
-load_dotenv()
-
-# Initialize LLM
-llm = ChatGroq(
-    api_key=os.getenv("GROQ_API_KEY"),
-    model="llama-3.3-70b-versatile",
-    temperature=0.4  # Balanced for natural conversation
-)
+import asyncio
+import time
+import resources
+from reflection_agent.scorer import score_response
+from tracing import span
+resources.load_settings()
+
+REFLECTION_MODEL = "llama-3.3-70b-versatile"
+# Replies shorter than this (ignoring whitespace) are replaced by the fallback answer
+MIN_REPLY_CHARS = 10
 
-def reflection_agent(db_output: str = "", policy_output: str = "", previous_context: str = "", user_query: str = "", max_iterations: int = 2):
+# Initialize LLM (built on first use)
+llm = resources.chat_model(REFLECTION_MODEL, temperature=0.4)  # Balanced for natural conversation
+
+# Main conversation prompt
+CONVERSATION_PROMPT = ChatPromptTemplate.from_template(
     """
-    Synthesizes responses from DB and Policy agents into natural, conversational responses.
-    Handles context awareness and general conversation naturally.
+    You are a friendly, helpful assistant having a natural conversation with a customer. 
+
+    Current situation:
+    - User asked: "{user_query}"
+    - Previous conversation context: {previous_context}
+    - Database information available: {db_output}
+    - Policy information available: {policy_output}
+
+    Your role:
+    1. Respond naturally like a human customer service representative
+    2. If you have database info, integrate it smoothly into your response
+    3. If you have policy info, explain it in a conversational way
+    4. If you have both, blend them naturally - don't treat them as separate sections
+    5. If you have neither but the user is asking something general, respond helpfully
+    6. Maintain conversation flow - reference previous context when relevant
+    7. Keep responses conversational length (2-4 sentences typically)
+    8. Be warm and professional, not robotic
+
+    Response guidelines:
+    - Don't start with "Based on..." or "According to..."  
+    - Don't list information in bullet points unless specifically asked
+    - Speak as if you're knowledgeable about both products and policies
+    - If combining product and policy info, do it seamlessly
+    - For general questions unrelated to products/policies, be helpful and conversational
+    - Reference previous conversation naturally when it adds value
+
+    Generate a natural, helpful response:
     """
-    
-    # Main conversation prompt
-    conversation_prompt = ChatPromptTemplate.from_template(
-        """
-        You are a friendly, helpful assistant having a natural conversation with a customer. 
-
-        Current situation:
-        - User asked: "{user_query}"
-        - Previous conversation context: {previous_context}
-        - Database information available: {db_output}
-        - Policy information available: {policy_output}
-
-        Your role:
-        1. Respond naturally like a human customer service representative
-        2. If you have database info, integrate it smoothly into your response
-        3. If you have policy info, explain it in a conversational way
-        4. If you have both, blend them naturally - don't treat them as separate sections
-        5. If you have neither but the user is asking something general, respond helpfully
-        6. Maintain conversation flow - reference previous context when relevant
-        7. Keep responses conversational length (2-4 sentences typically)
-        8. Be warm and professional, not robotic
-
-        Response guidelines:
-        - Don't start with "Based on..." or "According to..."  
-        - Don't list information in bullet points unless specifically asked
-        - Speak as if you're knowledgeable about both products and policies
-        - If combining product and policy info, do it seamlessly
-        - For general questions unrelated to products/policies, be helpful and conversational
-        - Reference previous conversation naturally when it adds value
-
-        Generate a natural, helpful response:
+)
+
+FALLBACK_PROMPT = """
+        The user asked: "{user_query}"
+        
+        Provide a brief, helpful response. If you can't answer specifically, politely explain what you can help with instead.
+        Keep it conversational and friendly.
         """
+
+def build_conversation_messages(db_output: str = "", policy_output: str = "", previous_context: str = "", user_query: str = ""):
+    """Fill the conversation prompt with the sub-agent outputs and context."""
+    return CONVERSATION_PROMPT.format_messages(
+        user_query=user_query,
+        previous_context=previous_context or "No previous conversation",
+        db_output=db_output or "No specific product information available",
+        policy_output=policy_output or "No specific policy information available"
     )
-    
-    best_response = ""
-    
-    for iteration in range(max_iterations):
-        # Generate candidate response
-        formatted_prompt = conversation_prompt.format_messages(
-            user_query=user_query,
-            previous_context=previous_context or "No previous conversation",
-            db_output=db_output or "No specific product information available",
-            policy_output=policy_output or "No specific policy information available"
-        )
-        
-        candidate_response = llm.invoke(formatted_prompt).content.strip()
-        
-        # Quality check prompt
-        quality_check_prompt = f"""
+
+def judge_prompt(user_query: str, candidate_response: str) -> str:
+    """Prompt asking the LLM to rate a candidate response."""
+    return f"""
         Evaluate this customer service response for naturalness and helpfulness:
 
         User Query: "{user_query}"
@@ -80,46 +80,182 @@ def reflection_agent(db_output: str = "", policy_output: str = "", previous_cont
         Rate this response: EXCELLENT, GOOD, or NEEDS_IMPROVEMENT
         Only respond with one of these three ratings.
         """
+
+def _is_good_rating(quality_rating: str) -> bool:
+    quality_rating = quality_rating.upper()
+    return "EXCELLENT" in quality_rating or "GOOD" in quality_rating
+
+def _reflection_steps(db_output, policy_output, previous_context, user_query, max_iterations,
+                      latency_budget, max_llm_calls, max_wall_time, embeddings):
+    """
+    The reflection loop, independent of how the LLM is called.
+    Yields ("generate" | "judge" | "fallback", prompt) for a completion or ("score", candidate)
+    for the local scorer, expects the stripped reply / score result sent back, and returns
+    the final response.
+    """
+    start = time.monotonic()
+    llm_calls = 0
+    
+    def within_budget(calls_needed: int = 1) -> bool:
+        if max_llm_calls is not None and llm_calls + calls_needed > max_llm_calls:
+            return False
+        if max_wall_time is not None and time.monotonic() - start >= max_wall_time:
+            return False
+        return True
+    
+    best_response = ""
+    best_score = -1.0
+    
+    # The prompt doesn't change between iterations, so format it once
+    formatted_prompt = build_conversation_messages(db_output, policy_output, previous_context, user_query)
+    
+    for iteration in range(max_iterations):
+        # Always produce at least one candidate; later ones must fit the budget
+        if iteration > 0 and not within_budget():
+            break
         
-        quality_rating = llm.invoke(quality_check_prompt).content.strip().upper()
-        
-        best_response = candidate_response
+        # Generate candidate response
+        candidate_response = yield ("generate", formatted_prompt)
+        llm_calls += 1
         
-        # Accept if good quality, or if we've reached max iterations
-        if "EXCELLENT" in quality_rating or "GOOD" in quality_rating or iteration == max_iterations - 1:
-            break
+        if latency_budget:
+            # Local scoring is cheap, so keep the best candidate seen so far
+            result = yield ("score", candidate_response)
+            if result["score"] > best_score:
+                best_response, best_score = candidate_response, result["score"]
+            if result["passed"]:
+                break
+        else:
+            best_response = candidate_response
+            
+            # Accept if we've reached max iterations, or if there's no budget to judge and regenerate
+            if iteration == max_iterations - 1 or not within_budget(calls_needed=2):
+                break
+            llm_calls += 1
+            if _is_good_rating((yield ("judge", judge_prompt(user_query, candidate_response)))):
+                break
     
     # Final safety check - ensure we have a response
-    if not best_response or len(best_response.strip()) < 10:
-        fallback_prompt = f"""
-        The user asked: "{user_query}"
-        
-        Provide a brief, helpful response. If you can't answer specifically, politely explain what you can help with instead.
-        Keep it conversational and friendly.
-        """
-        best_response = llm.invoke(fallback_prompt).content.strip()
+    if (not best_response or len(best_response.strip()) < MIN_REPLY_CHARS) and within_budget():
+        best_response = yield ("fallback", FALLBACK_PROMPT.format(user_query=user_query))
     
     return best_response
 
-# Context management helper
-def update_conversation_context(previous_context: str, user_query: str, agent_response: str, max_context_length: int = 800):
+def reflection_agent(db_output: str = "", policy_output: str = "", previous_context: str = "", user_query: str = "", max_iterations: int = 2,
+                     latency_budget: bool = False, max_llm_calls: int = None, max_wall_time: float = None, embeddings=None):
     """
-    Helper function to maintain conversation context efficiently
+    Synthesizes responses from DB and Policy agents into natural, conversational responses.
+    Handles context awareness and general conversation naturally.
+    
+    With `latency_budget=True` candidates are rated by the local scorer instead of an
+    LLM judge, so regeneration only costs a call when the score fails. `max_llm_calls`
+    and `max_wall_time` (seconds) cap the work done in either mode.
+    """
+    steps = _reflection_steps(db_output, policy_output, previous_context, user_query, max_iterations,
+                              latency_budget, max_llm_calls, max_wall_time, embeddings)
+    with span("reflection", latency_budget=latency_budget) as stage:
+        llm_calls = 0
+        try:
+            kind, arg = next(steps)
+            while True:
+                if kind == "score":
+                    with span("score") as call:
+                        reply = score_response(arg, user_query, db_output, policy_output, embeddings)
+                        call.set(score=reply["score"], passed=reply["passed"])
+                else:
+                    llm_calls += 1
+                    with span("llm", model=REFLECTION_MODEL, purpose=kind) as call:
+                        response = llm.invoke(arg)
+                        call.record_llm(response, arg)
+                    reply = response.content.strip()
+                kind, arg = steps.send(reply)
+        except StopIteration as done:
+            return done.value
+        finally:
+            stage.set(llm_calls=llm_calls)
+
+async def areflection_agent(db_output: str = "", policy_output: str = "", previous_context: str = "", user_query: str = "", max_iterations: int = 2,
+                            latency_budget: bool = False, max_llm_calls: int = None, max_wall_time: float = None, embeddings=None):
+    """Async version of reflection_agent; local scoring runs in a worker thread."""
+    steps = _reflection_steps(db_output, policy_output, previous_context, user_query, max_iterations,
+                              latency_budget, max_llm_calls, max_wall_time, embeddings)
+    with span("reflection", latency_budget=latency_budget) as stage:
+        llm_calls = 0
+        try:
+            kind, arg = next(steps)
+            while True:
+                if kind == "score":
+                    with span("score") as call:
+                        reply = await asyncio.to_thread(score_response, arg, user_query, db_output, policy_output, embeddings)
+                        call.set(score=reply["score"], passed=reply["passed"])
+                else:
+                    llm_calls += 1
+                    with span("llm", model=REFLECTION_MODEL, purpose=kind) as call:
+                        response = await llm.ainvoke(arg)
+                        call.record_llm(response, arg)
+                    reply = response.content.strip()
+                kind, arg = steps.send(reply)
+        except StopIteration as done:
+            return done.value
+        finally:
+            stage.set(llm_calls=llm_calls)
+
+def reflection_agent_stream(db_output: str = "", policy_output: str = "", previous_context: str = "", user_query: str = ""):
+    """
+    Streaming variant of `reflection_agent` that yields response tokens as they arrive.
+    Tokens are shown immediately, so there is a single generation pass and no quality loop.
+    The first `MIN_REPLY_CHARS` characters are held back: a reply too short to keep is
+    replaced by the fallback answer before any of it reaches the user.
     """
-    new_exchange = f"User: {user_query}\nAssistant: {agent_response}\n"
+    formatted_prompt = build_conversation_messages(db_output, policy_output, previous_context, user_query)
     
-    if not previous_context:
-        return new_exchange
+    streamed = ""
+    shown = 0
+    # Streams report no usage, so token counts are estimated from the text
+    with span("llm", model=REFLECTION_MODEL, purpose="generate", streaming=True) as call:
+        for chunk in llm.stream(formatted_prompt):
+            if chunk.content:
+                streamed += chunk.content
+                # Hold tokens back until the reply is long enough to keep, so a fallback never follows shown text
+                if len(streamed.strip()) >= MIN_REPLY_CHARS:
+                    yield streamed[shown:]
+                    shown = len(streamed)
+        call.record_llm(streamed, formatted_prompt)
     
-    updated_context = previous_context + "\n" + new_exchange
+    # Same safety net as the blocking path
+    if len(streamed.strip()) < MIN_REPLY_CHARS:
+        fallback_prompt = FALLBACK_PROMPT.format(user_query=user_query)
+        fallback = ""
+        with span("llm", model=REFLECTION_MODEL, purpose="fallback", streaming=True) as call:
+            for chunk in llm.stream(fallback_prompt):
+                if chunk.content:
+                    fallback += chunk.content
+                    yield chunk.content
+            call.record_llm(fallback, fallback_prompt)
+
+async def areflection_agent_stream(db_output: str = "", policy_output: str = "", previous_context: str = "", user_query: str = ""):
+    """Async version of `reflection_agent_stream`."""
+    formatted_prompt = build_conversation_messages(db_output, policy_output, previous_context, user_query)
     
-    # Trim context if too long (keep most recent exchanges)
-    if len(updated_context) > max_context_length:
-        lines = updated_context.split('\n')
-        # Keep last few exchanges (each exchange is typically 2 lines)
-        recent_lines = lines[-(max_context_length//50):]  # Approximate line count
-        updated_context = '\n'.join(recent_lines)
+    streamed = ""
+    shown = 0
+    with span("llm", model=REFLECTION_MODEL, purpose="generate", streaming=True) as call:
+        async for chunk in llm.astream(formatted_prompt):
+            if chunk.content:
+                streamed += chunk.content
+                if len(streamed.strip()) >= MIN_REPLY_CHARS:
+                    yield streamed[shown:]
+                    shown = len(streamed)
+        call.record_llm(streamed, formatted_prompt)
     
-    return updated_context
+    if len(streamed.strip()) < MIN_REPLY_CHARS:
+        fallback_prompt = FALLBACK_PROMPT.format(user_query=user_query)
+        fallback = ""
+        with span("llm", model=REFLECTION_MODEL, purpose="fallback", streaming=True) as call:
+            async for chunk in llm.astream(fallback_prompt):
+                if chunk.content:
+                    fallback += chunk.content
+                    yield chunk.content
+            call.record_llm(fallback, fallback_prompt)
 
-__all__ = ["reflection_agent", "update_conversation_context"]
+__all__ = ["reflection_agent", "areflection_agent", "reflection_agent_stream", "areflection_agent_stream"]
@@ -0,0 +1,102 @@
+import json
+import os
+from collections import deque
+from typing import NamedTuple
+import resources
+from realtime_db_agent.result_encoder import estimate_tokens
+resources.load_settings()
+
+# Exchanges kept per session, and the share of them shown to the reflection prompt
+CONVERSATION_MAX_EXCHANGES = int(os.getenv("CONVERSATION_MAX_EXCHANGES", "20"))
+CONVERSATION_TOKEN_BUDGET = int(os.getenv("CONVERSATION_TOKEN_BUDGET", "200"))
+
+class Exchange(NamedTuple):
+    """One user turn and the assistant's reply, rendered once with its token count."""
+    user: str
+    assistant: str
+    text: str
+    tokens: int
+
+def _make_exchange(user_query: str, agent_response: str) -> Exchange:
+    text = f"User: {user_query}\nAssistant: {agent_response}\n"
+    return Exchange(user_query, agent_response, text, estimate_tokens(text))
+
+class ConversationMemory:
+    """
+    Recent conversation of one session as a ring buffer of whole exchanges.
+    Appending and evicting are O(1); rendering walks back from the newest exchange
+    only until the token budget is spent, so cost doesn't grow with session length.
+    """
+
+    def __init__(self, max_exchanges: int = CONVERSATION_MAX_EXCHANGES, token_budget: int = CONVERSATION_TOKEN_BUDGET):
+        self.token_budget = token_budget
+        self._exchanges = deque(maxlen=max_exchanges)
+        self._tokens = 0
+
+    @property
+    def max_exchanges(self) -> int:
+        return self._exchanges.maxlen
+
+    def add(self, user_query: str, agent_response: str):
+        """Record an exchange, dropping the oldest one when the buffer is full."""
+        if len(self._exchanges) == self._exchanges.maxlen:
+            self._tokens -= self._exchanges[0].tokens
+        exchange = _make_exchange(user_query, agent_response)
+        self._exchanges.append(exchange)
+        self._tokens += exchange.tokens
+
+    def render(self, token_budget: int = None) -> str:
+        """
+        The most recent exchanges that fit in `token_budget`, oldest first.
+        Exchanges are never cut in half; if even the newest one is too long, only
+        its reply is shortened so the latest turn is always represented.
+        """
+        budget = self.token_budget if token_budget is None else token_budget
+        selected = []
+        used = 0
+        for exchange in reversed(self._exchanges):
+            if used + exchange.tokens > budget:
+                break
+            selected.append(exchange.text)
+            used += exchange.tokens
+
+        if not selected and self._exchanges and budget > 0:
+            newest = self._exchanges[-1]
+            room = max(budget * 4 - len(f"User: {newest.user}\nAssistant: \n") - 3, 0)
+            selected.append(f"User: {newest.user}\nAssistant: {newest.assistant[:room]}...\n")
+
+        return "\n".join(reversed(selected))
+
+    def clear(self):
+        self._exchanges.clear()
+        self._tokens = 0
+
+    def dumps(self) -> str:
+        """Compact JSON form (`[max_exchanges, token_budget, [[user, reply], ...]]`) for storing a session."""
+        return json.dumps(
+            [self.max_exchanges, self.token_budget, [[e.user, e.assistant] for e in self._exchanges]],
+            separators=(",", ":"),
+            ensure_ascii=False
+        )
+
+    @classmethod
+    def loads(cls, data: str) -> "ConversationMemory":
+        """Restore a memory saved with `dumps`."""
+        max_exchanges, token_budget, exchanges = json.loads(data)
+        memory = cls(max_exchanges, token_budget)
+        for user_query, agent_response in exchanges:
+            memory.add(user_query, agent_response)
+        return memory
+
+    def __len__(self):
+        return len(self._exchanges)
+
+    def stats(self) -> dict:
+        return {
+            "exchanges": len(self._exchanges),
+            "max_exchanges": self.max_exchanges,
+            "tokens": self._tokens,
+            "token_budget": self.token_budget
+        }
+
+__all__ = ["ConversationMemory", "CONVERSATION_MAX_EXCHANGES", "CONVERSATION_TOKEN_BUDGET"]
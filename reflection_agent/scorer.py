@@ -0,0 +1,89 @@
+import os
+import re
+import numpy as np
+import resources
+resources.load_settings()
+
+# Minimum combined score for a response to be accepted without regeneration
+REFLECTION_MIN_SCORE = float(os.getenv("REFLECTION_MIN_SCORE", "0.6"))
+
+# Openers the conversation prompt tells the model to avoid
+BANNED_OPENERS = ("based on", "according to", "as an ai", "as a language model")
+
+STOPWORDS = {
+    "the", "and", "for", "are", "but", "not", "you", "your", "with", "this", "that",
+    "have", "has", "can", "our", "will", "from", "they", "what", "about", "there",
+    "would", "could", "which", "their", "been", "also", "just", "into", "than", "then"
+}
+
+WEIGHTS = {"length": 0.2, "opener": 0.2, "grounding": 0.3, "relevance": 0.3}
+
+_word_pattern = re.compile(r"[a-z0-9$.]+")
+
+def _content_words(text: str) -> set:
+    words = (w.strip(".") for w in _word_pattern.findall(text.lower()))
+    return {w for w in words if len(w) > 2 and w not in STOPWORDS}
+
+# Thousands-separated numbers first, so "$1,299.99" reads as one number, not "1" and "299.99"
+_number_pattern = re.compile(r"\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?")
+
+def _numbers(text: str) -> set:
+    return {number.replace(",", "") for number in _number_pattern.findall(text)}
+
+def _length_score(response: str, min_words: int, max_words: int) -> float:
+    words = len(response.split())
+    if words < min_words:
+        return words / min_words
+    if words > max_words:
+        return max(0.0, 1 - (words - max_words) / max_words)
+    return 1.0
+
+def _grounding_score(response: str, sources: str) -> float:
+    response_words = _content_words(response)
+    if not response_words:
+        return 0.0
+    overlap = len(response_words & _content_words(sources)) / len(response_words)
+    return min(1.0, overlap * 2)
+
+def _relevance_score(response: str, user_query: str, embeddings) -> float:
+    query_vector, response_vector = np.asarray(embeddings.embed_documents([user_query, response]), dtype=np.float32)
+    similarity = float(query_vector @ response_vector) / max(
+        float(np.linalg.norm(query_vector) * np.linalg.norm(response_vector)), 1e-12
+    )
+    # MiniLM similarities for a good answer usually land around 0.4-0.7
+    return max(0.0, min(1.0, similarity / 0.5))
+
+def score_response(response: str, user_query: str = "", db_output: str = "", policy_output: str = "",
+                   embeddings=None, min_words: int = 8, max_words: int = 180,
+                   min_score: float = REFLECTION_MIN_SCORE) -> dict:
+    """
+    Score a candidate response locally instead of asking the LLM to rate it.
+    Returns the per-component scores, the weighted total and whether it passes.
+    """
+    response = response.strip()
+    scores = {
+        "length": _length_score(response, min_words, max_words),
+        "opener": 0.0 if response.lower().startswith(BANNED_OPENERS) else 1.0
+    }
+
+    sources = f"{db_output}\n{policy_output}".strip()
+    invented_numbers = set()
+    if sources:
+        scores["grounding"] = _grounding_score(response, sources)
+        # Numbers that appear nowhere in the sources are likely hallucinated prices or IDs
+        invented_numbers = _numbers(response) - _numbers(sources)
+    if embeddings is not None and user_query and response:
+        scores["relevance"] = _relevance_score(response, user_query, embeddings)
+
+    # Only weigh the components we could compute
+    total_weight = sum(WEIGHTS[name] for name in scores)
+    total = sum(WEIGHTS[name] * value for name, value in scores.items()) / total_weight
+
+    return {
+        "scores": scores,
+        "score": total,
+        "invented_numbers": sorted(invented_numbers),
+        "passed": bool(response) and scores["opener"] > 0 and not invented_numbers and total >= min_score
+    }
+
+__all__ = ["score_response", "BANNED_OPENERS"]
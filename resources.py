@@ -0,0 +1,183 @@
+import os
+import threading
+import time
+
+# Reference point for the startup milestones (this module is among the first imported)
+_process_start = time.perf_counter()
+
+_settings_loaded = False
+
+def load_settings():
+    """Load `.env` into the environment once per process; later calls are free."""
+    global _settings_loaded
+    if not _settings_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _settings_loaded = True
+
+load_settings()
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+# OpenAI-compatible endpoints (override to point the agents at a local stub)
+NEBIUS_BASE_URL = os.getenv("NEBIUS_BASE_URL", "https://api.studio.nebius.com/v1/")
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1")
+POLICY_DB_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "policy", "db", "chroma_db")
+
+class Resource:
+    """
+    A named, shared object built on first use.
+    Heavy imports happen inside the factory, so registering a resource costs nothing.
+    """
+
+    def __init__(self, name: str, factory, cache: bool = True):
+        self.name = name
+        self.factory = factory
+        # Uncached resources delegate to a getter that manages its own lifecycle
+        self.cache = cache
+        self.build_ms = None
+        self._value = None
+        self._built = False
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._built:
+            return self._value
+        if not self.cache:
+            return self._timed_build()
+        with self._lock:
+            if not self._built:
+                self._value = self._timed_build()
+                self._built = True
+        return self._value
+
+    def _timed_build(self):
+        start = time.perf_counter()
+        value = self.factory()
+        if self.build_ms is None:
+            self.build_ms = round((time.perf_counter() - start) * 1000, 1)
+        return value
+
+    @property
+    def loaded(self) -> bool:
+        return self._built or (not self.cache and self.build_ms is not None)
+
+class ResourceProxy:
+    """
+    Module-level stand-in for a resource: attribute access builds it on first use.
+    Lets modules keep `llm = ...`-style globals (and tests replace them) without import-time cost.
+    """
+    __slots__ = ("_resource",)
+
+    def __init__(self, resource: Resource):
+        object.__setattr__(self, "_resource", resource)
+
+    def __getattr__(self, attribute):
+        return getattr(self._resource.get(), attribute)
+
+    def __setattr__(self, attribute, value):
+        setattr(self._resource.get(), attribute, value)
+
+    def __repr__(self):
+        state = "loaded" if self._resource.loaded else "not loaded"
+        return f"<lazy {self._resource.name} ({state})>"
+
+_registry = {}
+_registry_lock = threading.Lock()
+_milestones = {}
+
+def register(name: str, factory, cache: bool = True) -> Resource:
+    """Register a resource factory under `name`; registering the same name again returns the existing resource."""
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = Resource(name, factory, cache)
+        return _registry[name]
+
+def get(name: str):
+    """Return the shared object for `name`, building it if needed."""
+    return _registry[name].get()
+
+def is_loaded(name: str) -> bool:
+    """Whether `name` has been built, i.e. using it now won't pay its startup cost."""
+    return _registry[name].loaded
+
+def lazy(name: str) -> ResourceProxy:
+    """A proxy for `name` to keep as a module-level global."""
+    return ResourceProxy(_registry[name])
+
+def warmup(names=None) -> dict:
+    """
+    Build resources now rather than on first use (all registered ones by default),
+    for servers that would rather pay the cost at startup. Returns build times in ms.
+    """
+    for name in names or list(_registry):
+        _registry[name].get()
+    milestone("warm")
+    return {name: _registry[name].build_ms for name in names or list(_registry)}
+
+def milestone(name: str):
+    """Record the first time the process reached `name`, in seconds since startup."""
+    _milestones.setdefault(name, round(time.perf_counter() - _process_start, 3))
+
+def stats() -> dict:
+    return {
+        "resources": {
+            name: {"loaded": resource.loaded, "build_ms": resource.build_ms}
+            for name, resource in _registry.items()
+        },
+        "milestones": dict(_milestones)
+    }
+
+# Shared resources. Factories import their libraries on first use.
+
+def _embeddings():
+    # fp32 or int8-quantized, per EMBEDDING_BACKEND
+    from policy.tools.embeddings import create_embeddings
+    return create_embeddings()
+
+def _policy_store():
+    # Chroma, or the in-memory NumPy snapshot, per POLICY_VECTOR_STORE
+    from policy.tools.vector_store import create_policy_store
+    return create_policy_store(embedding_function=get("embeddings"))
+
+def _policy_lexical_index():
+    # BM25 index written next to the vector snapshot at ingestion; None until it exists, reloaded when it changes
+    from policy.tools.lexical_index import bm25_index
+    return bm25_index.get()
+
+def _policy_sentences():
+    # Sentence snapshot for extractive policy answers; None until ingestion writes it, reloaded when it changes
+    from policy.tools.extractive import sentence_index
+    return sentence_index.get()
+
+def _nebius():
+    # One client (sync and async) with the shared timeout, retry, hedging and coalescing settings
+    from llm_client import LLMClient
+    return LLMClient(NEBIUS_BASE_URL, os.environ.get("NEBIUS_API_KEY"), name="nebius")
+
+def _groq():
+    from llm_client import LLMClient
+    return LLMClient(GROQ_BASE_URL, os.environ.get("GROQ_API_KEY"), name="groq")
+
+def _supabase():
+    from realtime_db_agent.db_client import get_supabase_client
+    return get_supabase_client()
+
+register("embeddings", _embeddings)
+register("policy_store", _policy_store)
+# The snapshot watchers own reloading, so these are looked up on every call
+register("policy_lexical_index", _policy_lexical_index, cache=False)
+register("policy_sentences", _policy_sentences, cache=False)
+register("nebius", _nebius)
+register("groq", _groq)
+# db_client owns the Supabase client (the chat service closes and reopens it)
+register("supabase", _supabase, cache=False)
+
+def chat_model(model: str, temperature: float) -> ResourceProxy:
+    """Lazy Groq chat model; every model shares the one Groq client and its connection pool."""
+    def build():
+        from llm_client import ChatModel
+        return ChatModel(get("groq"), model, temperature)
+    return ResourceProxy(register(f"groq:{model}@{temperature}", build))
+
+__all__ = ["load_settings", "register", "get", "is_loaded", "lazy", "chat_model", "warmup", "milestone", "stats",
+           "Resource", "ResourceProxy", "EMBEDDING_MODEL", "NEBIUS_BASE_URL", "GROQ_BASE_URL", "POLICY_DB_DIRECTORY"]
@@ -0,0 +1,166 @@
+import json
+import os
+import threading
+import numpy as np
+import resources
+resources.load_settings()
+
+AGENT_TYPES = ["policy", "database", "both", "general"]
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+EXAMPLES_PATH = os.path.join(current_dir, "examples.jsonl")
+TRAFFIC_PATH = os.getenv("ROUTER_TRAFFIC_PATH", os.path.join(current_dir, "traffic.jsonl"))
+
+# Below this confidence the head agent falls back to the LLM classifier
+ROUTER_CONFIDENCE_THRESHOLD = float(os.getenv("ROUTER_CONFIDENCE_THRESHOLD", "0.6"))
+# Softmax temperature applied to cosine similarities
+ROUTER_TEMPERATURE = float(os.getenv("ROUTER_TEMPERATURE", "0.05"))
+# Most recent distinct logged queries used by an explicit retrain
+ROUTER_TRAFFIC_MAX = int(os.getenv("ROUTER_TRAFFIC_MAX", "2000"))
+
+def load_examples(path: str):
+    """Read labelled `{"text", "label"}` records from a JSONL file."""
+    examples = []
+    if not os.path.exists(path):
+        return examples
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if record.get("label") in AGENT_TYPES and record.get("text"):
+                examples.append((record["text"], record["label"]))
+    return examples
+
+def dedupe_traffic(traffic, curated, limit: int = ROUTER_TRAFFIC_MAX):
+    """
+    The newest `limit` distinct logged queries (latest label wins), skipping any that
+    repeat a curated example, oldest first.
+    """
+    seen = {text.strip().lower() for text, _ in curated}
+    recent = []
+    for text, label in reversed(traffic):
+        key = text.strip().lower()
+        if key in seen:
+            continue
+        seen.add(key)
+        recent.append((text, label))
+        if len(recent) >= limit:
+            break
+    return recent[::-1]
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+class EmbeddingRouter:
+    """
+    Nearest-centroid query classifier over labelled example prompts.
+    Uses the same sentence embedding model as the policy retriever, so routing
+    costs one local embedding instead of an LLM call.
+    """
+
+    def __init__(self, embeddings, examples_path: str = EXAMPLES_PATH, traffic_path: str = TRAFFIC_PATH,
+                 threshold: float = ROUTER_CONFIDENCE_THRESHOLD, temperature: float = ROUTER_TEMPERATURE):
+        self.embeddings = embeddings
+        self.examples_path = examples_path
+        self.traffic_path = traffic_path
+        self.threshold = threshold
+        self.temperature = temperature
+        self.local_routes = 0
+        self.llm_fallbacks = 0
+        self._labels = []
+        self._centroids = None
+        self._lock = threading.Lock()
+
+    def fit(self, examples):
+        """Build one centroid per label from `(text, label)` pairs."""
+        texts = [text for text, _ in examples]
+        labels = np.array([label for _, label in examples])
+        vectors = _normalize(np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32))
+
+        present = [label for label in AGENT_TYPES if (labels == label).any()]
+        centroids = np.stack([vectors[labels == label].mean(axis=0) for label in present])
+
+        with self._lock:
+            self._labels = present
+            self._centroids = _normalize(centroids)
+
+    def training_examples(self, include_traffic: bool = True):
+        """The curated examples plus, optionally, recent deduplicated LLM-labelled traffic."""
+        examples = load_examples(self.examples_path)
+        if include_traffic:
+            examples += dedupe_traffic(load_examples(self.traffic_path), examples)
+        return examples
+
+    def retrain(self, include_traffic: bool = True):
+        """Refit from the curated examples plus, optionally, LLM-labelled traffic."""
+        examples = self.training_examples(include_traffic)
+        self.fit(examples)
+        return len(examples)
+
+    def add_examples(self, examples, persist: bool = True):
+        """Extend the curated examples with `(text, label)` pairs and refit."""
+        if persist:
+            with open(self.examples_path, "a", encoding="utf-8") as f:
+                for text, label in examples:
+                    f.write(json.dumps({"text": text, "label": label}) + "\n")
+        return self.retrain(include_traffic=False)
+
+    def classify(self, query: str):
+        """Return `(label, confidence)` for a query."""
+        if self._centroids is None:
+            # Serving only fits the curated examples; logged traffic waits for an explicit retrain
+            self.retrain(include_traffic=False)
+
+        with self._lock:
+            labels, centroids = self._labels, self._centroids
+
+        vector = _normalize(np.asarray(self.embeddings.embed_query(query), dtype=np.float32))
+        scores = centroids @ vector / self.temperature
+        probs = np.exp(scores - scores.max())
+        probs /= probs.sum()
+        best = int(probs.argmax())
+        return labels[best], float(probs[best])
+
+    def route(self, query: str):
+        """Return the label if the local classifier is confident enough, otherwise None."""
+        label, confidence = self.classify(query)
+        with self._lock:
+            if confidence >= self.threshold:
+                self.local_routes += 1
+                return label
+            self.llm_fallbacks += 1
+            return None
+
+    def record(self, query: str, label: str):
+        """Log an LLM-labelled query so it can be used by the next `retrain`."""
+        if label not in AGENT_TYPES:
+            return
+        with self._lock, open(self.traffic_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"text": query, "label": label}) + "\n")
+
+    def stats(self) -> dict:
+        """Return how often queries were routed locally versus through the LLM."""
+        total = self.local_routes + self.llm_fallbacks
+        return {
+            "local": self.local_routes,
+            "llm": self.llm_fallbacks,
+            "local_rate": self.local_routes / total if total else 0.0
+        }
+
+def main():
+    """Retrain from curated examples plus logged traffic and report training accuracy."""
+    router = EmbeddingRouter(resources.get("embeddings"))
+    examples = router.training_examples(include_traffic=True)
+    router.fit(examples)
+    count = len(examples)
+
+    correct = sum(router.classify(text)[0] == label for text, label in examples)
+    print(f"Trained on {count} examples, training accuracy {correct / max(count, 1):.1%}")
+
+if __name__ == "__main__":
+    main()
+
+__all__ = ["EmbeddingRouter", "AGENT_TYPES", "load_examples", "dedupe_traffic"]
@@ -0,0 +1,98 @@
+import asyncio
+import json
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+from chat_service import create_app
+from realtime_db_agent.query_log import query_log_stats
+
+class EchoAgent:
+    """Stands in for HeadAgent: answers after a short delay and counts turns per session."""
+    def __init__(self):
+        self.turns = 0
+
+    async def aprocess_query(self, query):
+        await asyncio.sleep(0.1)
+        self.turns += 1
+        return f"{query} #{self.turns}"
+
+    async def aprocess_query_stream(self, query):
+        yield {"type": "status", "content": "Understanding your question..."}
+        for token in query.split():
+            yield {"type": "token", "content": token}
+
+def run(app, scenario):
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await scenario(client)
+    return asyncio.run(main())
+
+def test_session_id_keeps_the_conversation():
+    async def scenario(client):
+        first = (await client.post("/chat", json={"message": "hi"})).json()
+        second = (await client.post("/chat", json={"message": "again", "session_id": first["session_id"]})).json()
+        return first, second
+
+    first, second = run(create_app(EchoAgent), scenario)
+    assert first["response"] == "hi #1"
+    assert second == {"session_id": first["session_id"], "response": "again #2"}
+
+def test_requests_beyond_the_queue_get_429():
+    app = create_app(EchoAgent, max_active=2, max_queued=2, queue_timeout=5)
+
+    async def scenario(client):
+        return await asyncio.gather(*(client.post("/chat", json={"message": str(i)}) for i in range(8)))
+
+    responses = run(app, scenario)
+    assert sorted(r.status_code for r in responses) == [200] * 4 + [429] * 4
+    assert all("retry-after" in r.headers for r in responses if r.status_code == 429)
+    assert app.state.admission.stats()["active"] == 0
+
+def test_stream_sends_events_then_done():
+    async def scenario(client):
+        return await client.post("/chat/stream", json={"message": "hello there"})
+
+    response = run(create_app(EchoAgent), scenario)
+    events = [json.loads(line[len("data: "):]) for line in response.text.splitlines() if line.startswith("data: ")]
+    assert [e["type"] for e in events] == ["status", "token", "token", "done"]
+    assert events[-1]["session_id"] == response.headers["x-session-id"]
+
+def test_draining_rejects_new_requests_and_waits_for_running_ones():
+    app = create_app(EchoAgent)
+
+    async def scenario(client):
+        running = asyncio.create_task(client.post("/chat", json={"message": "slow"}))
+        await asyncio.sleep(0.02)
+        drained = asyncio.create_task(app.state.admission.drain(timeout=5))
+        await asyncio.sleep(0)
+        rejected = await client.post("/chat", json={"message": "late"})
+        return (await running).status_code, rejected.status_code, await drained
+
+    assert run(app, scenario) == (200, 503, True)
+
+def test_lifespan_starts_and_stops_the_query_log(tmp_path):
+    app = create_app(EchoAgent, warmup=False)
+    cwd = os.getcwd()
+    # The log file path is relative; keep it out of the repo
+    os.chdir(tmp_path)
+    try:
+        async def serve():
+            async with app.router.lifespan_context(app):
+                assert query_log_stats()["enabled"]
+        asyncio.run(serve())
+    finally:
+        os.chdir(cwd)
+    assert not query_log_stats()["enabled"]
+
+if __name__ == "__main__":
+    test_session_id_keeps_the_conversation()
+    test_requests_beyond_the_queue_get_429()
+    test_stream_sends_events_then_done()
+    test_draining_rejects_new_requests_and_waits_for_running_ones()
+    import pathlib, tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        test_lifespan_starts_and_stops_the_query_log(pathlib.Path(tmp))
+    print("Chat service tests passed")
@@ -0,0 +1,55 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from reflection_agent.memory import ConversationMemory
+
+def test_ring_buffer_evicts_oldest_and_tracks_tokens():
+    memory = ConversationMemory(max_exchanges=3, token_budget=1000)
+    for i in range(5):
+        memory.add(f"question {i}", f"answer {i}")
+
+    assert len(memory) == 3
+    assert memory.render() == (
+        "User: question 2\nAssistant: answer 2\n\n"
+        "User: question 3\nAssistant: answer 3\n\n"
+        "User: question 4\nAssistant: answer 4\n"
+    )
+    fresh = ConversationMemory(max_exchanges=3)
+    for i in range(2, 5):
+        fresh.add(f"question {i}", f"answer {i}")
+    assert memory.stats()["tokens"] == fresh.stats()["tokens"]
+
+def test_render_keeps_whole_exchanges_within_budget():
+    memory = ConversationMemory(max_exchanges=10, token_budget=20)
+    memory.add("Do you have the Desk Lamp?", "Yes, the Desk Lamp is in stock at $25.")
+    memory.add("What about returns?", "You can return it within 30 days.")
+
+    rendered = memory.render()
+    assert rendered == "User: What about returns?\nAssistant: You can return it within 30 days.\n"
+    assert "Desk Lamp" in memory.render(token_budget=100)
+
+def test_oversized_newest_exchange_is_shortened_not_dropped():
+    memory = ConversationMemory(token_budget=20)
+    memory.add("Tell me everything", "word " * 200)
+
+    rendered = memory.render()
+    assert rendered.startswith("User: Tell me everything\nAssistant: word")
+    assert len(rendered) <= 20 * 4
+
+def test_dumps_and_loads_round_trip():
+    memory = ConversationMemory(max_exchanges=4, token_budget=50)
+    memory.add("hi", "Hello! How can I help?")
+    memory.add("price of the mug?", "The Coffee Mug is $12.")
+
+    restored = ConversationMemory.loads(memory.dumps())
+    assert restored.render() == memory.render()
+    assert restored.stats() == memory.stats()
+    assert ConversationMemory.loads(ConversationMemory().dumps()).render() == ""
+
+if __name__ == "__main__":
+    test_ring_buffer_evicts_oldest_and_tracks_tokens()
+    test_render_keeps_whole_exchanges_within_budget()
+    test_oversized_newest_exchange_is_shortened_not_dropped()
+    test_dumps_and_loads_round_trip()
+    print("Conversation memory tests passed")
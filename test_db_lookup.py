@@ -0,0 +1,79 @@
+import asyncio
+import json
+import os
+import sys
+import pytest
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import realtime_db_agent.part2_generating_and_executing_sql as part2
+import realtime_db_agent.tools.realtime_db_tool as realtime_db_tool
+from realtime_db_agent.agent import adb_agent, db_agent
+from realtime_db_agent.plan_cache import PlanCache
+
+def plan_for(question):
+    product_id = int(question.rsplit(" ", 1)[-1])
+    return {"table_name": "products", "select": "*",
+            "filters": [{"column": "product_id", "operator": "eq", "value": product_id}]}
+
+def offline_lookup(monkeypatch, tmp_path):
+    """Point db_lookup at a fresh plan cache, a fake LLM and a fake database; returns the LLM call log."""
+    llm_calls = []
+
+    def fake_chat_completion(messages, temperature):
+        llm_calls.append(messages)
+        question = messages[-1]["content"].split('user question: "')[1].split('"')[0]
+        return json.dumps(plan_for(question))
+
+    async def fake_achat_completion(messages, temperature):
+        return fake_chat_completion(messages, temperature)
+
+    cache = PlanCache(path=str(tmp_path / "plans.json"))
+    cache.set_vocabulary({"product": [], "user": []})
+    monkeypatch.setattr(part2, "plan_cache", cache)
+    monkeypatch.setattr(part2.schema_registry, "get_all_schemas", lambda: "products(product_id, product_name)")
+    monkeypatch.setattr(part2, "chat_completion", fake_chat_completion)
+    monkeypatch.setattr(part2, "achat_completion", fake_achat_completion)
+
+    def fake_execute(query_params):
+        return {"table": query_params["table_name"], "data": [{"product_id": query_params["filters"][0]["value"]}]}
+
+    async def fake_aexecute(query_params):
+        return fake_execute(query_params)
+
+    def fake_response(question, result, query_params=None):
+        return f"product {result['data'][0]['product_id']}"
+
+    async def fake_aresponse(question, result, query_params=None):
+        return fake_response(question, result, query_params)
+
+    monkeypatch.setattr(realtime_db_tool, "execute_supabase_query", fake_execute)
+    monkeypatch.setattr(realtime_db_tool, "aexecute_supabase_query", fake_aexecute)
+    monkeypatch.setattr(realtime_db_tool, "generate_human_response", fake_response)
+    monkeypatch.setattr(realtime_db_tool, "agenerate_human_response", fake_aresponse)
+    return cache, llm_calls
+
+def test_repeated_question_shape_is_answered_from_the_plan_cache(monkeypatch, tmp_path):
+    cache, llm_calls = offline_lookup(monkeypatch, tmp_path)
+
+    assert db_agent("tell me about product id 36") == "product 36"
+    assert db_agent("tell me about product id 71") == "product 71"
+    assert len(llm_calls) == 1
+    assert cache.stats()["hits"] == 1
+
+def test_async_lookup_reuses_the_plan_cache(monkeypatch, tmp_path):
+    cache, llm_calls = offline_lookup(monkeypatch, tmp_path)
+
+    async def ask():
+        return [await adb_agent("tell me about product id 36"), await adb_agent("tell me about product id 71")]
+
+    assert asyncio.run(ask()) == ["product 36", "product 71"]
+    assert len(llm_calls) == 1
+    assert cache.stats()["hits"] == 1
+    assert os.path.exists(tmp_path / "plans.json")
+
+if __name__ == "__main__":
+    import pathlib, tempfile
+    for test in (test_repeated_question_shape_is_answered_from_the_plan_cache, test_async_lookup_reuses_the_plan_cache):
+        with pytest.MonkeyPatch.context() as monkeypatch, tempfile.TemporaryDirectory() as tmp:
+            test(monkeypatch, pathlib.Path(tmp))
+    print("Database lookup tests passed")
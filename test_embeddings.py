@@ -0,0 +1,58 @@
+import os
+import sys
+import zlib
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from policy.tools.embeddings import create_embeddings, topk_agreement
+
+class BagOfWords:
+    """Deterministic word-hash vectors; `noise` perturbs every dimension slightly like quantization does."""
+    def __init__(self, noise: float = 0.0, salt: str = "", dimension: int = 64):
+        self.noise = noise
+        self.salt = salt
+        self.dimension = dimension
+
+    def embed_query(self, text):
+        vector = [self.noise * ((i * 7919) % 13 - 6) / 6 for i in range(self.dimension)]
+        for word in text.lower().split():
+            vector[zlib.crc32((self.salt + word).encode()) % self.dimension] += 1.0
+        return vector
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+DOCUMENTS = [
+    "returns are accepted within 30 days of delivery",
+    "shipping takes three to five business days",
+    "warranty covers manufacturing defects for one year",
+    "damaged items can be replaced free of charge",
+    "refunds go back to the original payment method",
+]
+QUERIES = ["how many days do returns take", "what does the warranty cover", "my item arrived damaged"]
+
+def test_identical_backends_agree_fully():
+    result = topk_agreement(BagOfWords(), BagOfWords(), QUERIES, DOCUMENTS, k=2)
+    assert result == {"k": 2, "queries": 3, "rebuilt": 1.0, "mixed": 1.0}
+
+def test_small_perturbation_keeps_top_result_and_k_is_capped():
+    assert topk_agreement(BagOfWords(), BagOfWords(noise=0.01), QUERIES, DOCUMENTS, k=1)["rebuilt"] == 1.0
+    assert topk_agreement(BagOfWords(), BagOfWords(), QUERIES, DOCUMENTS, k=50)["k"] == len(DOCUMENTS)
+
+def test_unrelated_model_disagrees():
+    result = topk_agreement(BagOfWords(dimension=4), BagOfWords(salt="other", dimension=4), QUERIES, DOCUMENTS, k=1)
+    assert result["rebuilt"] < 1.0
+
+def test_unknown_backend_is_rejected():
+    try:
+        create_embeddings("fp8")
+    except ValueError as e:
+        assert "fp8" in str(e)
+    else:
+        raise AssertionError("expected ValueError")
+
+if __name__ == "__main__":
+    test_identical_backends_agree_fully()
+    test_small_perturbation_keeps_top_result_and_k_is_capped()
+    test_unrelated_model_disagrees()
+    test_unknown_backend_is_rejected()
+    print("Embedding backend tests passed")
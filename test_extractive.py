@@ -0,0 +1,82 @@
+import os
+import sys
+import numpy as np
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from policy.tools.extractive import (extract_answer, is_extractive, load_sentence_index, mark_extractive, split_sections,
+                                    strip_marker)
+from policy.tools.semantic_cache import SnapshotWatcher
+from policy.tools.vector_store import NumpyVectorStore, write_snapshot
+
+DOCUMENT = """Company Policies
+
+1.  Refund Policy
+
+-   Refund is processed after product inspection.
+-   Timeframes:
+    -   Credit/Debit Card: 5–7 business days
+    -   Wallet Refund: Instant
+-   Partial refunds may apply if only part of an
+    order is returned.
+shipping_policy.txt -
+## E-COMMERCE SHIPPING POLICY
+
+**International Shipping:** We currently ship to Canada and the UK. Customs and duties are paid by the customer.
+"""
+
+def test_sections_and_sentences_follow_the_document_layout():
+    sections = split_sections(DOCUMENT)
+    assert sections == [
+        ("Refund Policy", [
+            "Refund is processed after product inspection.",
+            "Timeframes: Credit/Debit Card: 5–7 business days",
+            "Timeframes: Wallet Refund: Instant",
+            "Partial refunds may apply if only part of an order is returned."
+        ]),
+        ("E-Commerce Shipping Policy", [
+            "International Shipping: We currently ship to Canada and the UK.",
+            "Customs and duties are paid by the customer."
+        ])
+    ]
+
+def test_confident_matches_are_quoted_and_weak_ones_left_to_the_llm():
+    metadatas = [{"source": "p.txt", "section": "Refund Policy", "position": i} for i in range(3)]
+    metadatas.append({"source": "p.txt", "section": "Shipping", "position": 3})
+    vectors = np.array([[1.0, 0.0, 0.0], [0.9, 0.1, 0.0], [0.0, 1.0, 0.0], [0.95, 0.05, 0.0]], dtype=np.float32)
+    index = NumpyVectorStore(
+        vectors / np.linalg.norm(vectors, axis=1, keepdims=True),
+        ["Refunds take 5 days.", "Refunds go to the card.", "Exchanges need stock.", "Shipping takes 3 days."],
+        metadatas
+    )
+
+    # The near-tied shipping sentence is from another section and is left out; order follows the document
+    answer = extract_answer(index, [0.95, 0.1, 0.0], threshold=0.9, margin=0.05, max_sentences=2)
+    assert answer == "From our Refund Policy: Refunds take 5 days. Refunds go to the card."
+    assert extract_answer(index, [0.5, 0.5, 0.7], threshold=0.9) is None
+    assert extract_answer(None, [1.0, 0.0, 0.0]) is None
+
+    marked = mark_extractive(answer)
+    assert is_extractive(marked) and strip_marker(marked) == answer
+    assert not is_extractive(answer) and strip_marker(answer) == answer and not is_extractive("")
+
+def test_sentence_index_is_reloaded_when_ingestion_rewrites_it(tmp_path):
+    watcher = SnapshotWatcher(str(tmp_path), load_sentence_index, check_interval=0)
+    # No snapshot yet; that isn't remembered once one is written
+    assert watcher.get() is None
+
+    meta = {"source": "p.txt", "section": "Refund Policy", "position": 0}
+    write_snapshot(str(tmp_path), ["a"], ["Refunds take 5 days."], [meta], [[1.0, 0.0]])
+    assert extract_answer(watcher.get(), [1.0, 0.0]) == "From our Refund Policy: Refunds take 5 days."
+    assert watcher.get() is watcher.get() and watcher.loads == 1
+
+    write_snapshot(str(tmp_path), ["b"], ["Refunds take 10 days."], [meta], [[1.0, 0.0]])
+    assert extract_answer(watcher.get(), [1.0, 0.0]) == "From our Refund Policy: Refunds take 10 days."
+    assert watcher.loads == 2
+
+if __name__ == "__main__":
+    import pathlib, tempfile
+    test_sections_and_sentences_follow_the_document_layout()
+    test_confident_matches_are_quoted_and_weak_ones_left_to_the_llm()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_sentence_index_is_reloaded_when_ingestion_rewrites_it(pathlib.Path(tmp))
+    print("Extractive answer tests passed")
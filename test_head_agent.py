@@ -0,0 +1,147 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+import pytest
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import head_agent
+from head_agent import HeadAgent, run_in_pipeline_loop
+from policy.tools.extractive import EXTRACTIVE_MARKER
+
+class FakeRouter:
+    """Routes every question to `agent_type` (None defers to the LLM) and records where `record` ran."""
+    def __init__(self, agent_type):
+        self.agent_type = agent_type
+        self.recorded = []
+
+    def route(self, query):
+        return self.agent_type
+
+    def record(self, query, label):
+        self.recorded.append((query, label, threading.current_thread().name))
+
+def offline_agents(monkeypatch, agent_type="both", delay=0.2):
+    """Replace the router, sub-agents and reflection with fakes; returns the router and reflection calls."""
+    router = FakeRouter(agent_type)
+    reflections = []
+
+    async def adb_agent(query):
+        await asyncio.sleep(delay)
+        return "Desk Lamp: $24.99, 12 in stock"
+
+    async def apolicy_agent(query):
+        await asyncio.sleep(delay)
+        return "Returns are accepted within 30 days."
+
+    async def areflection_agent(**kwargs):
+        reflections.append(kwargs)
+        return f"answer to {kwargs['user_query']}"
+
+    monkeypatch.setattr(head_agent, "router", router)
+    monkeypatch.setattr(head_agent, "adb_agent", adb_agent)
+    monkeypatch.setattr(head_agent, "apolicy_agent", apolicy_agent)
+    monkeypatch.setattr(head_agent, "areflection_agent", areflection_agent)
+    return router, reflections
+
+def test_aprocess_query_runs_agents_concurrently_and_remembers_the_turn(monkeypatch):
+    _, reflections = offline_agents(monkeypatch)
+    agent = HeadAgent()
+
+    start = time.perf_counter()
+    reply = asyncio.run(agent.aprocess_query("Can I return the desk lamp?"))
+    assert time.perf_counter() - start < 0.35
+    assert reply == "answer to Can I return the desk lamp?"
+    assert reflections[0]["db_output"].startswith("Desk Lamp") and reflections[0]["policy_output"].startswith("Returns")
+    assert len(agent.memory) == 1
+
+    assert asyncio.run(agent.aprocess_query("  ")) == head_agent.EMPTY_QUERY_REPLY
+
+def test_llm_routed_question_is_recorded_off_the_event_loop(monkeypatch):
+    router, _ = offline_agents(monkeypatch, agent_type=None, delay=0)
+
+    async def ainvoke(messages):
+        return SimpleNamespace(content="policy", usage=None, response_metadata={})
+    monkeypatch.setattr(head_agent, "llm", SimpleNamespace(ainvoke=ainvoke))
+
+    async def ask():
+        loop_thread = threading.current_thread().name
+        return loop_thread, await HeadAgent().aprocess_query("Do you ship to Canada?")
+
+    loop_thread, reply = asyncio.run(ask())
+    assert reply == "answer to Do you ship to Canada?"
+    [(query, label, thread)] = router.recorded
+    assert (query, label) == ("Do you ship to Canada?", "policy") and thread != loop_thread
+
+def test_sync_api_bridges_to_the_pipeline_loop(monkeypatch):
+    offline_agents(monkeypatch, delay=0.1)
+    agents = [HeadAgent() for _ in range(4)]
+
+    # Callers on several threads share the one pipeline loop and still overlap
+    replies = [None] * len(agents)
+
+    def ask(i):
+        replies[i] = agents[i].process_query(f"question {i}")
+    threads = [threading.Thread(target=ask, args=(i,)) for i in range(len(agents))]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert time.perf_counter() - start < 0.35
+    assert replies == [f"answer to question {i}" for i in range(len(agents))]
+
+    async def on_pipeline_loop():
+        return asyncio.get_running_loop()
+    assert run_in_pipeline_loop(on_pipeline_loop()) is head_agent.get_pipeline_loop()
+
+    async def fail():
+        raise ValueError("bad plan")
+    with pytest.raises(ValueError):
+        run_in_pipeline_loop(fail())
+
+def stream_events(agent, query):
+    async def collect():
+        return [event async for event in agent.aprocess_query_stream(query)]
+    return asyncio.run(collect())
+
+def test_stream_reports_progress_then_the_answer(monkeypatch):
+    offline_agents(monkeypatch, delay=0)
+
+    async def areflection_agent_stream(**kwargs):
+        for token in ("The desk lamp ", "is $24.99 and ", "can be returned."):
+            yield token
+    monkeypatch.setattr(head_agent, "areflection_agent_stream", areflection_agent_stream)
+    agent = HeadAgent()
+
+    events = stream_events(agent, "Can I return the desk lamp?")
+    statuses = [event["content"] for event in events if event["type"] == "status"]
+    assert statuses[:2] == ["Understanding your question...", "Routed to: both"]
+    assert sorted(statuses[2:4]) == ["Database agent answered", "Policy agent answered"]
+    assert statuses[4:] == ["Writing the answer..."]
+    # Every answer token comes after the last status, and the tokens are the whole answer
+    assert [event["type"] for event in events] == ["status"] * 5 + ["token"] * 3
+    assert "".join(event["content"] for event in events[5:]) == "The desk lamp is $24.99 and can be returned."
+    assert agent.memory.render().endswith("Assistant: The desk lamp is $24.99 and can be returned.\n")
+
+def test_stream_sends_a_final_policy_quote_as_one_token(monkeypatch):
+    offline_agents(monkeypatch, agent_type="policy", delay=0)
+
+    async def apolicy_agent(query):
+        return EXTRACTIVE_MARKER + "Returns are accepted within 30 days."
+    monkeypatch.setattr(head_agent, "apolicy_agent", apolicy_agent)
+    monkeypatch.setattr(head_agent, "areflection_agent_stream", None)
+
+    events = stream_events(HeadAgent(), "What is the return window?")
+    assert events[-1] == {"type": "token", "content": "Returns are accepted within 30 days."}
+    assert [event["type"] for event in events] == ["status"] * 3 + ["token"]
+
+if __name__ == "__main__":
+    for test in (test_aprocess_query_runs_agents_concurrently_and_remembers_the_turn,
+                 test_llm_routed_question_is_recorded_off_the_event_loop, test_sync_api_bridges_to_the_pipeline_loop,
+                 test_stream_reports_progress_then_the_answer, test_stream_sends_a_final_policy_quote_as_one_token):
+        with pytest.MonkeyPatch.context() as monkeypatch:
+            test(monkeypatch)
+    print("Head agent tests passed")
@@ -0,0 +1,67 @@
+import asyncio
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from realtime_db_agent.joins import aexecute_join_plan, chunk_queries, execute_join_plan
+
+USERS = [{"user_id": 6, "first_name": "Charlotte", "last_name": "Garcia"}]
+TABLES = {
+    "transactions": [
+        {"transaction_id": 6, "user_id": 6, "product_id": 89},
+        {"transaction_id": 26, "user_id": 6, "product_id": 68},
+        {"transaction_id": 27, "user_id": 7, "product_id": 68},
+    ],
+    "products": [
+        {"product_id": 89, "product_name": "Desk Lamp"},
+        {"product_id": 68, "product_name": "Coffee Mug"},
+    ],
+}
+
+class FakeExecutor:
+    """Stands in for execute_supabase_query, answering `in` filters from memory."""
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, query_params):
+        self.queries.append(query_params)
+        f = query_params["filters"][0]
+        rows = [r for r in TABLES[query_params["table_name"]] if r[f["column"]] in f["value"]]
+        return {"table": query_params["table_name"], "data": rows}
+
+def test_chained_join_produces_joined_records():
+    execute = FakeExecutor()
+    records, tables = execute_join_plan(execute, "users", USERS, [
+        {"table1": "transactions", "column1": "user_id", "table2": "users", "column2": "user_id"},
+        {"table1": "transactions", "column1": "product_id", "table2": "products", "column2": "product_id"},
+    ])
+
+    assert tables == ["users", "transactions", "products"]
+    assert [(r["transactions.transaction_id"], r["products.product_name"]) for r in records] == [
+        (6, "Desk Lamp"), (26, "Coffee Mug")
+    ]
+    assert all(r["first_name"] == "Charlotte" for r in records)
+    assert len(execute.queries) == 2
+
+def test_async_join_matches_sync_join():
+    conditions = [
+        {"table1": "transactions", "column1": "user_id", "table2": "users", "column2": "user_id"},
+        {"table1": "transactions", "column1": "product_id", "table2": "products", "column2": "product_id"},
+    ]
+    execute = FakeExecutor()
+
+    async def aexecute(query_params):
+        return execute(query_params)
+
+    expected = execute_join_plan(FakeExecutor(), "users", USERS, conditions)
+    assert asyncio.run(aexecute_join_plan(aexecute, "users", USERS, conditions)) == expected
+
+def test_in_lists_are_deduplicated_and_chunked():
+    queries = chunk_queries("products", "product_id", [1, 2, 2, 3, None, 4, 5], chunk_size=2)
+    assert [q["filters"][0]["value"] for q in queries] == [[1, 2], [3, 4], [5]]
+
+if __name__ == "__main__":
+    test_chained_join_produces_joined_records()
+    test_async_join_matches_sync_join()
+    test_in_lists_are_deduplicated_and_chunked()
+    print("Join tests passed")
@@ -0,0 +1,72 @@
+import os
+import sys
+import numpy as np
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from policy.tools.lexical_index import BM25Index, load_lexical_index, reciprocal_rank_fusion, tokenize
+from policy.tools.semantic_cache import SnapshotWatcher
+from policy.tools.vector_store import StoredChunk
+
+TEXTS = [
+    "Items can be returned within 30 days of delivery.",
+    "Opened electronics carry a 15% restocking fee.",
+    "International shipping takes 7 to 14 business days.",
+    "Refunds are issued to the original payment method."
+]
+
+def texts(chunks):
+    return [chunk.page_content for chunk in chunks]
+
+def test_exact_terms_rank_first_and_scoring_matches_a_loop():
+    index = BM25Index.build(TEXTS, [{"source": "policies.txt"}] * 4)
+
+    assert tokenize("Is the Restocking fee in DAYS?") == ["restocking", "fee", "day"]
+    assert texts(index.search("Is there a restocking fee?", k=2)) == [TEXTS[1]]
+    assert texts(index.search("return within 30 days", k=1)) == [TEXTS[0]]
+    assert index.search("restocking")[0].metadata == {"source": "policies.txt"}
+    assert index.search("warranty") == [] and index.search("the of and") == []
+
+    # The bincount over postings equals summing each term's weight document by document
+    query = "international shipping days"
+    expected = np.zeros(len(TEXTS))
+    for term in set(tokenize(query)):
+        i = index.terms[term]
+        for posting in range(index.offsets[i], index.offsets[i + 1]):
+            expected[index.doc_ids[posting]] += index.weights[posting]
+    assert np.allclose(index.scores(query), expected)
+
+def test_save_and_load_round_trip(tmp_path):
+    assert load_lexical_index(str(tmp_path)) is None
+    BM25Index.build(TEXTS, ids=["a", "b", "c", "d"]).save(str(tmp_path))
+
+    index = load_lexical_index(str(tmp_path))
+    assert index.ids == ["a", "b", "c", "d"]
+    assert texts(index.search("refund payment", k=4)) == [TEXTS[3]]
+    assert np.allclose(index.scores("shipping days"), BM25Index.build(TEXTS).scores("shipping days"))
+
+def test_index_is_reloaded_after_reingestion(tmp_path):
+    watcher = SnapshotWatcher(str(tmp_path), load_lexical_index, check_interval=0)
+    assert watcher.get() is None
+
+    BM25Index.build(TEXTS[:2]).save(str(tmp_path))
+    assert texts(watcher.get().search("shipping")) == []
+    BM25Index.build(TEXTS).save(str(tmp_path))
+    assert texts(watcher.get().search("shipping")) == [TEXTS[2]]
+    assert watcher.loads == 2
+
+def test_reciprocal_rank_fusion_prefers_chunks_both_rankings_agree_on():
+    a, b, c, d = (StoredChunk(text, {}) for text in "abcd")
+    fused = reciprocal_rank_fusion([[a, b, c], [c, d, b]], k=2)
+    # b and c appear in both lists; c's ranks (3, 1) beat b's (2, 3)
+    assert texts(fused) == ["c", "b"]
+    assert texts(reciprocal_rank_fusion([[a, b], []], k=5)) == ["a", "b"]
+
+if __name__ == "__main__":
+    import pathlib, tempfile
+    test_exact_terms_rank_first_and_scoring_matches_a_loop()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_save_and_load_round_trip(pathlib.Path(tmp))
+    with tempfile.TemporaryDirectory() as tmp:
+        test_index_is_reloaded_after_reingestion(pathlib.Path(tmp))
+    test_reciprocal_rank_fusion_prefers_chunks_both_rankings_agree_on()
+    print("Lexical index tests passed")
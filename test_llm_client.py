@@ -0,0 +1,187 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from llm_client import ChatModel, LLMClient, LLMError, LLMTimeoutError, to_messages
+
+class OpenAIStub:
+    """
+    Local OpenAI-compatible /chat/completions server. The model name picks the behaviour:
+    "flaky" fails twice (503, then 429) before answering, "bad" is rejected with 400,
+    "slow" always takes 0.5s, "slow-first" stalls only the first request, "busy" takes 0.2s,
+    "throttled" is rate limited (429) once and then takes 0.3s. Replies echo the last message.
+    """
+
+    def __init__(self):
+        self.requests = Counter()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                model = payload["model"]
+                stub.requests[model] += 1
+                count = stub.requests[model]
+                if model == "flaky" and count <= 2:
+                    return self.reply(503 if count == 1 else 429, {"error": "try again"}, {"Retry-After": "0"})
+                if model == "bad":
+                    return self.reply(400, {"error": "bad request"})
+                if model == "throttled" and count == 1:
+                    return self.reply(429, {"error": "rate limited"}, {"Retry-After": "0"})
+                delay = {"slow": 0.5, "busy": 0.2, "slow-first": 1.0 if count == 1 else 0, "throttled": 0.3}.get(model, 0)
+                time.sleep(delay)
+                content = f"echo: {payload['messages'][-1]['content']}"
+                if payload.get("stream"):
+                    return self.stream(content)
+                self.reply(200, {"model": model, "choices": [{"message": {"role": "assistant", "content": content}}],
+                                 "usage": {"prompt_tokens": 5, "completion_tokens": 3}})
+
+            def reply(self, status, body, headers=None):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                for name, value in {"Content-Type": "application/json", **(headers or {})}.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def stream(self, content):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                for word in content.split(" "):
+                    chunk = {"choices": [{"delta": {"content": word + " "}}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.write(b"data: [DONE]\n\n")
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        # Timed-out clients hang up mid-reply; that is expected here
+        self.server.handle_error = lambda request, address: None
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+def client_for(stub, **kwargs):
+    return LLMClient(stub.url, "test-key", name="stub", **{"backoff_base": 0.01, **kwargs})
+
+def test_retries_on_429_and_5xx_but_not_on_other_errors():
+    with OpenAIStub() as stub:
+        client = client_for(stub)
+        reply = client.complete("hello", "flaky")
+        assert reply.content == "echo: hello" and reply.attempts == 3 and reply.usage.prompt_tokens == 5
+        assert asyncio.run(client.acomplete("again", "flaky")).attempts == 1
+
+        try:
+            client.complete("hello", "bad")
+            raise AssertionError("a 400 must not be retried")
+        except LLMError as e:
+            assert e.status == 400
+        assert stub.requests["bad"] == 1
+        assert client.stats()["retries"] == 2 and client.stats()["errors"] == 1
+
+def test_each_attempt_is_bounded_by_the_timeout():
+    with OpenAIStub() as stub:
+        client = client_for(stub, timeout=0.1, max_retries=1)
+        for call in (lambda: client.complete("hi", "slow"), lambda: asyncio.run(client.acomplete("hi", "slow"))):
+            start = time.perf_counter()
+            try:
+                call()
+                raise AssertionError("expected a timeout")
+            except LLMTimeoutError:
+                assert time.perf_counter() - start < 0.45
+        assert client.stats()["timeouts"] == 4
+
+def test_retries_stop_at_the_call_budget():
+    with OpenAIStub() as stub:
+        client = client_for(stub, timeout=0.2, max_retries=10, budget=0.5)
+        start = time.perf_counter()
+        try:
+            client.complete("hi", "slow")
+            raise AssertionError("expected a timeout")
+        except LLMTimeoutError:
+            assert time.perf_counter() - start < 0.7
+        assert 2 <= stub.requests["slow"] <= 3 and client.stats()["out_of_budget"] == 1
+
+def test_identical_concurrent_prompts_share_one_upstream_call():
+    with OpenAIStub() as stub:
+        client = client_for(stub)
+
+        async def sessions():
+            return await asyncio.gather(*(client.acomplete("Return policy?", "busy") for _ in range(5)),
+                                        client.acomplete("Shipping?", "busy"))
+        replies = asyncio.run(sessions())
+        assert [reply.content for reply in replies] == ["echo: Return policy?"] * 5 + ["echo: Shipping?"]
+        assert stub.requests["busy"] == 2
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(client.complete("Warranty?", "busy"))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(results) == 4 and stub.requests["busy"] == 3
+        assert client.stats()["coalesced"] == 7
+
+def test_hedged_request_answers_when_the_first_one_stalls():
+    with OpenAIStub() as stub:
+        client = client_for(stub, hedge_after=0.05, coalesce=False)
+        start = time.perf_counter()
+        reply = asyncio.run(client.acomplete("hi", "slow-first"))
+        assert reply.hedged and time.perf_counter() - start < 0.5
+
+        stub.requests.clear()
+        start = time.perf_counter()
+        reply = client.complete("hi", "slow-first")
+        assert reply.hedged and time.perf_counter() - start < 0.5
+        assert client.stats()["hedges"] == client.stats()["hedge_wins"] == 2
+        # Fast replies never hedge
+        assert not client.complete("hi", "fast").hedged
+
+def test_no_hedging_once_the_provider_throttles():
+    with OpenAIStub() as stub:
+        client = client_for(stub, hedge_after=0.05, coalesce=False)
+        # Open the connection pool first so its setup isn't mistaken for a stall
+        client.complete("hi", "fast")
+        reply = client.complete("hi", "throttled")
+        assert reply.attempts == 2 and not reply.hedged
+        assert asyncio.run(client.acomplete("hi", "throttled")).hedged is False
+        assert stub.requests["throttled"] == 3 and client.stats()["hedges"] == 0
+
+def test_chat_model_streams_and_accepts_langchain_style_messages():
+    message = SimpleNamespace(type="human", content="Is the lamp in stock?")
+    assert to_messages([message, {"role": "system", "content": "Be brief."}]) == [
+        {"role": "user", "content": "Is the lamp in stock?"}, {"role": "system", "content": "Be brief."}]
+
+    with OpenAIStub() as stub:
+        model = ChatModel(client_for(stub), "fast", temperature=0.2)
+        assert model.invoke([message]).content == "echo: Is the lamp in stock?"
+        assert "".join(chunk.content for chunk in model.stream("Hi there")).strip() == "echo: Hi there"
+
+        async def collect():
+            return "".join([chunk.content async for chunk in model.astream("Hi again")])
+        assert asyncio.run(collect()).strip() == "echo: Hi again"
+
+if __name__ == "__main__":
+    for test in (test_retries_on_429_and_5xx_but_not_on_other_errors, test_each_attempt_is_bounded_by_the_timeout,
+                 test_retries_stop_at_the_call_budget, test_identical_concurrent_prompts_share_one_upstream_call,
+                 test_hedged_request_answers_when_the_first_one_stalls, test_no_hedging_once_the_provider_throttles,
+                 test_chat_model_streams_and_accepts_langchain_style_messages):
+        test()
+    print("LLM client tests passed")
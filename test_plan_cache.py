@@ -0,0 +1,59 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from realtime_db_agent.plan_cache import PlanCache
+
+def make_cache(tmp_path):
+    cache = PlanCache(path=str(tmp_path / "plans.json"))
+    cache.set_vocabulary({"product": ["Laptop", "Smart Watch"], "user": ["Charlotte", "Garcia", "Sophia", "Martinez"]})
+    return cache
+
+def test_same_shape_question_reuses_plan(tmp_path):
+    cache = make_cache(tmp_path)
+    plan = {"table_name": "products", "select": "*",
+            "filters": [{"column": "product_id", "operator": "eq", "value": 36}]}
+
+    assert cache.get("tell me about product id 36") is None
+    assert cache.put("tell me about product id 36", plan)
+
+    filled = cache.get("Tell me about product id 71?")
+    assert filled["filters"][0]["value"] == 71
+    assert cache.stats()["hits"] == 1
+
+def test_names_keep_the_plan_casing(tmp_path):
+    cache = make_cache(tmp_path)
+    plan = {"table_name": "users", "select": "*", "filters": [
+        {"column": "first_name", "operator": "eq", "value": "Charlotte"},
+        {"column": "last_name", "operator": "eq", "value": "Garcia"},
+    ]}
+    assert cache.put("show the user garcia charlotte", plan)
+
+    filled = cache.get("show the user martinez sophia")
+    assert [f["value"] for f in filled["filters"]] == ["Sophia", "Martinez"]
+
+def test_unused_or_ambiguous_parameters_are_not_cached(tmp_path):
+    cache = make_cache(tmp_path)
+    # The LLM ignored the number, so the plan can't be trusted for other values
+    assert not cache.put("top 5 laptop deals", {"table_name": "products", "filters": [
+        {"column": "product_name", "operator": "eq", "value": "Laptop"}]})
+    # The same value appears twice, so we can't tell which parameter it came from
+    assert not cache.put("products rated 5 with limit 5", {"table_name": "products", "limit": 5, "filters": [
+        {"column": "product_ratings", "operator": "eq", "value": 5}]})
+
+def test_plans_persist_across_instances(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put("price of smart watch", {"table_name": "products", "select": "price", "filters": [
+        {"column": "product_name", "operator": "ilike", "value": "Smart Watch"}]})
+
+    restored = make_cache(tmp_path)
+    filled = restored.get("price of laptop")
+    assert filled["filters"][0]["value"] == "Laptop"
+
+if __name__ == "__main__":
+    import pathlib, tempfile
+    for test in (test_same_shape_question_reuses_plan, test_names_keep_the_plan_casing,
+                 test_unused_or_ambiguous_parameters_are_not_cached, test_plans_persist_across_instances):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(pathlib.Path(tmp))
+    print("Plan cache tests passed")
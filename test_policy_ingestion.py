@@ -0,0 +1,121 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from policy import part1_conversion as ingestion
+from policy.tools.lexical_index import BM25Index
+from policy.tools.vector_store import NumpyVectorStore
+
+class FakeStore:
+    """In-memory stand-in for the Chroma store that counts embedded chunks."""
+    def __init__(self, ids=()):
+        self.entries = {cid: ("", {}, [1.0, 0.0]) for cid in ids}
+        self.embedded = 0
+
+    def add_texts(self, texts, metadatas, ids):
+        self.embedded += len(texts)
+        self.entries.update({cid: (text, metadata, [len(text), 1.0]) for cid, text, metadata in zip(ids, texts, metadatas)})
+
+    def delete(self, ids):
+        for cid in ids:
+            self.entries.pop(cid, None)
+
+    def get(self, include=None):
+        entries = list(self.entries.items())
+        return {
+            "ids": [cid for cid, _ in entries],
+            "documents": [text for _, (text, _, _) in entries],
+            "metadatas": [metadata for _, (_, metadata, _) in entries],
+            "embeddings": [vector for _, (_, _, vector) in entries]
+        }
+
+class FakeEmbeddings:
+    """Records the sentences embedded for the extractive-answer snapshot."""
+    def __init__(self):
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded += texts
+        return [[len(text), 1.0] for text in texts]
+
+def split_paragraphs(text):
+    return [p.strip() for p in text.split("\n\n") if p.strip()]
+
+def write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+    # Make the change visible even within the file system's timestamp resolution
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+def run(tmp_path, store, **kwargs):
+    kwargs.setdefault("embeddings", FakeEmbeddings())
+    return ingestion.ingest(str(tmp_path / "documents"), str(tmp_path / "manifest.json"), store=store,
+                            snapshot_dir=str(tmp_path / "snapshot"), lexical_dir=str(tmp_path / "bm25"),
+                            sentence_dir=str(tmp_path / "sentences"), **kwargs)
+
+def test_only_changed_chunks_are_embedded_and_removed_ones_deleted(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingestion, "split_document", split_paragraphs)
+    store = FakeStore(ids=["legacy-uuid"])
+    write(tmp_path / "documents" / "returns.txt", "Returns within 30 days.\n\nRefunds in 5 days.")
+    write(tmp_path / "documents" / "faq" / "shipping.md", "Shipping is free over $50.")
+
+    embeddings = FakeEmbeddings()
+    first = run(tmp_path, store, embeddings=embeddings)
+    assert first == {"files": 2, "chunks": 3, "added": 3, "deleted": 0, "rebuilt": True}
+    assert "legacy-uuid" not in store.entries and store.embedded == 3
+
+    write(tmp_path / "documents" / "returns.txt", "Returns within 30 days.\n\nRefunds in 7 days.")
+    (tmp_path / "documents" / "faq" / "shipping.md").unlink()
+    second = run(tmp_path, store, embeddings=embeddings)
+    assert second == {"files": 1, "chunks": 2, "added": 1, "deleted": 2, "rebuilt": False}
+    assert sorted(text for text, _, _ in store.entries.values()) == ["Refunds in 7 days.", "Returns within 30 days."]
+    assert store.embedded == 4
+    snapshot = NumpyVectorStore.load(str(tmp_path / "snapshot"))
+    assert sorted(snapshot.texts) == ["Refunds in 7 days.", "Returns within 30 days."]
+    lexical = BM25Index.load(str(tmp_path / "bm25"))
+    assert [chunk.page_content for chunk in lexical.search("refund", k=2)] == ["Refunds in 7 days."]
+    assert lexical.search("shipping") == []
+    # Only the changed sentence is embedded again for the extractive snapshot
+    assert embeddings.embedded[3:] == ["Refunds in 7 days."]
+    sentences = NumpyVectorStore.load(str(tmp_path / "sentences"))
+    assert sentences.texts == ["Returns within 30 days.", "Refunds in 7 days."]
+    assert sentences.metadatas[1] == {"source": "returns.txt", "section": "", "position": 1}
+
+def test_unchanged_documents_are_a_no_op(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingestion, "split_document", split_paragraphs)
+    write(tmp_path / "documents" / "returns.txt", "Returns within 30 days.")
+    run(tmp_path, FakeStore())
+    manifest_mtime = os.stat(tmp_path / "manifest.json").st_mtime_ns
+
+    def fail(*args, **kwargs):
+        raise AssertionError("nothing should be re-read or split")
+    monkeypatch.setattr(ingestion, "split_document", fail)
+    monkeypatch.setattr(ingestion, "file_hash", fail)
+    report = run(tmp_path, store=None)
+
+    assert report["added"] == report["deleted"] == 0 and not report["rebuilt"]
+    assert os.stat(tmp_path / "manifest.json").st_mtime_ns == manifest_mtime
+
+def test_touched_but_identical_file_is_not_re_embedded(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingestion, "split_document", split_paragraphs)
+    store = FakeStore()
+    write(tmp_path / "documents" / "returns.txt", "Returns within 30 days.")
+    run(tmp_path, store)
+    write(tmp_path / "documents" / "returns.txt", "Returns within 30 days.")
+
+    assert run(tmp_path, store)["added"] == 0 and store.embedded == 1
+    assert run(tmp_path, store, full=True)["rebuilt"] and store.embedded == 2
+
+if __name__ == "__main__":
+    import pathlib, tempfile
+    class MonkeyPatch:
+        def setattr(self, target, name, value):
+            setattr(target, name, value)
+    for test in (test_only_changed_chunks_are_embedded_and_removed_ones_deleted, test_unchanged_documents_are_a_no_op,
+                 test_touched_but_identical_file_is_not_re_embedded):
+        original = (ingestion.split_document, ingestion.file_hash)
+        with tempfile.TemporaryDirectory() as tmp:
+            test(pathlib.Path(tmp), MonkeyPatch())
+        ingestion.split_document, ingestion.file_hash = original
+    print("Policy ingestion tests passed")
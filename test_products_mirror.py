@@ -0,0 +1,83 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd
+from realtime_db_agent.products_mirror import ProductsMirror
+
+FRAME = pd.DataFrame([
+    {"product_id": 1, "product_name": "Laptop", "product_category": "Electronics", "price": 999.0, "stock_quantity": 5, "product_ratings": 4},
+    {"product_id": 2, "product_name": "Smartphone", "product_category": "Electronics", "price": 499.0, "stock_quantity": 0, "product_ratings": 5},
+    {"product_id": 3, "product_name": "T-Shirt", "product_category": "Clothing", "price": 19.5, "stock_quantity": 40, "product_ratings": 3},
+    {"product_id": 4, "product_name": "Jeans", "product_category": "Clothing", "price": None, "stock_quantity": 12, "product_ratings": 4},
+])
+
+def make_mirror():
+    mirror = ProductsMirror()
+    mirror.load_frame(FRAME)
+    return mirror
+
+def test_point_lookup_matches_supabase_shape():
+    result = make_mirror().try_execute({
+        "table_name": "products", "select": "*",
+        "filters": [{"column": "product_id", "operator": "eq", "value": "2"}]
+    })
+    assert result["table"] == "products"
+    assert [row["product_name"] for row in result["data"]] == ["Smartphone"]
+
+def test_indexed_range_and_category_filters():
+    result = make_mirror().try_execute({
+        "table_name": "products", "select": "product_name,price",
+        "filters": [
+            {"column": "product_category", "operator": "eq", "value": "Electronics"},
+            {"column": "price", "operator": "lt", "value": 600},
+        ],
+    })
+    assert result["data"] == [{"product_name": "Smartphone", "price": 499.0}]
+
+def test_ilike_order_and_nulls():
+    result = make_mirror().try_execute({
+        "table_name": "products", "select": "product_name,price",
+        "filters": [{"column": "product_name", "operator": "ilike", "value": "j"}],
+        "order": "price", "order_direction": "desc"
+    })
+    assert result["data"] == [{"product_name": "Jeans", "price": None}]
+
+    result = make_mirror().try_execute({
+        "table_name": "products", "select": "product_name",
+        "filters": [], "order": "price", "order_direction": "asc", "limit": 2
+    })
+    assert [row["product_name"] for row in result["data"]] == ["T-Shirt", "Smartphone"]
+
+def test_neq_never_matches_missing_values():
+    result = make_mirror().try_execute({
+        "table_name": "products", "select": "product_name",
+        "filters": [{"column": "price", "operator": "neq", "value": 999}]
+    })
+    # Jeans has no price, so like Postgres it is left out
+    assert [row["product_name"] for row in result["data"]] == ["Smartphone", "T-Shirt"]
+
+    mirror = ProductsMirror()
+    mirror.load_frame(FRAME.assign(product_category=["Electronics", None, "Clothing", None]))
+    result = mirror.try_execute({
+        "table_name": "products", "select": "product_name",
+        "filters": [{"column": "product_category", "operator": "neq", "value": "Clothing"}]
+    })
+    assert [row["product_name"] for row in result["data"]] == ["Laptop"]
+
+def test_unsupported_specs_fall_through():
+    mirror = make_mirror()
+    assert mirror.try_execute({"table_name": "users", "filters": []}) is None
+    assert mirror.try_execute({"table_name": "products", "filters": [{"column": "color", "operator": "eq", "value": "red"}]}) is None
+    assert mirror.try_execute({"table_name": "products", "filters": [{"column": "price", "operator": "gt", "value": "cheap"}]}) is None
+    assert mirror.stats()["fallthroughs"] == 3
+    # FRAME has no watermark column, so syncs would reload the whole table
+    assert not mirror.stats()["incremental_sync"]
+
+if __name__ == "__main__":
+    test_point_lookup_matches_supabase_shape()
+    test_indexed_range_and_category_filters()
+    test_ilike_order_and_nulls()
+    test_neq_never_matches_missing_values()
+    test_unsupported_specs_fall_through()
+    print("Products mirror tests passed")
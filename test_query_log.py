@@ -0,0 +1,50 @@
+import json
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from realtime_db_agent.query_log import configure_query_log, log_encoding, log_query, query_log_stats, shutdown_query_log
+
+def read_log(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+def test_queries_are_logged_with_latency_rows_and_capped_sample(tmp_path):
+    path = tmp_path / "queries.log"
+    configure_query_log(path=str(path))
+    rows = [{"product_id": i, "product_description": "d" * 1000} for i in range(50)]
+    log_query("products", {"table_name": "products", "select": "*"}, rows, latency_ms=12.3456)
+    log_query("users", {"table_name": "users"}, latency_ms=3.0, error=RuntimeError("permission denied"))
+    log_encoding("products", {"rows_total": 50, "rows_shown": 10})
+    shutdown_query_log()
+
+    query, failed, encoded = read_log(path)
+    assert query["event"] == "query" and query["rows"] == 50 and query["latency_ms"] == 12.35
+    assert [row["product_id"] for row in query["sample"]] == [0, 1, 2]
+    assert len(query["sample"][0]["product_description"]) < 300
+    assert failed["level"] == "ERROR" and failed["error"] == "permission denied"
+    assert encoded["event"] == "encoded" and encoded["rows_shown"] == 10
+
+def test_nothing_is_written_until_configured(tmp_path):
+    log_query("products", {"table_name": "products"}, [{"product_id": 1}], latency_ms=1.0)
+    assert query_log_stats() == {"enabled": False, "queued": 0, "dropped": 0}
+
+def test_log_rotates_by_size(tmp_path):
+    path = tmp_path / "queries.log"
+    configure_query_log(path=str(path), max_bytes=2000, backups=2)
+    for i in range(100):
+        log_query("products", {"table_name": "products", "filters": [{"column": "product_id", "value": i}]},
+                  [{"product_id": i}], latency_ms=1.0)
+    shutdown_query_log()
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["queries.log", "queries.log.1", "queries.log.2"]
+    assert all(os.path.getsize(p) <= 2000 for p in tmp_path.iterdir())
+    assert read_log(path)[-1]["params"]["filters"][0]["value"] == 99
+
+if __name__ == "__main__":
+    import pathlib, tempfile
+    for test in (test_queries_are_logged_with_latency_rows_and_capped_sample, test_nothing_is_written_until_configured,
+                 test_log_rotates_by_size):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(pathlib.Path(tmp))
+    print("Query log tests passed")
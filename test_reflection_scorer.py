@@ -0,0 +1,52 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from reflection_agent.scorer import score_response
+
+POLICY = "Products can be returned within 7–30 days (depending on category). Apparel must be unworn and in resalable condition."
+
+def test_grounded_response_passes():
+    result = score_response(
+        "You can return most items within 7 to 30 days depending on the category, as long as apparel is unworn.",
+        user_query="What is your return policy?",
+        policy_output=POLICY
+    )
+    assert result["passed"]
+
+def test_banned_opener_fails():
+    result = score_response(
+        "Based on our policies, products can be returned within 7 to 30 days depending on the category.",
+        user_query="What is your return policy?",
+        policy_output=POLICY
+    )
+    assert not result["passed"]
+    assert result["scores"]["opener"] == 0.0
+
+def test_invented_numbers_fail():
+    result = score_response(
+        "You have 90 days to return anything, apparel included, no questions asked at all.",
+        user_query="What is your return policy?",
+        policy_output=POLICY
+    )
+    assert result["invented_numbers"] == ["90"]
+    assert not result["passed"]
+
+def test_thousands_separators_match_the_source_rows():
+    result = score_response(
+        "The Ultra 4K TV is $1,299.99 and there are 1,040 in stock right now, ready to ship.",
+        user_query="How much is the Ultra 4K TV?",
+        db_output="product_name: Ultra 4K TV, price: 1299.99, stock_quantity: 1040"
+    )
+    assert result["invented_numbers"] == []
+    assert result["passed"]
+
+    # A comma list of small numbers is still read as separate numbers
+    assert score_response("Sizes 8, 10, 12 are in stock.", db_output="sizes: 8, 10")["invented_numbers"] == ["12"]
+
+if __name__ == "__main__":
+    test_grounded_response_passes()
+    test_banned_opener_fails()
+    test_invented_numbers_fail()
+    test_thousands_separators_match_the_source_rows()
+    print("Scorer tests passed")
@@ -0,0 +1,47 @@
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+import pytest
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import reflection_agent.agent as reflection
+from reflection_agent.agent import areflection_agent_stream, reflection_agent_stream
+
+class FakeStreamingLLM:
+    """Streams each reply in `replies` (a list of chunks) for successive calls."""
+    def __init__(self, *replies):
+        self.replies = list(replies)
+
+    def stream(self, prompt):
+        for chunk in self.replies.pop(0):
+            yield SimpleNamespace(content=chunk)
+
+    async def astream(self, prompt):
+        for chunk in self.replies.pop(0):
+            yield SimpleNamespace(content=chunk)
+
+def collect_async(stream):
+    async def collect():
+        return [token async for token in stream]
+    return asyncio.run(collect())
+
+@pytest.mark.parametrize("collect", [list, collect_async])
+def test_short_reply_is_replaced_before_any_of_it_is_shown(monkeypatch, collect):
+    monkeypatch.setattr(reflection, "llm", FakeStreamingLLM(["Sure", "!"], ["I can help with ", "that order."]))
+    stream = reflection_agent_stream if collect is list else areflection_agent_stream
+    assert collect(stream(user_query="Where is my order?")) == ["I can help with ", "that order."]
+
+@pytest.mark.parametrize("collect", [list, collect_async])
+def test_tokens_flow_once_the_reply_is_long_enough(monkeypatch, collect):
+    monkeypatch.setattr(reflection, "llm", FakeStreamingLLM(["The ", "desk lamp ", "is ", "$24.99."]))
+    stream = reflection_agent_stream if collect is list else areflection_agent_stream
+    # The opening tokens are held until they pass MIN_REPLY_CHARS, then each arrives as streamed
+    assert collect(stream(user_query="How much is the desk lamp?")) == ["The desk lamp ", "is ", "$24.99."]
+
+if __name__ == "__main__":
+    for collect in (list, collect_async):
+        for test in (test_short_reply_is_replaced_before_any_of_it_is_shown, test_tokens_flow_once_the_reply_is_long_enough):
+            with pytest.MonkeyPatch.context() as monkeypatch:
+                test(monkeypatch, collect)
+    print("Reflection stream tests passed")
@@ -0,0 +1,70 @@
+import os
+import sys
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import resources
+
+class Model:
+    def __init__(self):
+        self.name = "model"
+
+    def embed_query(self, text):
+        return [float(len(text))]
+
+def test_resource_is_built_once_on_first_use_and_shared():
+    builds = []
+
+    def build():
+        builds.append(threading.current_thread().name)
+        time.sleep(0.05)
+        return Model()
+
+    resources.register("test-model", build)
+    model = resources.lazy("test-model")
+    assert builds == [] and "not loaded" in repr(model)
+
+    threads = [threading.Thread(target=model.embed_query, args=("hello",)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(builds) == 1
+    assert model.embed_query("abc") == [3.0]
+    assert resources.get("test-model") is resources.get("test-model")
+    assert resources.stats()["resources"]["test-model"]["build_ms"] >= 50
+
+def test_failed_build_is_retried_and_registration_is_idempotent():
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("model download failed")
+        return Model()
+
+    first = resources.register("test-flaky", flaky)
+    assert resources.register("test-flaky", lambda: None) is first
+    try:
+        resources.get("test-flaky")
+    except RuntimeError:
+        pass
+    assert resources.lazy("test-flaky").name == "model"
+    assert len(attempts) == 2
+
+def test_warmup_builds_requested_resources_and_records_milestone():
+    resources.register("test-warm", Model)
+    assert not resources.stats()["resources"]["test-warm"]["loaded"]
+
+    timings = resources.warmup(["test-warm"])
+    assert list(timings) == ["test-warm"]
+    assert resources.stats()["resources"]["test-warm"]["loaded"]
+    assert "warm" in resources.stats()["milestones"]
+
+if __name__ == "__main__":
+    test_resource_is_built_once_on_first_use_and_shared()
+    test_failed_build_is_retried_and_registration_is_idempotent()
+    test_warmup_builds_requested_resources_and_records_milestone()
+    print("Resource registry tests passed")
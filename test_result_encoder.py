@@ -0,0 +1,60 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from realtime_db_agent.result_encoder import encode_results, estimate_tokens, numeric_aggregates, select_columns
+
+def products(count):
+    return [
+        {"product_id": i, "product_name": f"Product {i}", "product_category": "Electronics", "price": 10.0 + i,
+         "stock_quantity": None if i == 0 else i, "product_description": "A dependable everyday product. " * 3}
+        for i in range(count)
+    ]
+
+def test_rows_stop_at_the_token_budget():
+    rows = products(200)
+    text, report = encode_results(rows, "list products", token_budget=300)
+
+    assert 0 < report["rows_shown"] < 200 and report["rows_total"] == 200
+    assert text.endswith(f"... {200 - report['rows_shown']} more rows not shown (aggregates above cover all 200 rows)")
+    # The last line is allowed past the budget; no data row is
+    assert estimate_tokens("\n".join(text.splitlines()[:-1])) <= 300 + report["rows_shown"]
+    assert report["encoded_tokens"] < report["baseline_tokens"]
+    # A single oversized row is still shown so the model sees the format
+    assert encode_results(rows[:1], token_budget=1)[1]["rows_shown"] == 1
+
+def test_columns_the_question_does_not_need_are_pruned():
+    rows = products(10)
+    columns = select_columns(rows, "What do these cost?", {"filters": [{"column": "stock_quantity", "operator": "gt"}]})
+    assert columns == ["product_id", "product_name", "price", "stock_quantity"]
+
+    _, report = encode_results(rows, "What do these cost?")
+    assert report["columns_dropped"] == ["product_category", "stock_quantity", "product_description"]
+    # Small results keep every column
+    assert select_columns(rows[:3], "What do these cost?") == list(rows[0])
+
+def test_shared_values_are_stated_once():
+    text, _ = encode_results(products(3))
+    lines = text.splitlines()
+    assert lines[1].startswith("Same for all rows: product_category=Electronics, product_description=A dependable")
+    assert lines[3] == "product_id | product_name | price | stock_quantity"
+    assert lines[-1] == "2 | Product 2 | 12 | 2"
+
+def test_aggregates_cover_every_row_and_count_missing_values():
+    rows = products(10)
+    assert numeric_aggregates(rows, ["product_id", "price", "stock_quantity", "product_name"]) == {
+        "price": {"count": 10, "min": 10.0, "max": 19.0, "avg": 14.5},
+        "stock_quantity": {"count": 9, "min": 1, "max": 9, "avg": 5.0}
+    }
+
+    text, _ = encode_results(rows, token_budget=150)
+    aggregates = next(line for line in text.splitlines() if line.startswith("Aggregates"))
+    assert aggregates == ("Aggregates over all rows: price: min=10, max=19, avg=14.5; "
+                          "stock_quantity: min=1, max=9, avg=5, count=9")
+
+if __name__ == "__main__":
+    test_rows_stop_at_the_token_budget()
+    test_columns_the_question_does_not_need_are_pruned()
+    test_shared_values_are_stated_once()
+    test_aggregates_cover_every_row_and_count_missing_values()
+    print("Result encoder tests passed")
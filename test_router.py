@@ -0,0 +1,83 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import zlib
+import numpy as np
+from router.embedding_router import EmbeddingRouter, dedupe_traffic
+
+class FakeEmbeddings:
+    """Bag-of-words hashing stand-in for the MiniLM embedding model."""
+    def embed_query(self, text):
+        vector = np.zeros(64)
+        for word in text.lower().split():
+            vector[zlib.crc32(word.strip("?!.,").encode()) % 64] += 1
+        return vector.tolist()
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+EXAMPLES = [
+    ("return policy refund", "policy"),
+    ("refund policy return window", "policy"),
+    ("product price stock", "database"),
+    ("product stock rating price", "database"),
+    ("hello hi", "general"),
+    ("hi hello there", "general"),
+]
+
+def make_router(tmp_path, threshold=0.5):
+    router = EmbeddingRouter(
+        FakeEmbeddings(),
+        examples_path=str(tmp_path / "examples.jsonl"),
+        traffic_path=str(tmp_path / "traffic.jsonl"),
+        threshold=threshold
+    )
+    router.add_examples(EXAMPLES)
+    return router
+
+def test_router_routes_confident_queries_locally(tmp_path):
+    router = make_router(tmp_path)
+
+    assert router.route("what is the return policy") == "policy"
+    assert router.route("hello") == "general"
+    assert router.stats()["local"] == 2
+
+def test_router_falls_back_and_learns_from_traffic(tmp_path):
+    router = make_router(tmp_path, threshold=0.99)
+
+    assert router.route("warranty on laptop") is None
+    assert router.stats()["llm"] == 1
+
+    router.record("warranty on laptop", "both")
+    router.retrain()
+    assert router.classify("warranty on laptop")[0] == "both"
+
+def test_first_request_fits_only_the_curated_examples(tmp_path):
+    router = make_router(tmp_path)
+    router.record("warranty on laptop", "both")
+    # A fresh process fits lazily on the first query, without the logged traffic
+    fresh = EmbeddingRouter(FakeEmbeddings(), examples_path=router.examples_path, traffic_path=router.traffic_path)
+    assert fresh.classify("warranty on laptop")[0] != "both"
+
+    assert fresh.retrain() == len(EXAMPLES) + 1
+    assert fresh.classify("warranty on laptop")[0] == "both"
+
+def test_traffic_is_deduplicated_and_capped():
+    curated = [("Return policy?", "policy")]
+    traffic = [("return policy?", "general"), ("laptop price", "database"), ("old question", "general"),
+               ("Laptop price", "both"), ("hello", "general")]
+
+    assert dedupe_traffic(traffic, curated) == [("old question", "general"), ("Laptop price", "both"), ("hello", "general")]
+    assert dedupe_traffic(traffic, curated, limit=2) == [("Laptop price", "both"), ("hello", "general")]
+
+if __name__ == "__main__":
+    import pathlib, tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        test_router_routes_confident_queries_locally(pathlib.Path(tmp))
+    with tempfile.TemporaryDirectory() as tmp:
+        test_router_falls_back_and_learns_from_traffic(pathlib.Path(tmp))
+    with tempfile.TemporaryDirectory() as tmp:
+        test_first_request_fits_only_the_curated_examples(pathlib.Path(tmp))
+    test_traffic_is_deduplicated_and_capped()
+    print("Router tests passed")
@@ -0,0 +1,131 @@
+import os
+import sys
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from realtime_db_agent import part1_schema_retreival as part1
+from realtime_db_agent.part1_schema_retreival import SchemaRegistry
+
+class FakeResult:
+    def __init__(self, data):
+        self.data = data
+
+class FakeQuery:
+    def __init__(self, client, data):
+        self.client = client
+        self.data = data
+
+    def select(self, *args):
+        return self
+
+    def eq(self, *args):
+        return self
+
+    def limit(self, n):
+        self.data = self.data[:n]
+        return self
+
+    def execute(self):
+        self.client.calls += 1
+        return FakeResult(self.data)
+
+class FakeSupabase:
+    """Counts round trips instead of talking to Supabase."""
+    def __init__(self):
+        self.calls = 0
+
+    def rpc(self, name, params):
+        columns = [{"column_name": "product_id", "data_type": "integer"},
+                   {"column_name": "user_id", "data_type": "integer"}]
+        return FakeQuery(self, columns)
+
+    def table(self, name):
+        if name == "column_descriptions":
+            return FakeQuery(self, [{"column_name": "product_id", "description": "Product identifier"}])
+        return FakeQuery(self, [{"product_id": i, "user_id": i} for i in range(10)])
+
+def test_schema_registry_serves_from_memory(monkeypatch):
+    fake = FakeSupabase()
+    monkeypatch.setattr(part1, "supabase", fake)
+    registry = SchemaRegistry(["products", "users", "transactions"], ttl=0)
+
+    first = registry.get_all_schemas()
+    calls_after_first = fake.calls
+    second = registry.get_all_schemas()
+
+    assert first == second
+    assert calls_after_first == 9
+    assert fake.calls == 9
+    assert "- product_id (integer): Product identifier" in first
+    assert registry.stats()["hits"] == 3
+    assert registry.stats()["misses"] == 3
+
+def test_schema_registry_relationships_and_invalidate(monkeypatch):
+    fake = FakeSupabase()
+    monkeypatch.setattr(part1, "supabase", fake)
+    registry = SchemaRegistry(["products", "users", "transactions"], ttl=0)
+
+    relationships = registry.get_relationships()
+    assert {r["from_column"] for r in relationships} == {"user_id", "product_id"}
+
+    calls = fake.calls
+    registry.get_relationships()
+    assert fake.calls == calls
+
+    registry.invalidate("users")
+    registry.get_table_schema("users")
+    assert fake.calls == calls + 3
+
+def test_each_table_lookup_is_counted_once(monkeypatch):
+    monkeypatch.setattr(part1, "supabase", FakeSupabase())
+    registry = SchemaRegistry(["products", "users", "transactions"], ttl=0)
+
+    registry.get_relationships()
+    assert (registry.stats()["hits"], registry.stats()["misses"]) == (0, 3)
+    # Cached relationships look up no tables
+    registry.get_relationships()
+    registry.get_all_schemas()
+    assert (registry.stats()["hits"], registry.stats()["misses"]) == (3, 3)
+
+class SlowSupabase(FakeSupabase):
+    """Blocks fetches of `slow_table` until `release` is set."""
+    def __init__(self, slow_table):
+        super().__init__()
+        self.slow_table = slow_table
+        self.fetching = threading.Event()
+        self.release = threading.Event()
+
+    def table(self, name):
+        if name == self.slow_table:
+            self.fetching.set()
+            assert self.release.wait(5)
+        return super().table(name)
+
+def test_fetch_does_not_hold_the_registry_lock(monkeypatch):
+    fake = SlowSupabase("users")
+    monkeypatch.setattr(part1, "supabase", fake)
+    registry = SchemaRegistry(["products", "users"], ttl=0)
+    registry.get_table_schema("products")
+    calls = fake.calls
+
+    callers = [threading.Thread(target=registry.get_table_schema, args=("users",)) for _ in range(3)]
+    for caller in callers:
+        caller.start()
+    assert fake.fetching.wait(5)
+    # Cached tables and stats stay available while another table is being fetched
+    assert "Table: products" in registry.get_table_schema("products")
+    assert registry.stats()["cached_tables"] == ["products"]
+
+    fake.release.set()
+    for caller in callers:
+        caller.join(5)
+    # Callers waiting on the same table share one fetch
+    assert fake.calls == calls + 3
+    assert registry.stats()["cached_tables"] == ["products", "users"]
+
+if __name__ == "__main__":
+    print("===== Testing Schema Registry =====")
+    registry = part1.schema_registry
+    print(registry.get_all_schemas())
+    registry.get_all_schemas()
+    print(registry.stats())
@@ -0,0 +1,63 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from policy.tools.semantic_cache import SemanticCache
+
+def rebuild_store(corpus_dir, content: str):
+    (corpus_dir / "chroma.sqlite3").write_text(content, encoding="utf-8")
+
+def test_similar_queries_hit_and_others_miss(tmp_path):
+    cache = SemanticCache(str(tmp_path), threshold=0.9)
+    cache.put([1.0, 0.0, 0.0], "Returns are accepted within 30 days.")
+
+    # Cosine similarity ~0.99 and ~0.71: only the first clears the threshold
+    assert cache.get([1.0, 0.1, 0.0]) == "Returns are accepted within 30 days."
+    assert cache.get([1.0, 1.0, 0.0]) is None
+    assert cache.get([0.0, 0.0, 2.0]) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+def test_least_recently_used_answer_is_evicted(tmp_path):
+    cache = SemanticCache(str(tmp_path), max_entries=2, threshold=0.99)
+    cache.put([1.0, 0.0, 0.0], "returns")
+    cache.put([0.0, 1.0, 0.0], "shipping")
+    # Reading "returns" makes "shipping" the oldest
+    assert cache.get([1.0, 0.0, 0.0]) == "returns"
+    cache.put([0.0, 0.0, 1.0], "warranty")
+
+    assert cache.get([0.0, 1.0, 0.0]) is None
+    assert cache.get([1.0, 0.0, 0.0]) == "returns" and cache.get([0.0, 0.0, 1.0]) == "warranty"
+    assert cache.stats()["entries"] == 2
+
+def test_rebuilt_store_invalidates_cached_answers(tmp_path):
+    rebuild_store(tmp_path, "v1")
+    cache = SemanticCache(str(tmp_path), threshold=0.9, check_interval=0)
+    cache.put([1.0, 0.0], "Returns are accepted within 30 days.")
+    assert cache.get([1.0, 0.0]) is not None
+
+    rebuild_store(tmp_path, "version 2")
+    assert cache.get([1.0, 0.0]) is None
+    assert cache.stats()["invalidations"] == 1 and cache.stats()["entries"] == 0
+
+def test_answer_generated_across_a_rebuild_is_not_stored(tmp_path):
+    rebuild_store(tmp_path, "v1")
+    # A long check interval: only put re-checks the store
+    cache = SemanticCache(str(tmp_path), threshold=0.9, check_interval=3600)
+
+    missed = cache.lookup([1.0, 0.0])
+    assert missed.answer is None
+    rebuild_store(tmp_path, "version 2")
+    assert not cache.put([1.0, 0.0], "answer from the old policies", missed.fingerprint)
+    assert cache.get([1.0, 0.0]) is None and cache.stats()["stale_puts"] == 1
+
+    fresh = cache.lookup([1.0, 0.0])
+    assert cache.put([1.0, 0.0], "answer from the new policies", fresh.fingerprint)
+    assert cache.get([1.0, 0.0]) == "answer from the new policies"
+
+if __name__ == "__main__":
+    import pathlib, tempfile
+    for test in (test_similar_queries_hit_and_others_miss, test_least_recently_used_answer_is_evicted,
+                 test_rebuilt_store_invalidates_cached_answers, test_answer_generated_across_a_rebuild_is_not_stored):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(pathlib.Path(tmp))
+    print("Semantic cache tests passed")
@@ -0,0 +1,82 @@
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from types import SimpleNamespace
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import tracing
+from tracing import in_context, span, trace
+
+@contextmanager
+def export_to(tmp_path):
+    """Export traces to a JSONL file under `tmp_path`, restoring the exporter settings afterwards."""
+    saved = tracing.TRACE_EXPORT, tracing.TRACE_PATH
+    tracing.TRACE_EXPORT = "jsonl"
+    tracing.TRACE_PATH = str(tmp_path / "traces.jsonl")
+    try:
+        yield tmp_path / "traces.jsonl"
+    finally:
+        tracing.TRACE_EXPORT, tracing.TRACE_PATH = saved
+
+def read_trace(path):
+    with open(path, encoding="utf-8") as f:
+        return {record["name"]: record for record in map(json.loads, f)}
+
+def run_agent(name):
+    with span(f"agent.{name}"):
+        return name
+
+def test_spans_nest_under_one_trace_and_export_on_root_end(tmp_path):
+    with export_to(tmp_path) as path, trace("chat_turn") as request:
+        with span("get_agent_responses") as stage:
+            stage.set(agents="db,policy")
+            # Worker threads only see the trace through in_context
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                assert list(pool.map(in_context(run_agent), ["db", "policy"])) == ["db", "policy"]
+        assert not path.exists()
+
+    records = read_trace(path)
+    assert set(records) == {"chat_turn", "get_agent_responses", "agent.db", "agent.policy"}
+    assert {r["trace_id"] for r in records.values()} == {request.trace_id}
+    assert records["get_agent_responses"]["parent_span_id"] == records["chat_turn"]["span_id"]
+    assert records["agent.db"]["parent_span_id"] == records["get_agent_responses"]["span_id"]
+    assert records["get_agent_responses"]["attributes"] == {"agents": "db,policy"}
+    assert tracing.current_span() is None
+
+def test_errors_mark_the_span_and_propagate(tmp_path):
+    with export_to(tmp_path) as path:
+        try:
+            with trace("chat_turn"):
+                with span("supabase.query"):
+                    raise RuntimeError("connection refused")
+        except RuntimeError:
+            pass
+
+    records = read_trace(path)
+    assert records["supabase.query"]["status"] == {"code": "ERROR", "message": "connection refused"}
+    assert records["supabase.query"]["events"][0]["attributes"]["type"] == "RuntimeError"
+    assert records["chat_turn"]["status"]["code"] == "ERROR"
+
+def test_token_usage_from_provider_or_estimate(tmp_path):
+    with export_to(tmp_path) as path:
+        with span("llm") as call:
+            call.record_llm(SimpleNamespace(usage=SimpleNamespace(prompt_tokens=120, completion_tokens=30)))
+        assert call.attributes == {"prompt_tokens": 120, "completion_tokens": 30}
+
+        # Groq through LangChain may not report usage
+        with span("llm") as call:
+            call.record_llm(SimpleNamespace(content="x" * 40, response_metadata={}), [{"role": "user", "content": "y" * 80}])
+        assert call.attributes["tokens_estimated"] is True
+        assert call.attributes["prompt_tokens"] > call.attributes["completion_tokens"] > 0
+        # Spans outside a request are timed but not exported
+        assert call.end_ns and not path.exists()
+
+if __name__ == "__main__":
+    import pathlib, tempfile
+    for test in (test_spans_nest_under_one_trace_and_export_on_root_end, test_errors_mark_the_span_and_propagate,
+                 test_token_usage_from_provider_or_estimate):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(pathlib.Path(tmp))
+    print("Tracing tests passed")
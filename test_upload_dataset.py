@@ -0,0 +1,111 @@
+import json
+import os
+import sys
+import threading
+import pytest
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import realtime_db_agent.dataset.upload_dataset as upload_dataset
+
+class FakeSupabase:
+    """Records upserted batches in memory; batches starting at a product id in `fail_at` raise."""
+    def __init__(self, fail_at=()):
+        self.batches = []
+        self.upserts = set()  # (table, conflict key) pairs seen
+        self.fail_at = set(fail_at)
+        self.lock = threading.Lock()
+
+    def table(self, name):
+        client = self
+
+        class Upsert:
+            def upsert(self, rows, on_conflict, returning):
+                client.upserts.add((name, on_conflict))
+                self.rows = rows
+                return self
+
+            def execute(self):
+                if self.rows[0].get("product_id") in client.fail_at:
+                    raise ConnectionError("connection reset")
+                with client.lock:
+                    client.batches.append(self.rows)
+
+        return Upsert()
+
+    def stored_ids(self, key="product_id"):
+        return sorted(row[key] for batch in self.batches for row in batch)
+
+def write_csv(tmp_path, rows: int):
+    path = tmp_path / "products.csv"
+    lines = ["Product ID,Product Name,Price"] + [f"{i},Product {i},{i}.5" for i in range(rows)]
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return str(path)
+
+def test_rows_are_upserted_in_batches_with_db_column_names(monkeypatch, tmp_path):
+    supabase = FakeSupabase()
+    monkeypatch.setattr(upload_dataset, "get_supabase_client", lambda: supabase)
+
+    report = upload_dataset.upload_table("products", csv_path=write_csv(tmp_path, 23), batch_size=5, concurrency=3,
+                                         checkpoint_path=str(tmp_path / "checkpoint.json"), retries=0)
+
+    assert report["rows"] == 23
+    assert sorted(len(batch) for batch in supabase.batches) == [3, 5, 5, 5, 5]
+    assert supabase.stored_ids() == list(range(23))
+    assert supabase.batches[0][0].keys() == {"product_id", "product_name", "price"}
+    assert supabase.upserts == {("products", "product_id")}
+    with open(tmp_path / "checkpoint.json", encoding="utf-8") as f:
+        assert json.load(f)["products"]["rows_done"] == 23
+
+def test_failed_load_resumes_from_the_checkpoint(monkeypatch, tmp_path):
+    csv_path = write_csv(tmp_path, 20)
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+    # The third batch (rows 10-14) keeps failing
+    supabase = FakeSupabase(fail_at={10})
+    monkeypatch.setattr(upload_dataset, "get_supabase_client", lambda: supabase)
+    with pytest.raises(ConnectionError):
+        upload_dataset.upload_table("products", csv_path=csv_path, batch_size=5, concurrency=1,
+                                    checkpoint_path=checkpoint_path, retries=0)
+    with open(checkpoint_path, encoding="utf-8") as f:
+        assert json.load(f)["products"]["rows_done"] == 10
+
+    resumed = FakeSupabase()
+    monkeypatch.setattr(upload_dataset, "get_supabase_client", lambda: resumed)
+    report = upload_dataset.upload_table("products", csv_path=csv_path, batch_size=5, concurrency=1,
+                                         checkpoint_path=checkpoint_path, retries=0)
+
+    assert report["rows"] == 10
+    assert resumed.stored_ids() == list(range(10, 20))
+    assert supabase.stored_ids() + resumed.stored_ids() == list(range(20))
+
+def test_transactions_load_through_the_same_batches_and_checkpoint(monkeypatch, tmp_path):
+    csv_path = tmp_path / "transactions.csv"
+    # Headers are already the DB column names
+    lines = ["transaction_id,user_id,product_id,quantity"] + [f"{i},{i % 3},{i % 7},1" for i in range(12)]
+    csv_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+    supabase = FakeSupabase()
+    monkeypatch.setattr(upload_dataset, "get_supabase_client", lambda: supabase)
+
+    report = upload_dataset.upload_table("transactions", csv_path=str(csv_path), batch_size=5, concurrency=2,
+                                         checkpoint_path=checkpoint_path, retries=0)
+
+    assert report["rows"] == 12
+    assert supabase.upserts == {("transactions", "transaction_id")}
+    assert supabase.stored_ids("transaction_id") == list(range(12))
+    assert supabase.batches[0][0].keys() == {"transaction_id", "user_id", "product_id", "quantity"}
+    with open(checkpoint_path, encoding="utf-8") as f:
+        assert json.load(f)["transactions"]["rows_done"] == 12
+
+def test_missing_default_csv_points_to_the_override(monkeypatch, tmp_path):
+    monkeypatch.setitem(upload_dataset.TABLES, "users", dict(upload_dataset.TABLES["users"], csv=str(tmp_path / "users.csv")))
+    with pytest.raises(FileNotFoundError, match="--csv"):
+        upload_dataset.upload_table("users", checkpoint_path=str(tmp_path / "checkpoint.json"))
+
+if __name__ == "__main__":
+    import pathlib, tempfile
+    for test in (test_rows_are_upserted_in_batches_with_db_column_names, test_failed_load_resumes_from_the_checkpoint,
+                 test_transactions_load_through_the_same_batches_and_checkpoint,
+                 test_missing_default_csv_points_to_the_override):
+        with pytest.MonkeyPatch.context() as monkeypatch, tempfile.TemporaryDirectory() as tmp:
+            test(monkeypatch, pathlib.Path(tmp))
+    print("Dataset upload tests passed")
@@ -0,0 +1,41 @@
+import asyncio
+import os
+import sys
+import numpy as np
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from policy.tools.vector_store import NumpyVectorStore, write_snapshot
+
+TEXTS = ["returns within 30 days", "free shipping over $50", "one year warranty", "refunds in 5 days"]
+VECTORS = [[1.0, 0.0, 0.0], [0.0, 3.0, 0.0], [0.0, 0.0, 0.5], [0.7, 0.0, 0.7]]
+
+class Embeddings:
+    def embed_query(self, text):
+        return {"return": [1.0, 0.1, 0.0], "warranty": [0.0, 0.0, 2.0]}[text]
+
+def test_snapshot_round_trip_and_cosine_ranking(tmp_path):
+    write_snapshot(str(tmp_path), ["a", "b", "c", "d"], TEXTS, [{"source": "policies.txt"}] * 4, VECTORS)
+    store = NumpyVectorStore.load(str(tmp_path), Embeddings())
+
+    assert isinstance(store.vectors, np.memmap) and store.vectors.dtype == np.float32
+    results = store.similarity_search_with_score_by_vector([1.0, 0.0, 0.9], k=2)
+    assert [chunk.page_content for chunk, _ in results] == ["refunds in 5 days", "returns within 30 days"]
+    assert results[0][1] > results[1][1]
+    assert results[0][0].metadata == {"source": "policies.txt"}
+    # Magnitudes don't matter, only direction
+    assert store.similarity_search("warranty", k=1)[0].page_content == "one year warranty"
+
+def test_k_is_capped_and_async_matches_sync(tmp_path):
+    write_snapshot(str(tmp_path), ["a", "b", "c", "d"], TEXTS, [None] * 4, VECTORS)
+    store = NumpyVectorStore.load(str(tmp_path))
+
+    assert len(store.similarity_search_by_vector([0.0, 1.0, 0.0], k=10)) == 4
+    assert asyncio.run(store.asimilarity_search_by_vector([0.0, 1.0, 0.0], k=2)) == store.similarity_search_by_vector([0.0, 1.0, 0.0], k=2)
+    assert NumpyVectorStore(np.zeros((0, 3), dtype=np.float32), []).similarity_search_by_vector([1.0, 0.0, 0.0]) == []
+
+if __name__ == "__main__":
+    import pathlib, tempfile
+    for test in (test_snapshot_round_trip_and_cosine_ranking, test_k_is_capped_and_async_matches_sync):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(pathlib.Path(tmp))
+    print("Vector store tests passed")
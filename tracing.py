@@ -0,0 +1,169 @@
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+import resources
+from realtime_db_agent.result_encoder import estimate_tokens
+resources.load_settings()
+
+# Where finished traces go: any of "jsonl", "console", comma-separated, or "off" (the default)
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "off")
+TRACE_PATH = os.getenv("TRACE_PATH", "traces.jsonl")
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+def _estimate_tokens(prompt) -> int:
+    """Token estimate for a prompt given as text, chat messages or role/content dicts."""
+    if not isinstance(prompt, str):
+        prompt = " ".join(
+            str(message.get("content", "")) if isinstance(message, dict) else str(getattr(message, "content", message))
+            for message in prompt
+        )
+    return estimate_tokens(prompt)
+
+class Span:
+    """
+    One timed stage of a request.
+    Spans of the same request share a trace id (the request id) and are exported
+    together, as OTLP-shaped JSON records, when the root span ends. Only roots started
+    with `trace` are exported; a span with no request around it is timed but dropped.
+    """
+
+    def __init__(self, name: str, parent: "Span" = None, attributes: dict = None, export: bool = True):
+        self.name = name
+        self.parent = parent
+        self.export = export
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.attributes = dict(attributes or {})
+        self.events = []
+        self.status = "OK"
+        self.status_message = ""
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        # Finished spans of the whole trace, kept on the root
+        self._finished = parent._finished if parent else []
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def event(self, name: str, **attributes):
+        self.events.append({"name": name, "time_unix_nano": time.time_ns(), "attributes": attributes})
+
+    def error(self, error):
+        self.status = "ERROR"
+        # Some exceptions (e.g. a cancelled agent task) carry no message
+        self.status_message = str(error) or type(error).__name__
+        self.event("exception", type=type(error).__name__, message=str(error))
+
+    def record_llm(self, response, prompt=None):
+        """
+        Record token usage from an OpenAI-style response or a LangChain message.
+        Falls back to an estimate from the prompt and completion text.
+        """
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self.set(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+            return
+        metadata = getattr(response, "response_metadata", None) or {}
+        usage = metadata.get("token_usage") or getattr(response, "usage_metadata", None)
+        if usage:
+            self.set(
+                prompt_tokens=usage.get("prompt_tokens", usage.get("input_tokens")),
+                completion_tokens=usage.get("completion_tokens", usage.get("output_tokens"))
+            )
+            return
+        content = getattr(response, "content", response)
+        self.set(
+            prompt_tokens=_estimate_tokens(prompt) if prompt is not None else None,
+            completion_tokens=_estimate_tokens(content if isinstance(content, str) else ""),
+            tokens_estimated=True
+        )
+
+    def end(self):
+        self.end_ns = time.time_ns()
+        self._finished.append(self)
+        if self.parent is None and self.export:
+            _export(self._finished)
+
+    def to_record(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent.span_id if self.parent else None,
+            "name": self.name,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "events": self.events,
+            "status": {"code": self.status, "message": self.status_message}
+        }
+
+_export_lock = threading.Lock()
+
+def _export(spans):
+    targets = {t.strip() for t in TRACE_EXPORT.split(",")}
+    if "off" in targets:
+        return
+    records = [span.to_record() for span in spans]
+    if "jsonl" in targets:
+        lines = "".join(json.dumps(record, default=str) + "\n" for record in records)
+        # One write per request keeps concurrent traces from interleaving
+        with _export_lock, open(TRACE_PATH, "a", encoding="utf-8") as f:
+            f.write(lines)
+    if "console" in targets:
+        for record in records:
+            status = "" if record["status"]["code"] == "OK" else f" ERROR {record['status']['message']}"
+            print(f"[trace {record['trace_id'][:8]}] {record['name']} {record['duration_ms']:.1f}ms{status}", file=sys.stderr)
+
+def current_span():
+    return _current_span.get()
+
+def current_trace_id():
+    span = _current_span.get()
+    return span.trace_id if span else None
+
+@contextmanager
+def _activate(current: Span):
+    token = _current_span.set(current)
+    try:
+        yield current
+    except GeneratorExit:
+        # A stream the consumer stopped reading early
+        current.set(abandoned=True)
+        raise
+    except BaseException as e:
+        current.error(e)
+        raise
+    finally:
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            # A generator closed from another context; just step back to the parent
+            _current_span.set(current.parent)
+        current.end()
+
+def span(name: str, **attributes):
+    """
+    Context manager timing a stage as a child of the current span. Outside a trace the
+    span is still timed but never exported. Exceptions mark the span as failed and propagate.
+    """
+    parent = _current_span.get()
+    return _activate(Span(name, parent, attributes, export=parent is not None))
+
+def trace(name: str, **attributes):
+    """Context manager starting a new trace (one per request), even if a span is already active."""
+    return _activate(Span(name, None, attributes))
+
+def in_context(fn):
+    """Bind `fn` to the caller's tracing context, for work handed to a thread pool."""
+    context = contextvars.copy_context()
+    # Each call gets its own copy, as a context can't be entered by two threads at once
+    return lambda *args, **kwargs: context.copy().run(fn, *args, **kwargs)
+
+__all__ = ["span", "trace", "in_context", "current_span", "current_trace_id", "Span"]